@@ -0,0 +1,233 @@
+"""Local mock of the GitHub Models /chat/completions API for offline load testing
+
+Usage:
+    python bench/mock_models_server.py --port 8011 --latency lognormal:250,0.5 --rate-429 0.02
+    GITHUB_MODELS_ENDPOINT=http://127.0.0.1:8011 GITHUB_TOKEN=dummy python src/main.py
+
+Latency specs (milliseconds):
+    fixed:MS            every response takes MS
+    uniform:LOW,HIGH    uniformly distributed
+    normal:MEAN,STDDEV  normal, clipped at 0
+    lognormal:MEDIAN,SIGMA  long-tailed like real model latency
+    exp:MEAN            exponential
+
+Responses carry a usage block with token counts estimated from the text
+(about four characters per token). Requests with "stream": true get a
+server-sent event stream of chunks, ending with a usage chunk and [DONE].
+GET /stats returns request counts, and POST /stats/reset clears them.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def parse_latency(spec):
+    """Turn a latency spec such as 'lognormal:250,0.5' into a sampler returning seconds"""
+    kind, _, args = (spec or 'fixed:0').partition(':')
+    values = [float(value) for value in args.split(',') if value]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    if kind == 'exp':
+        return lambda rng: rng.expovariate(1000 / values[0])
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+def canned_reply(messages):
+    """Produce a reply shaped like what each /api/ai/* route parses"""
+    system = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'system').lower()
+    user = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'user')
+    if 'json array' in system:
+        return json.dumps(['meeting', 'planning', 'notes'])
+    if 'json' in system:
+        return json.dumps({'title': 'Mock title', 'content': user[:200], 'start_time': None, 'end_time': None})
+    if 'tags' in system:
+        return 'mock, notes, planning'
+    return 'This is a mock response. ' + ' '.join(user.split()[:30])
+
+class MockModelsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency='fixed:0', rate_429=0.0, rate_5xx=0.0, seed=None, reply=None):
+        super().__init__(address, MockModelsHandler)
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'requests': 0, 'streamed': 0, 'status': {}, 'models': {}}
+
+    def count(self, status, model=None, streamed=False):
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['streamed'] += int(streamed)
+            self.stats['status'][str(status)] = self.stats['status'].get(str(status), 0) + 1
+            if model:
+                self.stats['models'][model] = self.stats['models'].get(model, 0) + 1
+
+    def draw(self):
+        """Sample (latency_seconds, injected_status) for one request"""
+        with self.rng_lock:
+            latency = self.sample_latency(self.rng)
+            roll = self.rng.random()
+        if roll < self.rate_429:
+            return latency, 429
+        if roll < self.rate_429 + self.rate_5xx:
+            return latency, self.rng.choice((500, 502, 503))
+        return latency, 200
+
+class MockModelsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.server.stats_lock:
+                return self._send_json(200, self.server.stats)
+        self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length) if length else b'{}'
+
+        if self.path == '/stats/reset':
+            self.server.reset_stats()
+            return self._send_json(200, {'reset': True})
+        if self.path.rstrip('/') != '/chat/completions':
+            return self._send_json(404, {'error': 'Not found'})
+
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON'}})
+
+        model = body.get('model', 'gpt-4o-mini')
+        stream = bool(body.get('stream'))
+        latency, status = self.server.draw()
+        time.sleep(latency)
+
+        if status == 429:
+            self.server.count(status, model)
+            return self._send_json(429, {'error': {'code': 'RateLimitReached', 'message': 'Rate limit exceeded'}},
+                                   headers={'Retry-After': '1'})
+        if status != 200:
+            self.server.count(status, model)
+            return self._send_json(status, {'error': {'code': 'ServerError', 'message': 'Injected upstream failure'}})
+
+        messages = body.get('messages', [])
+        content = self.server.reply or canned_reply(messages)
+        prompt_tokens = sum(estimate_tokens(m.get('content', '')) for m in messages)
+        completion_tokens = min(estimate_tokens(content), body.get('max_tokens') or 10 ** 6)
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
+        completion_id = f'chatcmpl-mock-{time.time_ns()}'
+        self.server.count(200, model, streamed=stream)
+
+        if stream:
+            return self._stream(completion_id, model, content, usage)
+
+        self._send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        })
+
+    def _stream(self, completion_id, model, content, usage):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def send(chunk):
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+
+        base = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model}
+        send({**base, 'choices': [{'index': 0, 'delta': {'role': 'assistant'}, 'finish_reason': None}]})
+        words = content.split(' ')
+        for i, word in enumerate(words):
+            piece = word if i == len(words) - 1 else word + ' '
+            send({**base, 'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]})
+        send({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+        send({**base, 'choices': [], 'usage': usage})
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+        self.close_connection = True
+
+def start_mock_server(host='127.0.0.1', port=0, **options):
+    """Start the mock in a background thread, returning (server, base_url)"""
+    server = MockModelsServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('MOCK_MODELS_PORT', 8011)))
+    parser.add_argument('--latency', default='fixed:0', help='latency distribution, e.g. lognormal:250,0.5')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='fraction of requests answered with 500/502/503')
+    parser.add_argument('--seed', type=int, help='random seed for latency and error injection')
+    parser.add_argument('--reply', help='fixed reply text instead of route-shaped canned replies')
+    args = parser.parse_args()
+
+    try:
+        parse_latency(args.latency)
+    except (ValueError, IndexError) as e:
+        parser.error(str(e))
+
+    server = MockModelsServer((args.host, args.port), latency=args.latency, rate_429=args.rate_429,
+                              rate_5xx=args.rate_5xx, seed=args.seed, reply=args.reply)
+    print(f"Mock GitHub Models listening on http://{args.host}:{server.server_address[1]} "
+          f"(latency={args.latency}, 429={args.rate_429:.0%}, 5xx={args.rate_5xx:.0%})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""Benchmark the note/user API routes and model layer against a seeded database
+
+Usage:
+    python bench/run.py --scale 1k
+    python bench/run.py --scale 100k --iterations 500 --output bench/results/100k.json
+    python bench/run.py compare bench/results/before.json bench/results/after.json
+
+Each run seeds a fresh database in a temporary DATABASE_DIR (the project's
+database/app.db is never touched), then times every route through the Flask
+test client and every Note/User query method directly. AI routes are timed
+against bench/mock_models_server.py. Results are written as JSON.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def summarize(name, kind, latencies, errors, wall_time):
+    latencies_ms = sorted(value * 1000 for value in latencies)
+    return {
+        'name': name,
+        'kind': kind,
+        'iterations': len(latencies),
+        'errors': errors,
+        'throughput_ops': round(len(latencies) / wall_time, 2) if wall_time else None,
+        'mean_ms': round(sum(latencies_ms) / len(latencies_ms), 4) if latencies_ms else None,
+        'p50_ms': round(percentile(latencies_ms, 50), 4) if latencies_ms else None,
+        'p95_ms': round(percentile(latencies_ms, 95), 4) if latencies_ms else None,
+        'p99_ms': round(percentile(latencies_ms, 99), 4) if latencies_ms else None,
+    }
+
+def measure(name, kind, fn, iterations, warmup=3):
+    """Call fn(i) repeatedly; fn returns False (or raises) to count an error"""
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    errors = 0
+    wall_start = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        try:
+            ok = fn(i)
+        except Exception:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        if ok is False:
+            errors += 1
+    result = summarize(name, kind, latencies, errors, time.perf_counter() - wall_start)
+    print(f"  {kind:5} {name:45} p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms "
+          f"p99={result['p99_ms']:.3f}ms {result['throughput_ops']:.0f} ops/s errors={errors}")
+    return result
+
+def route_cases(client, rng, user_count):
+    """(name, fn) pairs hitting every note and user route through the test client"""
+    from bench.seed import TAGS, WORDS
+
+    def headers():
+        return {'X-User-Id': str(rng.randrange(1, user_count + 1))}
+
+    def note_ids(user_headers):
+        notes = client.get('/api/notes', headers=user_headers).get_json()
+        return [note['id'] for note in notes] or [0]
+
+    fixed_user = {'X-User-Id': '1'}
+    fixed_ids = note_ids(fixed_user)
+
+    def ok(response, *statuses):
+        return response.status_code in (statuses or (200,))
+
+    def create_and_delete_note(i):
+        created = client.post('/api/notes', json={'title': 'bench', 'content': 'x'}, headers=fixed_user)
+        return ok(client.delete(f"/api/notes/{created.get_json()['id']}", headers=fixed_user), 204)
+
+    def update_user(i):
+        user_id = rng.randrange(1, user_count + 1)
+        return ok(client.put(f'/api/users/{user_id}', json={'email': f'user{user_id}@example.com'}))
+
+    def create_and_delete_user(i):
+        created = client.post('/api/users', json={'username': f'bench{i}-{time.time_ns()}', 'email': f'bench{time.time_ns()}@x'})
+        return ok(client.delete(f"/api/users/{created.get_json()['id']}"), 204)
+
+    return [
+        ('GET /api/notes', lambda i: ok(client.get('/api/notes', headers=headers()))),
+        ('POST /api/notes', lambda i: ok(client.post('/api/notes', json={
+            'title': f'bench {i}', 'content': ' '.join(rng.choices(WORDS, k=50)), 'tags': rng.sample(TAGS, 2)
+        }, headers=fixed_user), 201)),
+        ('GET /api/notes/<id>', lambda i: ok(client.get(f'/api/notes/{rng.choice(fixed_ids)}', headers=fixed_user))),
+        ('PUT /api/notes/<id>', lambda i: ok(client.put(f'/api/notes/{rng.choice(fixed_ids)}', json={
+            'content': ' '.join(rng.choices(WORDS, k=50))
+        }, headers=fixed_user))),
+        ('GET /api/notes/<id>/revisions', lambda i: ok(client.get(
+            f'/api/notes/{rng.choice(fixed_ids)}/revisions', headers=fixed_user))),
+        ('POST+DELETE /api/notes/<id>', create_and_delete_note),
+        ('GET /api/notes/trash', lambda i: ok(client.get('/api/notes/trash', headers=fixed_user))),
+        ('GET /api/notes/search', lambda i: ok(client.get(f'/api/notes/search?q={rng.choice(WORDS)}', headers=headers()))),
+        ('GET /api/notes/search (facets)', lambda i: ok(client.get(
+            f'/api/notes/search?q={rng.choice(WORDS)}&facets=1', headers=headers()))),
+        # Successive keystrokes of one word, as a search box sends them
+        ('GET /api/notes/autocomplete', lambda i: ok(client.get(
+            f'/api/notes/autocomplete?q={WORDS[i // 4 % len(WORDS)][:1 + i % 4]}', headers=headers()))),
+        # A dropped letter, so the fuzzy path has a correction to find
+        ('GET /api/notes/search (fuzzy)', lambda i: ok(client.get(
+            f'/api/notes/search?q={rng.choice(WORDS)[:-1]}x&fuzzy=1', headers=headers()))),
+        ('GET /api/notes/tags', lambda i: ok(client.get('/api/notes/tags', headers=headers()))),
+        ('GET /api/notes/tags/<tag>', lambda i: ok(client.get(f'/api/notes/tags/{rng.choice(TAGS)}', headers=headers()))),
+        ('GET /api/notes/tag-suggestions', lambda i: ok(client.get(
+            f'/api/notes/tag-suggestions?title={rng.choice(WORDS)}&content={rng.choice(WORDS)}+{rng.choice(WORDS)}', headers=headers()))),
+        ('GET /api/notes/range', lambda i: ok(client.get(
+            '/api/notes/range?from=2024-03-01T00:00&to=2024-04-01T00:00', headers=headers()))),
+        ('GET /api/notes/calendar', lambda i: ok(client.get(
+            '/api/notes/calendar?from=2024-01-01T00:00&to=2025-01-01T00:00&bucket=week', headers=headers()))),
+        ('GET /api/users', lambda i: ok(client.get('/api/users?limit=50'))),
+        ('GET /api/users/autocomplete', lambda i: ok(client.get(f'/api/users/autocomplete?prefix=user00{rng.randrange(10)}'))),
+        ('GET /api/users/<id>', lambda i: ok(client.get(f'/api/users/{rng.randrange(1, user_count + 1)}'))),
+        ('PUT /api/users/<id>', update_user),
+        ('POST+DELETE /api/users/<id>', create_and_delete_user),
+    ]
+
+def model_cases(rng, user_count):
+    """(name, fn) pairs calling the Note/User query methods directly"""
+    from bench.seed import TAGS, WORDS
+    from src.models.note_sqlite import Note
+    from src.models.user_sqlite import User
+
+    fixed_ids = [note._id for note in Note.find_all(user_id=1)] or [0]
+
+    def user():
+        return rng.randrange(1, user_count + 1)
+
+    return [
+        ('Note.find_all', lambda i: Note.find_all(user_id=user()) is not None),
+        ('Note.find_by_id', lambda i: Note.find_by_id(rng.choice(fixed_ids), user_id=1) is not None),
+        ('Note.search', lambda i: Note.search(rng.choice(WORDS), user_id=user()) is not None),
+        ('Note.find_by_tag', lambda i: Note.find_by_tag(rng.choice(TAGS), user_id=user()) is not None),
+        ('Note.get_all_tags', lambda i: Note.get_all_tags(user_id=user()) is not None),
+        ('Note.find_in_range', lambda i: Note.find_in_range(
+            '2024-03-01T00:00:00', '2024-04-01T00:00:00', user_id=user()) is not None),
+        ('Note.count_by_bucket', lambda i: Note.count_by_bucket(
+            '2024-01-01T00:00:00', '2025-01-01T00:00:00', bucket='week', user_id=user()) is not None),
+        ('User.find_page', lambda i: User.find_page(limit=50)[0] is not None),
+        ('User.find_by_username_prefix', lambda i: User.find_by_username_prefix(f'user00{rng.randrange(10)}') is not None),
+        ('User.find_by_id', lambda i: User.find_by_id(user()) is not None),
+        ('User.find_by_email', lambda i: User.find_by_email(f'USER{user()}@example.com') is not None),
+    ]
+
+def ai_cases(client):
+    """(name, fn) pairs for the AI routes; the upstream is the local mock server"""
+    def post(path, body):
+        return lambda i: client.post(path, json=body, headers={'X-User-Id': '1'}).status_code == 200
+
+    text = 'Quarterly planning meeting with the design team to review the roadmap and budget.'
+    return [
+        ('POST /api/ai/summarize', post('/api/ai/summarize', {'content': text})),
+        ('POST /api/ai/generate-tags', post('/api/ai/generate-tags', {'title': 'Planning', 'content': text})),
+        ('POST /api/ai/generate-tags (model)', post('/api/ai/generate-tags', {'title': 'Planning', 'content': text, 'second_opinion': True})),
+        ('POST /api/ai/improve-content', post('/api/ai/improve-content', {'content': text, 'type': 'grammar'})),
+        ('POST /api/ai/chat', post('/api/ai/chat', {'question': 'What is this about?'})),
+        ('POST /api/ai/search-assist', post('/api/ai/search-assist', {'query': 'planning'})),
+        ('POST /api/ai/smart-create', post('/api/ai/smart-create', {'text': 'Dentist tomorrow at 3pm'})),
+        # Vague timing the local parser defers to the model
+        ('POST /api/ai/smart-create (model)', post('/api/ai/smart-create', {'text': 'Gym with Alex tomorrow morning'})),
+        ('POST /api/ai/translate', post('/api/ai/translate', {'title': 'Planning', 'content': text, 'target_language': 'japanese'})),
+    ]
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT, text=True).strip()
+    except Exception:
+        return None
+
+def run(args):
+    data_dir = tempfile.mkdtemp(prefix='notes-bench-')
+    # These must be set before src modules create their global instances
+    os.environ['DATABASE_DIR'] = data_dir
+    os.environ.setdefault('SLOW_QUERY_MS', '-1')
+    os.environ.setdefault('GITHUB_TOKEN', 'bench-token')
+    # Background summaries of saved notes would put model calls behind the route timings
+    os.environ.setdefault('NOTE_SUMMARIES', '0')
+    mock = None
+    if not args.skip_ai:
+        from bench.mock_models_server import start_mock_server
+        mock, mock_url = start_mock_server(latency=args.ai_latency, seed=args.seed)
+        os.environ['GITHUB_MODELS_ENDPOINT'] = mock_url
+    os.environ.pop('FLASK_ENV', None)
+    os.environ.pop('VERCEL', None)
+
+    try:
+        from bench.seed import seed
+        from src.main import app
+        import sqlite3
+        logging.getLogger().setLevel(logging.WARNING)
+
+        print(f"Seeding {args.scale} notes into {data_dir} ...")
+        seed_start = time.perf_counter()
+        note_count, user_count = seed(args.scale, seed_value=args.seed)
+        seed_seconds = time.perf_counter() - seed_start
+        print(f"Seeded {note_count} notes / {user_count} users in {seed_seconds:.1f}s")
+
+        rng = random.Random(args.seed)
+        client = app.test_client()
+        results = []
+
+        print("Routes:")
+        for name, fn in route_cases(client, rng, user_count):
+            results.append(measure(name, 'route', fn, args.iterations))
+
+        print("Model:")
+        for name, fn in model_cases(rng, user_count):
+            results.append(measure(name, 'model', fn, args.iterations))
+
+        if mock:
+            print(f"AI (mock upstream, latency={args.ai_latency}):")
+            for name, fn in ai_cases(client):
+                results.append(measure(name, 'ai', fn, args.ai_iterations))
+
+        report = {
+            'meta': {
+                'scale': args.scale,
+                'notes': note_count,
+                'users': user_count,
+                'iterations': args.iterations,
+                'ai_iterations': 0 if args.skip_ai else args.ai_iterations,
+                'ai_latency': None if args.skip_ai else args.ai_latency,
+                'seed': args.seed,
+                'seed_seconds': round(seed_seconds, 2),
+                'timestamp': datetime.utcnow().isoformat(),
+                'git_commit': git_commit(),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'sharding': os.environ.get('DB_SHARDING', ''),
+            },
+            'results': results,
+        }
+
+        output = args.output or os.path.join(
+            PROJECT_ROOT, 'bench', 'results', f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{args.scale}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {output}")
+    finally:
+        if mock:
+            mock.shutdown()
+        if not args.keep_db:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def compare(args):
+    """Print p50/p99 changes between two result files"""
+    with open(args.baseline) as f:
+        baseline = {(r['kind'], r['name']): r for r in json.load(f)['results']}
+    with open(args.candidate) as f:
+        candidate = json.load(f)['results']
+
+    print(f"{'benchmark':52} {'p50 ms':>18} {'p99 ms':>18}")
+    for result in candidate:
+        before = baseline.get((result['kind'], result['name']))
+        if not before:
+            continue
+        cells = []
+        for key in ('p50_ms', 'p99_ms'):
+            old, new = before[key], result[key]
+            change = f"{(new - old) / old * 100:+.0f}%" if old else 'n/a'
+            cells.append(f"{new:9.3f} ({change:>5})")
+        print(f"{result['kind'] + ' ' + result['name']:52} {cells[0]:>18} {cells[1]:>18}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command')
+
+    compare_parser = subparsers.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+
+    parser.add_argument('--scale', default='1k', help='1k, 100k, 1m or an explicit note count')
+    parser.add_argument('--iterations', type=int, default=200, help='timed calls per route/method')
+    parser.add_argument('--ai-iterations', type=int, default=50, help='timed calls per AI route')
+    parser.add_argument('--skip-ai', action='store_true', help='do not benchmark the AI routes')
+    parser.add_argument('--ai-latency', default='fixed:0', help='mock upstream latency spec, e.g. lognormal:250,0.5')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and request mix')
+    parser.add_argument('--output', help='result JSON path (default bench/results/<timestamp>-<scale>.json)')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded temporary database')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        compare(args)
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Deterministic data generation for the benchmark database"""
+import json
+import random
+from datetime import datetime, timedelta
+
+from src.config.database_sqlite import database
+from src.config.content_codec import content_codec, make_preview
+from src.services.autocomplete import index_terms
+from src.services.fuzzy_match import owner_token
+
+SCALES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+WORDS = (
+    'meeting project budget review design sprint release customer report draft '
+    'invoice travel flight hotel dinner birthday gym doctor dentist grocery recipe '
+    'idea research paper reading book chapter lecture exam homework deadline launch '
+    'backlog roadmap quarterly planning retro standup interview hiring onboarding '
+    'garden repair insurance taxes mortgage savings vacation weekend family friends'
+).split()
+
+TAGS = [f'tag{i}' for i in range(40)] + ['work', 'personal', 'urgent', 'ideas', 'reading',
+                                         'travel', 'health', 'finance', 'family', 'study']
+
+BATCH_SIZE = 5_000
+
+def users_for_scale(note_count):
+    """One user per ~100 notes, so per-user data stays realistic as the table grows"""
+    return max(10, note_count // 100)
+
+def _sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+def seed_users(user_count, rng):
+    conn = database.get_connection()
+    try:
+        base = datetime(2024, 1, 1)
+        rows = []
+        for i in range(1, user_count + 1):
+            created_at = (base + timedelta(minutes=i)).isoformat()
+            rows.append((i, f'user{i:07d}', f'user{i}@example.com', '', created_at, created_at))
+        conn.executemany(
+            'INSERT INTO users (id, username, email, password_hash, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def _note_rows(rng, user_id, count):
+    base = datetime(2024, 1, 1)
+    for _ in range(count):
+        created_at = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 365))
+        updated_at = created_at + timedelta(minutes=rng.randrange(0, 60 * 24 * 30))
+        tags = rng.sample(TAGS, rng.randrange(0, 4))
+        start_time = end_time = None
+        if rng.random() < 0.3:
+            start = base + timedelta(hours=rng.randrange(0, 24 * 365))
+            start_time = start.isoformat()
+            end_time = (start + timedelta(minutes=rng.choice((30, 60, 90, 120)))).isoformat()
+        title = _sentence(rng, rng.randrange(2, 7)).capitalize()
+        content = _sentence(rng, rng.randrange(20, 120))
+        yield (
+            user_id,
+            title,
+            content_codec.encode(content),
+            make_preview(content),
+            json.dumps(tags),
+            start_time,
+            end_time,
+            created_at.isoformat(),
+            updated_at.isoformat(),
+        )
+
+def _insert_notes(user_id, rows):
+    conn = database.get_connection(user_id=user_id)
+    try:
+        cursor = conn.cursor()
+        for start in range(0, len(rows), BATCH_SIZE):
+            for row in rows[start:start + BATCH_SIZE]:
+                cursor.execute('''
+                    INSERT INTO notes (user_id, title, content, preview, tags, start_time, end_time, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', row)
+                note_id = cursor.lastrowid
+                cursor.executemany(
+                    'INSERT OR IGNORE INTO note_tags (note_id, user_id, tag) VALUES (?, ?, ?)',
+                    [(note_id, user_id, tag) for tag in json.loads(row[4])]
+                )
+                cursor.executemany(
+                    'INSERT OR IGNORE INTO note_terms (note_id, user_id, term, kind) VALUES (?, ?, ?, ?)',
+                    [(note_id, user_id, term, kind) for term, kind in index_terms(row[1], json.loads(row[4]))]
+                )
+                if database.fts_available:
+                    cursor.execute(
+                        'INSERT INTO notes_fts (rowid, title, content, tags, owner) VALUES (?, ?, ?, ?, ?)',
+                        (note_id, row[1], content_codec.decode(row[2]), ' '.join(json.loads(row[4])), owner_token(user_id))
+                    )
+            conn.commit()
+    finally:
+        conn.close()
+
+def seed_notes(note_count, user_count, rng):
+    """Spread notes over users; a tenth stay ownerless like pre-ownership data"""
+    per_user = {}
+    for _ in range(note_count):
+        user_id = None if rng.random() < 0.1 else rng.randrange(1, user_count + 1)
+        per_user[user_id] = per_user.get(user_id, 0) + 1
+
+    for user_id, count in sorted(per_user.items(), key=lambda item: (item[0] is not None, item[0] or 0)):
+        _insert_notes(user_id, list(_note_rows(rng, user_id, count)))
+
+def seed(scale, seed_value=42):
+    """Populate an empty database for a named scale, returning (note_count, user_count)"""
+    note_count = SCALES[scale] if scale in SCALES else int(scale)
+    user_count = users_for_scale(note_count)
+    rng = random.Random(seed_value)
+
+    seed_users(user_count, rng)
+    seed_notes(note_count, user_count, rng)
+
+    conn = database.get_connection()
+    try:
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    if database.sharding:
+        database.for_each_shard(lambda user_id, shard: shard.execute('ANALYZE'))
+    return note_count, user_count
@@ -1,18 +1,37 @@
 import os
-import requests
+import time
 import json
+import hashlib
 import logging
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
 from typing import List, Dict, Any, Optional
+from src.config.metrics import metrics
+from src.config.singleflight import SingleFlight
+from src.config.model_routing import load_routes, LatencyWindow, RETRYABLE_STATUSES
+
+# Never hedge sooner than this, however fast the primary has been lately
+MIN_HEDGE_DELAY = 0.2
 
 class GitHubModelsClient:
     def __init__(self):
         self.token = os.environ.get('GITHUB_TOKEN')
-        self.endpoint = "https://models.inference.ai.azure.com"
+        # Point at a local mock (bench/mock_models_server.py) for offline load testing
+        self.endpoint = os.environ.get('GITHUB_MODELS_ENDPOINT', 'https://models.inference.ai.azure.com').rstrip('/')
         self.headers = {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
         
+        # Identical concurrent requests share one upstream call unless AI_COALESCE=0
+        self.coalesce = os.environ.get('AI_COALESCE', '1').lower() not in ('0', 'false')
+        self._inflight = SingleFlight()
+        
+        # Per-task model chains and timeouts (src/config/model_routing.py); AI_HEDGING=0 turns off hedged requests
+        self.routes = load_routes()
+        self.hedging = os.environ.get('AI_HEDGING', '1').lower() not in ('0', 'false')
+        self._latency = LatencyWindow()
+        
         if not self.token:
             logging.error("GITHUB_TOKEN environment variable not set")
             print("⚠️ GITHUB_TOKEN not found - AI features will be disabled")
@@ -20,26 +39,31 @@ class GitHubModelsClient:
     async def chat_completion(
         self, 
         messages: List[Dict[str, str]], 
-        model: str = "gpt-4o-mini",
+        model: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        task: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Send a chat completion request to GitHub Models
         
         Args:
             messages: List of message objects with 'role' and 'content'
-            model: Model name to use
+            model: Model name to use; defaults to the task's primary model
             temperature: Randomness of the response (0-1)
             max_tokens: Maximum tokens in response
             system_prompt: Optional system prompt to prepend
+            task: Routing table entry (e.g. 'generate-tags') giving the model chain and timeout
         
         Returns:
             API response containing the generated text
         """
         if not self.token:
             return {"error": "GitHub token not configured"}
+        
+        # Deferred: requests adds ~60 ms to cold starts and is only needed for AI calls
+        import requests
             
         try:
             # Prepare messages with optional system prompt
@@ -53,29 +77,26 @@ class GitHubModelsClient:
             
             formatted_messages.extend(messages)
             
+            route = self.routes.get(task) or self.routes['default']
+            models = route.models if model is None else [model] + [m for m in route.models if m != model]
+            
             payload = {
                 "messages": formatted_messages,
-                "model": model,
+                "model": models[0],
                 "temperature": temperature,
                 "max_tokens": max_tokens,
                 "top_p": 1.0
             }
             
-            response = requests.post(
-                f"{self.endpoint}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            if not self.coalesce:
+                return self._routed(payload, route, models)
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logging.error(f"GitHub Models API error: {response.status_code} - {response.text}")
-                return {
-                    "error": f"API request failed with status {response.status_code}",
-                    "details": response.text
-                }
+            result, shared = self._inflight.do(self.request_key(payload), lambda: self._routed(payload, route, models))
+            if shared:
+                metrics.ai_coalesced.inc(models[0])
+                # Only the caller that made the upstream call is charged for its tokens
+                result["coalesced"] = True
+            return result
                 
         except requests.exceptions.Timeout:
             return {"error": "Request timed out"}
@@ -85,6 +106,145 @@ class GitHubModelsClient:
             logging.error(f"Unexpected error in chat_completion: {str(e)}")
             return {"error": f"Unexpected error: {str(e)}"}
     
+    def _routed(self, payload: Dict[str, Any], route, models: List[str]) -> Dict[str, Any]:
+        """Run a request down the route's model chain, hedging and falling back as configured
+        
+        Attempts that may need to be raced run on their own threads; the
+        loser of a hedge is left to finish in the background and ignored.
+        """
+        remaining = list(models)
+        hedge_after = None
+        if self.hedging and route.hedge_percentile and len(remaining) > 1:
+            hedge_after = self._latency.percentile((route.task, remaining[0]), route.hedge_percentile)
+            if hedge_after is not None:
+                hedge_after = max(hedge_after, MIN_HEDGE_DELAY)
+        
+        pending = {}
+        
+        def launch(outcome):
+            attempt = {**payload, "model": remaining.pop(0)}
+            future = Future()
+            if hedge_after is None:
+                future.set_result(self._attempt(attempt, route))
+            else:
+                threading.Thread(target=self._resolve, args=(future, attempt, route), daemon=True).start()
+            pending[future] = outcome
+            return future
+        
+        primary = launch('primary')
+        hedged = False
+        result = None
+        while pending:
+            racing = hedge_after is not None and not hedged and primary in pending and remaining
+            done, _ = wait(pending, timeout=hedge_after if racing else None, return_when=FIRST_COMPLETED)
+            if not done:
+                # The primary is slower than its recent percentile: race the next model
+                hedged = True
+                metrics.ai_hedges.inc(route.task)
+                launch('hedge')
+                continue
+            for future in done:
+                outcome = pending.pop(future)
+                result = future.result()
+                if not self._retryable(result):
+                    metrics.ai_route_outcomes.inc(route.task, 'failed' if "error" in result else outcome)
+                    return result
+            if not pending and remaining:
+                launch('fallback')
+        
+        metrics.ai_route_outcomes.inc(route.task, 'failed')
+        return result
+    
+    def _resolve(self, future: Future, payload: Dict[str, Any], route) -> None:
+        try:
+            future.set_result(self._attempt(payload, route))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    def _attempt(self, payload: Dict[str, Any], route) -> Dict[str, Any]:
+        """One upstream call with the route's timeout; transport errors come back as error dicts"""
+        import requests
+        
+        start = time.perf_counter()
+        try:
+            result = self._post(payload, timeout=route.timeout)
+        except requests.exceptions.Timeout:
+            return {"error": "Request timed out", "status": "timeout"}
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Request failed: {str(e)}", "status": "error"}
+        if "error" not in result:
+            self._latency.record((route.task, payload["model"]), time.perf_counter() - start)
+        return result
+    
+    @staticmethod
+    def _retryable(result: Dict[str, Any]) -> bool:
+        """Whether a failed attempt is worth repeating on the next model in the chain"""
+        if "error" not in result:
+            return False
+        status = result.get("status")
+        return status in ('timeout', 'error') or status in RETRYABLE_STATUSES
+    
+    def _post(self, payload: Dict[str, Any], timeout: float = 30) -> Dict[str, Any]:
+        """Send one request upstream, recording its latency and token usage"""
+        import requests
+        
+        model = payload["model"]
+        start = time.perf_counter()
+        try:
+            response = requests.post(
+                f"{self.endpoint}/chat/completions",
+                headers=self.headers,
+                json=payload,
+                timeout=timeout
+            )
+        except requests.exceptions.RequestException as e:
+            status = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'error'
+            metrics.record_ai_call(model, status, time.perf_counter() - start)
+            raise
+        
+        if response.status_code == 200:
+            result = response.json()
+            metrics.record_ai_call(model, 200, time.perf_counter() - start, result.get('usage'))
+            return result
+        else:
+            metrics.record_ai_call(model, response.status_code, time.perf_counter() - start)
+            logging.error(f"GitHub Models API error: {response.status_code} - {response.text}")
+            return {
+                "error": f"API request failed with status {response.status_code}",
+                "details": response.text,
+                "status": response.status_code
+            }
+    
+    @staticmethod
+    def request_key(payload: Dict[str, Any]) -> str:
+        """Hash of a request with insignificant differences normalized away
+        
+        Message text is stripped and JSON keys are sorted, so two tabs
+        sending the same note with a trailing newline still share a call.
+        """
+        normalized = dict(payload)
+        normalized["messages"] = [
+            {**message, "content": (message.get("content") or "").strip()}
+            for message in payload["messages"]
+        ]
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def extract_usage(response: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Token counts this caller spent, from the response's usage block
+        
+        Errors and responses shared from another caller's request count as zero.
+        """
+        usage = {} if "error" in response or response.get("coalesced") else (response.get("usage") or {})
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    
     def extract_content(self, response: Dict[str, Any]) -> str:
         """
         Extract the content from API response
@@ -107,9 +267,19 @@ class GitHubModelsClient:
         except Exception as e:
             return f"Error extracting content: {str(e)}"
 
-# Global AI client instance
-try:
-    ai_client = GitHubModelsClient()
-except Exception as e:
-    print(f"⚠️ AI client initialization failed: {e}")
-    ai_client = None
\ No newline at end of file
+# Global AI client instance, built on first use rather than at import time
+_ai_client = None
+_ai_client_lock = threading.Lock()
+
+def get_ai_client():
+    """Return the shared GitHubModelsClient, constructing it on first call"""
+    global _ai_client
+    if _ai_client is None:
+        with _ai_client_lock:
+            if _ai_client is None:
+                try:
+                    _ai_client = GitHubModelsClient()
+                except Exception as e:
+                    print(f"⚠️ AI client initialization failed: {e}")
+                    return None
+    return _ai_client
\ No newline at end of file
@@ -0,0 +1,90 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+from src.config.metrics import metrics
+from src.models.ai_usage_sqlite import AIUsage, today
+
+class AIQuota:
+    """Daily AI token and request limits, checked before a request reaches the model
+
+    Limits are per UTC day; 0 or unset means unlimited:
+        AI_USER_DAILY_TOKENS     tokens per user across all routes
+        AI_USER_DAILY_REQUESTS   model calls per user across all routes
+        AI_ROUTE_DAILY_TOKENS    JSON {"translate": 20000}: tokens per user on one route
+        AI_DAILY_TOKEN_BUDGET    tokens across every user, protecting the shared upstream quota
+
+    Usage is always recorded, so GET /api/ai/usage works with no limits set.
+    Checks run at admission, so calls already in flight can overshoot a
+    limit by at most their own size.
+    """
+    def __init__(self):
+        self.user_tokens = int(os.environ.get('AI_USER_DAILY_TOKENS', '0'))
+        self.user_requests = int(os.environ.get('AI_USER_DAILY_REQUESTS', '0'))
+        self.budget_tokens = int(os.environ.get('AI_DAILY_TOKEN_BUDGET', '0'))
+        try:
+            self.route_tokens = {route: int(limit) for route, limit in json.loads(os.environ.get('AI_ROUTE_DAILY_TOKENS', '{}')).items()}
+        except (ValueError, AttributeError) as e:
+            logging.error(f"Ignoring invalid AI_ROUTE_DAILY_TOKENS: {e}")
+            self.route_tokens = {}
+
+    def record(self, user_id, route, usage):
+        """Charge one model call's token usage to the caller"""
+        AIUsage.record(user_id, route or 'other', usage['prompt_tokens'], usage['completion_tokens'])
+
+    def check(self, user_id, route):
+        """Return None if the caller may use the route now, else a dict describing the exceeded limit"""
+        if not (self.user_tokens or self.user_requests or self.route_tokens.get(route) or self.budget_tokens):
+            return None
+
+        if self.user_tokens or self.user_requests or self.route_tokens.get(route):
+            by_route = AIUsage.user_totals(user_id)
+            tokens = sum(totals['total_tokens'] for totals in by_route.values())
+            requests = sum(totals['requests'] for totals in by_route.values())
+            route_tokens = by_route.get(route, {}).get('total_tokens', 0)
+            if self.user_tokens and tokens >= self.user_tokens:
+                return self._exceeded(route, 'user_tokens', self.user_tokens, tokens)
+            if self.user_requests and requests >= self.user_requests:
+                return self._exceeded(route, 'user_requests', self.user_requests, requests)
+            if self.route_tokens.get(route) and route_tokens >= self.route_tokens[route]:
+                return self._exceeded(route, 'route_tokens', self.route_tokens[route], route_tokens)
+
+        if self.budget_tokens:
+            used = AIUsage.day_totals()['total_tokens']
+            if used >= self.budget_tokens:
+                return self._exceeded(route, 'budget_tokens', self.budget_tokens, used)
+        return None
+
+    def status(self, user_id):
+        """The caller's usage today against each configured limit"""
+        by_route = AIUsage.user_totals(user_id)
+        tokens = sum(totals['total_tokens'] for totals in by_route.values())
+        requests = sum(totals['requests'] for totals in by_route.values())
+        limits = {}
+        if self.user_tokens:
+            limits['user_tokens'] = {'limit': self.user_tokens, 'used': tokens}
+        if self.user_requests:
+            limits['user_requests'] = {'limit': self.user_requests, 'used': requests}
+        for route, limit in self.route_tokens.items():
+            limits[f'route_tokens:{route}'] = {'limit': limit, 'used': by_route.get(route, {}).get('total_tokens', 0)}
+        for entry in limits.values():
+            entry['remaining'] = max(0, entry['limit'] - entry['used'])
+        return {'day': today(), 'resets_in': self.seconds_until_reset(), 'by_route': by_route, 'limits': limits}
+
+    @staticmethod
+    def seconds_until_reset():
+        now = datetime.utcnow()
+        midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        return int((midnight - now).total_seconds()) + 1
+
+    def _exceeded(self, route, limit_name, limit, used):
+        metrics.ai_quota_rejections.inc(route, limit_name)
+        return {
+            'error': 'AI usage limit reached for today',
+            'limit': limit_name,
+            'allowed': limit,
+            'used': used,
+            'retry_after': self.seconds_until_reset()
+        }
+
+ai_quota = AIQuota()
@@ -0,0 +1,155 @@
+import os
+import zlib
+import logging
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli  # Optional: adds Content-Encoding: br
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard  # Optional: adds Content-Encoding: zstd
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            # Sync-flush every chunk so server-sent events reach the client immediately
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def stream(self, chunks):
+        compressor = self.compressor.compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+class ResponseCompressor:
+    """Content-negotiated compression for API responses
+
+    Runs as an after_request hook. The client's Accept-Encoding picks zstd,
+    br or gzip (zstd and br only when their modules are installed). Bodies
+    below COMPRESS_MIN_BYTES are sent as-is. Streamed responses are
+    compressed chunk by chunk and flushed after each one. Responses that
+    already carry a Content-Encoding, such as precompressed static assets,
+    are left alone.
+    """
+    def __init__(self):
+        self.min_bytes = 1024
+        self.encoders = {}
+
+    def init_app(self, app):
+        self.min_bytes = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+        # Defaults favour speed: API bodies are compressed on every request, unlike static files
+        self.encoders = {'gzip': GzipEncoder(int(os.environ.get('COMPRESS_LEVEL', '6')))}
+        if brotli is not None:
+            self.encoders['br'] = BrotliEncoder(int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5')))
+        if zstandard is not None:
+            self.encoders['zstd'] = ZstdEncoder(int(os.environ.get('COMPRESS_ZSTD_LEVEL', '3')))
+        # Negative threshold disables compression
+        if self.min_bytes >= 0:
+            app.after_request(self.compress_response)
+            logger.info(f"🗜️ Response compression enabled: {', '.join(self.encoders)} (>= {self.min_bytes} bytes)")
+
+    def choose_encoder(self):
+        # Server preference breaks ties between equally weighted encodings
+        match = request.accept_encodings.best_match([name for name in ('zstd', 'br', 'gzip') if name in self.encoders])
+        return self.encoders.get(match)
+
+    def _should_compress(self, response):
+        if request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        if 'no-transform' in response.headers.get('Cache-Control', ''):
+            return False
+        return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+    def compress_response(self, response):
+        if not self._should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if not response.is_streamed:
+            # Size check before negotiation keeps small responses free of any extra work
+            data = response.get_data()
+            if len(data) < self.min_bytes:
+                return response
+
+        encoder = self.choose_encoder()
+        if encoder is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(encoder, response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            compressed = encoder.compress(data)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoder.name
+        etag, weak = response.get_etag()
+        if etag:
+            # A compressed body is a different representation of the resource
+            response.set_etag(f'{etag}-{encoder.name}', weak)
+        return response
+
+    @staticmethod
+    def _stream(encoder, original):
+        chunks = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in original)
+        try:
+            yield from encoder.stream(chunks)
+        finally:
+            close = getattr(original, 'close', None)
+            if close:
+                close()
+
+compressor = ResponseCompressor()
@@ -0,0 +1,80 @@
+import os
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard  # Optional: NOTE_COMPRESSION=zstd
+except ImportError:
+    zstandard = None
+
+# First byte of a compressed content BLOB; uncompressed content stays TEXT
+MARKER_ZLIB = b'\x01'
+MARKER_ZSTD = b'\x02'
+
+PREVIEW_CHARS = 200
+
+class ContentCodec:
+    """Storage format for notes.content
+
+    Content shorter than NOTE_COMPRESSION_MIN_BYTES, or any content when
+    NOTE_COMPRESSION is off, is stored as plain TEXT. Longer content is stored
+    as a BLOB: a marker byte naming the codec, then the compressed UTF-8. Rows
+    written under any setting remain readable, since decode() looks at the
+    stored type and marker rather than the current configuration.
+    """
+    def __init__(self):
+        self.algorithm = os.environ.get('NOTE_COMPRESSION', 'off').lower()
+        self.min_bytes = int(os.environ.get('NOTE_COMPRESSION_MIN_BYTES', '1024'))
+        self.level = int(os.environ.get('NOTE_COMPRESSION_LEVEL', '6'))
+        if self.algorithm == 'zstd' and zstandard is None:
+            logger.warning("⚠️ NOTE_COMPRESSION=zstd but zstandard is not installed, using zlib")
+            self.algorithm = 'zlib'
+        if self.algorithm not in ('off', 'zlib', 'zstd'):
+            logger.warning(f"⚠️ Unknown NOTE_COMPRESSION={self.algorithm}, storing content uncompressed")
+            self.algorithm = 'off'
+
+    @property
+    def enabled(self):
+        return self.algorithm != 'off'
+
+    def encode(self, text):
+        """Return the value to store for content: str, or marker-prefixed bytes"""
+        if text is None or not self.enabled:
+            return text
+        raw = text.encode('utf-8')
+        if len(raw) < self.min_bytes:
+            return text
+        if self.algorithm == 'zstd':
+            packed = MARKER_ZSTD + zstandard.ZstdCompressor(level=self.level).compress(raw)
+        else:
+            packed = MARKER_ZLIB + zlib.compress(raw, self.level)
+        # Not worth a BLOB (and a decompress on every read) unless it saves space
+        return packed if len(packed) < len(raw) else text
+
+    def decode(self, value):
+        """Return stored content as text, whatever format it was written in"""
+        if not isinstance(value, (bytes, memoryview)):
+            return value
+        value = bytes(value)
+        marker, payload = value[:1], value[1:]
+        if marker == MARKER_ZLIB:
+            return zlib.decompress(payload).decode('utf-8')
+        if marker == MARKER_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Note content is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+        return value.decode('utf-8')
+
+    def is_current(self, value):
+        """Whether a stored value already matches what encode() would write now"""
+        return self.encode(self.decode(value)) == value
+
+def make_preview(text):
+    """Leading slice of content for list views that do not need the full body"""
+    if not text:
+        return ''
+    return text[:PREVIEW_CHARS]
+
+content_codec = ContentCodec()
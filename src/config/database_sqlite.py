@@ -1,78 +1,500 @@
 import os
+import re
+import json
 import sqlite3
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from src.config.metrics import InstrumentedConnection
+from src.config.content_codec import content_codec, make_preview
+from src.services.fuzzy_match import owner_token
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class _ShardHandle:
+    """An open shard connection kept in the LRU cache"""
+    def __init__(self, path, conn):
+        self.path = path
+        self.conn = conn
+        # Serializes use of the shared connection; re-entrant for nested use in one thread
+        self.lock = threading.RLock()
+        self.in_use = 0
+
+class _PooledConnection:
+    """Connection proxy handed out for a cached shard
+    
+    Model code calls close() on every connection it gets; for a shard that
+    returns the handle to the cache instead of closing the file.
+    """
+    def __init__(self, database, handle):
+        self._database = database
+        self._handle = handle
+        self._released = False
+        handle.lock.acquire()
+    
+    def __getattr__(self, name):
+        return getattr(self._handle.conn, name)
+    
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            if self._handle.conn.in_transaction:
+                self._handle.conn.rollback()
+        finally:
+            self._handle.lock.release()
+            self._database._release_shard(self._handle)
+
 class Database:
+    SHARD_FILE_PATTERN = re.compile(r'^user_(\d+)\.db$')
+    
     def __init__(self):
         self.is_production = os.environ.get('VERCEL') == '1' or os.environ.get('FLASK_ENV') == 'production'
+        self._schema_ready = False
+        # Job workers and the first request can open the database at the same moment
+        self._schema_lock = threading.Lock()
+        # Whether this SQLite build has the FTS5 trigram tokenizer (set when the schema is created)
+        self.fts_available = False
+        
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.data_dir = os.environ.get('DATABASE_DIR') or os.path.join(project_root, 'database')
+        
+        # Sharded mode: each user's notes live in their own file under database/shards/
+        self.sharding = os.environ.get('DB_SHARDING', '').lower() in ('1', 'true', 'user') and not self.is_production
+        self.max_open_shards = int(os.environ.get('DB_MAX_OPEN_SHARDS', '64'))
+        self._shards = OrderedDict()
+        self._shards_lock = threading.Lock()
         
     def init_app(self, app):
         if self.is_production:
             logger.info("🔥 Vercel deployment - using in-memory database")
+        elif self.sharding:
+            logger.info(f"💽 Local development - using file database with per-user shards (max {self.max_open_shards} open)")
         else:
             logger.info("💽 Local development - using file database")
         
-    def get_connection(self):
-        """获取数据库连接"""
+    def get_connection(self, user_id=None):
+        """获取数据库连接
+        
+        With sharding enabled, a user_id routes to that user's shard; the main
+        database holds users and notes without an owner.
+        """
         try:
+            if self.sharding and user_id is not None:
+                return self._get_shard_connection(int(user_id))
+            
             if self.is_production:
                 # Vercel: 使用内存数据库，每次都重新创建
-                conn = sqlite3.connect(':memory:')
-                conn.row_factory = sqlite3.Row
-                
-                # 创建表结构
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE notes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        content TEXT NOT NULL,
-                        tags TEXT DEFAULT '[]',
-                        start_time TEXT,
-                        end_time TEXT,
-                        created_at TEXT NOT NULL,
-                        updated_at TEXT NOT NULL
-                    )
-                ''')
-                conn.commit()
+                conn = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+                self._prepare_connection(conn)
+                self._create_schema(conn)
                 return conn
             else:
                 # 本地开发：使用文件数据库
-                project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-                db_path = os.path.join(project_root, 'database', 'app.db')
+                db_path = os.path.join(self.data_dir, 'app.db')
                 
                 # 确保目录存在
                 os.makedirs(os.path.dirname(db_path), exist_ok=True)
                 
-                conn = sqlite3.connect(db_path)
-                conn.row_factory = sqlite3.Row
+                conn = sqlite3.connect(db_path, factory=InstrumentedConnection)
+                self._prepare_connection(conn)
                 
-                # 创建表结构（如果不存在）
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS notes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        content TEXT NOT NULL,
-                        tags TEXT DEFAULT '[]',
-                        start_time TEXT,
-                        end_time TEXT,
-                        created_at TEXT NOT NULL,
-                        updated_at TEXT NOT NULL
-                    )
-                ''')
-                conn.commit()
+                # 创建表结构（如果不存在）- 每个进程只需执行一次
+                if not self._schema_ready:
+                    with self._schema_lock:
+                        if not self._schema_ready:
+                            self._create_schema(conn)
+                            self._schema_ready = True
                 return conn
                 
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
             return None
     
+    def _prepare_connection(self, conn):
+        conn.row_factory = sqlite3.Row
+        # Lets SQL (e.g. LIKE search) see compressed note content as text
+        conn.create_function('note_content', 1, content_codec.decode, deterministic=True)
+    
+    @property
+    def shard_dir(self):
+        return os.path.join(self.data_dir, 'shards')
+    
+    def shard_path(self, user_id):
+        return os.path.join(self.shard_dir, f'user_{int(user_id)}.db')
+    
+    def _get_shard_connection(self, user_id):
+        """Check out a cached connection to a user's shard, opening it if needed"""
+        path = self.shard_path(user_id)
+        with self._shards_lock:
+            handle = self._shards.get(path)
+            if handle:
+                self._shards.move_to_end(path)
+            else:
+                handle = _ShardHandle(path, self._open_shard(path))
+                self._shards[path] = handle
+            handle.in_use += 1
+            self._evict_idle_shards()
+        return _PooledConnection(self, handle)
+    
+    def _open_shard(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, factory=InstrumentedConnection)
+        self._prepare_connection(conn)
+        cursor = conn.cursor()
+        self._enable_incremental_vacuum(cursor)
+        # WAL lets readers proceed while the tenant's writer holds the lock
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_note_schema(cursor)
+        conn.commit()
+        return conn
+    
+    def _release_shard(self, handle):
+        with self._shards_lock:
+            handle.in_use -= 1
+            self._evict_idle_shards()
+    
+    def _evict_idle_shards(self):
+        """Close least recently used shards beyond the cap; caller holds _shards_lock"""
+        if len(self._shards) <= self.max_open_shards:
+            return
+        for path in list(self._shards):
+            if len(self._shards) <= self.max_open_shards:
+                break
+            handle = self._shards[path]
+            if handle.in_use == 0:
+                del self._shards[path]
+                handle.conn.close()
+    
+    def close_shards(self):
+        """Close every idle cached shard connection"""
+        with self._shards_lock:
+            for path, handle in list(self._shards.items()):
+                if handle.in_use == 0:
+                    del self._shards[path]
+                    handle.conn.close()
+    
+    def list_shards(self):
+        """Return the user ids that have a shard file, sorted"""
+        if not os.path.isdir(self.shard_dir):
+            return []
+        user_ids = []
+        for name in os.listdir(self.shard_dir):
+            match = self.SHARD_FILE_PATTERN.match(name)
+            if match:
+                user_ids.append(int(match.group(1)))
+        return sorted(user_ids)
+    
+    def for_each_shard(self, fn):
+        """Run fn(user_id, conn) against every shard, returning {user_id: result}
+        
+        Shards are visited one at a time through the LRU cache, so an admin
+        sweep never holds more than max_open_shards files open.
+        """
+        results = {}
+        for user_id in self.list_shards():
+            conn = self._get_shard_connection(user_id)
+            try:
+                results[user_id] = fn(user_id, conn)
+            finally:
+                conn.close()
+        return results
+    
+    def _create_schema(self, conn):
+        """创建表结构和索引（如果不存在）"""
+        cursor = conn.cursor()
+        self._enable_incremental_vacuum(cursor)
+        self._create_note_schema(cursor)
+        self._create_user_schema(cursor)
+        self._create_job_schema(cursor)
+        self._create_ai_usage_schema(cursor)
+        conn.commit()
+    
+    def _create_note_schema(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tags TEXT DEFAULT '[]',
+                start_time TEXT,
+                end_time TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        # Notes are owned by a user; legacy rows keep user_id NULL (shared/anonymous)
+        self._ensure_column(cursor, 'notes', 'user_id', 'INTEGER')
+        # Short plain-text copy of content for list views; content itself may be a compressed BLOB
+        if self._ensure_column(cursor, 'notes', 'preview', 'TEXT'):
+            self._backfill_note_previews(cursor)
+        # Schema version 1: start_time/end_time are stored as naive UTC, so they compare correctly as text
+        if cursor.execute('PRAGMA user_version').fetchone()[0] < 1:
+            self._normalize_note_times(cursor)
+            cursor.execute('PRAGMA user_version = 1')
+        # Set when a note is moved to the trash; trashed rows are purged by a background job
+        self._ensure_column(cursor, 'notes', 'deleted_at', 'TEXT')
+        # Partial indexes over live notes only, so trash never widens a scan. Queries must say
+        # "deleted_at IS NULL" for SQLite to use them.
+        for legacy in ('idx_notes_user_updated', 'idx_notes_user_start', 'idx_notes_user_end'):
+            cursor.execute(f'DROP INDEX IF EXISTS {legacy}')
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_notes_live_user_updated ON notes (user_id, updated_at) WHERE deleted_at IS NULL')
+        # Calendar range queries bound on start_time and filter on end_time
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_notes_live_user_start ON notes (user_id, start_time) WHERE deleted_at IS NULL')
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_notes_live_user_end ON notes (user_id, end_time) WHERE deleted_at IS NULL')
+        # The trash listing and the purge job only ever touch trashed rows
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_notes_trash_user ON notes (user_id, deleted_at) WHERE deleted_at IS NOT NULL')
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_notes_trash_deleted ON notes (deleted_at) WHERE deleted_at IS NOT NULL')
+        
+        # One row per (note, tag) so tag lookups are indexed instead of LIKE over JSON
+        has_note_tags = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_tags'"
+        ).fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_tags (
+                note_id INTEGER NOT NULL,
+                user_id INTEGER,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (note_id, tag)
+            )
+        ''')
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_note_tags_user_tag ON note_tags (user_id, tag)')
+        if not has_note_tags:
+            self._backfill_note_tags(cursor)
+        
+        # Lowercased title words, whole titles and tags, range-scanned for autocomplete
+        has_note_terms = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_terms'"
+        ).fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_terms (
+                note_id INTEGER NOT NULL,
+                user_id INTEGER,
+                term TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                PRIMARY KEY (note_id, term, kind)
+            )
+        ''')
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_note_terms_user_term ON note_terms (user_id, term)')
+        if not has_note_terms:
+            self._backfill_note_terms(cursor)
+        
+        # Trigram index for fuzzy search. It keeps its own plain-text copy, since notes.content may be compressed,
+        # and an indexed owner token so a MATCH only visits the searching user's rows
+        notes_fts = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+        ).fetchone()
+        has_notes_fts = notes_fts is not None and 'UNINDEXED' not in notes_fts[0]
+        try:
+            if notes_fts is not None and not has_notes_fts:
+                # Built before the owner column: rebuild it from notes
+                cursor.execute('DROP TABLE notes_fts')
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts
+                USING fts5(title, content, tags, owner, tokenize = 'trigram')
+            ''')
+            self.fts_available = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ FTS5 trigram index unavailable, fuzzy search disabled: {e}")
+        else:
+            if not has_notes_fts:
+                self._backfill_note_search(cursor)
+        
+        # Cached model summaries, valid only while the note's content still hashes the same
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_summaries (
+                note_id INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (note_id, content_hash)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Version history: body is a full snapshot or a delta from the previous revision (see NoteRevision).
+        # Not WITHOUT ROWID, since snapshot rows can span pages.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_revisions (
+                note_id INTEGER NOT NULL,
+                revision INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                title TEXT NOT NULL,
+                tags TEXT DEFAULT '[]',
+                body TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (note_id, revision)
+            )
+        ''')
+    
+    def _create_user_schema(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                email TEXT NOT NULL COLLATE NOCASE,
+                password_hash TEXT DEFAULT '',
+                created_at TEXT NOT NULL,
+                updated_at TEXT
+            )
+        ''')
+        # Older databases were created without updated_at on users
+        self._ensure_column(cursor, 'users', 'updated_at', 'TEXT')
+        
+        self._create_index(cursor, 'CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users (username)')
+        self._create_index(cursor, 'CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email COLLATE NOCASE)')
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at, id)')
+    
+    def _create_job_schema(self, cursor):
+        # Background jobs live in the main database even when notes are sharded
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL DEFAULT '{}',
+                user_id INTEGER,
+                status TEXT NOT NULL DEFAULT 'queued',
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                run_after TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                locked_by TEXT,
+                locked_at TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        # Workers claim the highest-priority ready job; only queued rows are indexed
+        self._create_index(cursor, "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (priority DESC, run_after, id) WHERE status = 'queued'")
+        self._create_index(cursor, "CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at)")
+    
+    def _create_ai_usage_schema(self, cursor):
+        # One row per (day, user, route) rather than per request; anonymous callers are user_id 0
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ai_usage (
+                day TEXT NOT NULL,
+                user_id INTEGER NOT NULL DEFAULT 0,
+                route TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, user_id, route)
+            ) WITHOUT ROWID
+        ''')
+        self._create_index(cursor, 'CREATE INDEX IF NOT EXISTS idx_ai_usage_user_day ON ai_usage (user_id, day)')
+    
+    def _enable_incremental_vacuum(self, cursor):
+        """Let purges hand freed pages back with PRAGMA incremental_vacuum
+        
+        auto_vacuum can only be switched on before the first table exists, so
+        this applies to new files. An existing database keeps its mode until a
+        full VACUUM (POST /api/admin/notes/compact?vacuum=1) rewrites it.
+        """
+        if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table'").fetchone():
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
+    def _ensure_column(self, cursor, table, column, definition):
+        """Add a column to an existing table if it is missing"""
+        columns = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            logger.info(f"🔧 Added column {table}.{column}")
+            return True
+        return False
+    
+    def _backfill_note_tags(self, cursor):
+        """Populate note_tags from the JSON tags column of existing notes"""
+        rows = cursor.execute("SELECT id, user_id, tags FROM notes WHERE deleted_at IS NULL AND tags IS NOT NULL AND tags != '[]'").fetchall()
+        for note_id, user_id, tags_json in rows:
+            try:
+                tags = set(json.loads(tags_json))
+            except (TypeError, ValueError):
+                continue
+            cursor.executemany(
+                'INSERT OR IGNORE INTO note_tags (note_id, user_id, tag) VALUES (?, ?, ?)',
+                [(note_id, user_id, tag) for tag in tags]
+            )
+        if rows:
+            logger.info(f"🔧 Backfilled note_tags for {len(rows)} notes")
+    
+    def _backfill_note_terms(self, cursor):
+        """Populate note_terms from existing note titles and tags"""
+        # Imported here: the autocomplete service itself depends on this module
+        from src.services.autocomplete import index_terms
+        rows = cursor.execute('SELECT id, user_id, title, tags FROM notes WHERE deleted_at IS NULL').fetchall()
+        for note_id, user_id, title, tags_json in rows:
+            try:
+                tags = json.loads(tags_json) if tags_json else []
+            except ValueError:
+                tags = []
+            cursor.executemany(
+                'INSERT OR IGNORE INTO note_terms (note_id, user_id, term, kind) VALUES (?, ?, ?, ?)',
+                [(note_id, user_id, term, kind) for term, kind in index_terms(title, tags)]
+            )
+        if rows:
+            logger.info(f"🔧 Backfilled autocomplete terms for {len(rows)} notes")
+    
+    def _backfill_note_search(self, cursor):
+        """Index existing notes in notes_fts"""
+        rows = cursor.execute('SELECT id, user_id, title, content, tags FROM notes WHERE deleted_at IS NULL').fetchall()
+        for note_id, user_id, title, content, tags_json in rows:
+            try:
+                tags = json.loads(tags_json) if tags_json else []
+            except ValueError:
+                tags = []
+            cursor.execute(
+                'INSERT INTO notes_fts (rowid, title, content, tags, owner) VALUES (?, ?, ?, ?, ?)',
+                (note_id, title, content_codec.decode(content), ' '.join(tags), owner_token(user_id))
+            )
+        if rows:
+            logger.info(f"🔧 Indexed {len(rows)} notes for fuzzy search")
+    
+    def _normalize_note_times(self, cursor):
+        """Rewrite start/end times stored with a UTC offset as naive UTC"""
+        # Imported here: the note model itself depends on this module
+        from src.models.note_sqlite import to_utc
+        rows = cursor.execute('''
+            SELECT id, start_time, end_time FROM notes
+            WHERE substr(start_time, -6, 1) IN ('+', '-') OR substr(end_time, -6, 1) IN ('+', '-')
+        ''').fetchall()
+        updates = []
+        for note_id, start_time, end_time in rows:
+            try:
+                start_time, end_time = (
+                    to_utc(datetime.fromisoformat(value)).isoformat() if value else None
+                    for value in (start_time, end_time)
+                )
+            except ValueError:
+                continue
+            updates.append((start_time, end_time, note_id))
+        cursor.executemany('UPDATE notes SET start_time = ?, end_time = ? WHERE id = ?', updates)
+        if updates:
+            logger.info(f"🔧 Normalized start/end times to UTC for {len(updates)} notes")
+    
+    def _backfill_note_previews(self, cursor):
+        """Fill the preview column for notes written before it existed"""
+        rows = cursor.execute('SELECT id, content FROM notes WHERE preview IS NULL').fetchall()
+        cursor.executemany(
+            'UPDATE notes SET preview = ? WHERE id = ?',
+            [(make_preview(content_codec.decode(content)), note_id) for note_id, content in rows]
+        )
+        if rows:
+            logger.info(f"🔧 Backfilled previews for {len(rows)} notes")
+    
+    def _create_index(self, cursor, statement):
+        """Create an index, logging instead of failing when existing data violates it"""
+        try:
+            cursor.execute(statement)
+        except sqlite3.IntegrityError as e:
+            logger.warning(f"⚠️ Could not create index ({e}): {statement}")
+    
     def is_connected(self):
         """检查数据库连接"""
         try:
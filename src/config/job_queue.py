@@ -0,0 +1,188 @@
+import os
+import time
+import random
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from src.config.database_sqlite import database
+from src.config.metrics import metrics
+from src.models.job_sqlite import Job
+
+logger = logging.getLogger(__name__)
+
+# Work someone is polling for runs ahead of work nobody is waiting on
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BACKGROUND = 0
+
+class JobQueue:
+    """SQLite-backed job queue with an in-process pool of worker threads
+
+    Handlers are registered by kind with @job_queue.handler('kind') and take
+    the job's payload dict, returning a JSON-serializable result. Jobs are
+    durable: a restart resumes queued jobs and retries running ones whose
+    lease expired, counting the lost run as an attempt. A handler that raises is retried with exponential backoff
+    and jitter until max_attempts is reached. job_queue.every() submits a
+    kind periodically from housekeeping, for maintenance work.
+
+    Workers are threads, since the slow work here is waiting on the network.
+    They start on the first request or submit, not at import time. With
+    JOB_WORKERS=0, or in production where every connection gets a fresh
+    in-memory database, the queue is disabled and callers run work inline.
+    """
+    def __init__(self):
+        self.worker_count = int(os.environ.get('JOB_WORKERS', '2'))
+        self.poll_interval = float(os.environ.get('JOB_POLL_SECONDS', '1'))
+        self.lease_seconds = int(os.environ.get('JOB_LEASE_SECONDS', '300'))
+        self.retention_seconds = int(os.environ.get('JOB_RETENTION_HOURS', '24')) * 3600
+        self.backoff_base = float(os.environ.get('JOB_BACKOFF_SECONDS', '2'))
+        self.backoff_max = float(os.environ.get('JOB_BACKOFF_MAX_SECONDS', '300'))
+        self._handlers = {}
+        self._workers = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._local = threading.local()
+        self._last_housekeeping = 0
+        # kind -> [interval_seconds, payload, monotonic time it is next due]
+        self._periodic = {}
+
+    @property
+    def enabled(self):
+        return self.worker_count > 0 and not database.is_production
+
+    def init_app(self, app):
+        @app.before_request
+        def start_workers():
+            # Cheap after the first request; resumes jobs left queued by a previous process
+            if not self._started and self.enabled:
+                self.start()
+
+    def handler(self, kind):
+        """Register fn(payload) -> result as the handler for jobs of this kind"""
+        def decorator(fn):
+            self._handlers[kind] = fn
+            return fn
+        return decorator
+
+    def every(self, kind, interval_seconds, payload=None):
+        """Submit a background job of this kind every interval_seconds while workers run
+        
+        The first one is submitted at the workers' first housekeeping pass. Each
+        process schedules its own, so handlers must tolerate overlapping runs.
+        """
+        self._periodic[kind] = [interval_seconds, payload or {}, 0]
+
+    def submit(self, kind, payload, user_id=None, priority=PRIORITY_BACKGROUND, max_attempts=3, delay=0):
+        """Persist a job and wake a worker, returning the queued Job
+        
+        With delay the job is not picked up until that many seconds from now.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        run_after = datetime.utcnow() + timedelta(seconds=delay) if delay else None
+        job = Job(kind=kind, payload=payload, user_id=user_id, priority=priority, max_attempts=max_attempts,
+                  run_after=run_after).save()
+        metrics.jobs.inc(kind, 'queued')
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def run_inline(self, kind, payload):
+        """Run a registered handler in the calling thread, bypassing the queue"""
+        return self._handlers[kind](payload)
+
+    def current_job(self):
+        """The Job being run by this worker thread, or None outside a job"""
+        return getattr(self._local, 'job', None)
+
+    def start(self):
+        if self._started or not self.enabled:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._stopping = False
+            prefix = f'{socket.gethostname()}:{os.getpid()}'
+            for i in range(self.worker_count):
+                worker = threading.Thread(target=self._work, args=(f'{prefix}:{i}',), name=f'job-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._started = True
+            logger.info(f"🧵 Started {self.worker_count} job workers")
+
+    def stop(self, timeout=5):
+        """Ask the workers to exit after their current job and wait for them"""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+        self._started = False
+
+    def _work(self, worker_name):
+        while not self._stopping:
+            self._housekeeping()
+            job = Job.claim_next(worker_name)
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                # Recording the outcome failed; the lease expiry will re-queue the job
+                logger.error(f"Job {job.id} could not be recorded: {e}")
+
+    def _run(self, job):
+        handler = self._handlers.get(job.kind)
+        start = time.perf_counter()
+        self._local.job = job
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind '{job.kind}'")
+            result = handler(job.payload)
+            job.mark_succeeded(result)
+            status = 'succeeded'
+        except Exception as e:
+            if job.attempts < job.max_attempts and not isinstance(e, LookupError):
+                delay = self.retry_delay(job.attempts)
+                logger.warning(f"⚠️ Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay:.1f}s: {e}")
+                job.mark_failed(str(e), retry_delay=delay)
+                status = 'retried'
+            else:
+                logger.error(f"❌ Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {e}")
+                job.mark_failed(str(e))
+                status = 'failed'
+        finally:
+            self._local.job = None
+        metrics.jobs.inc(job.kind, status)
+        metrics.job_duration.observe(time.perf_counter() - start, job.kind, status)
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before retrying a job that has used attempts: exponential backoff with jitter"""
+        return min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+
+    def _housekeeping(self):
+        """Re-queue abandoned jobs, drop old finished ones and submit periodic ones, at most once a minute per process"""
+        now = time.monotonic()
+        if now - self._last_housekeeping < 60:
+            return
+        self._last_housekeeping = now
+        try:
+            Job.requeue_stale(self.lease_seconds, self.retry_delay)
+            purged = Job.purge_finished(self.retention_seconds)
+            if purged:
+                logger.info(f"🧹 Purged {purged} finished jobs")
+            for kind, schedule in self._periodic.items():
+                interval, payload, due = schedule
+                if now >= due:
+                    schedule[2] = now + interval
+                    self.submit(kind, payload, priority=PRIORITY_BACKGROUND, max_attempts=1)
+        except Exception as e:
+            logger.error(f"Job housekeeping failed: {e}")
+
+job_queue = JobQueue()
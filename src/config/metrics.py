@@ -0,0 +1,365 @@
+import os
+import re
+import time
+import sqlite3
+import bisect
+import threading
+import logging
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond SQL up to slow upstream AI calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, label_values)} {value}')
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format"""
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (non-cumulative), plus sum and count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    labels = _format_labels(self.label_names, label_values, f'le="{le}"')
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f'{self.name}_sum{labels} {total}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+        self.http_request_duration = self.histogram(
+            'http_request_duration_seconds', 'Flask request latency by route',
+            ('method', 'route', 'status'))
+        self.sql_statements = self.counter(
+            'sql_statements_total', 'SQLite statements executed', ('statement',))
+        self.sql_statement_duration = self.histogram(
+            'sql_statement_duration_seconds', 'SQLite statement latency including row fetches',
+            ('statement',))
+        self.sql_rows = self.counter(
+            'sql_rows_total', 'Rows returned or modified by SQLite statements', ('statement',))
+        self.ai_upstream_duration = self.histogram(
+            'ai_upstream_duration_seconds', 'GitHub Models request latency', ('model', 'status'))
+        self.ai_tokens = self.counter(
+            'ai_tokens_total', 'Tokens reported in the upstream usage block', ('model', 'kind'))
+        self.ai_coalesced = self.counter(
+            'ai_coalesced_requests_total', 'AI calls served by sharing an identical in-flight upstream request',
+            ('model',))
+        self.ai_route_outcomes = self.counter(
+            'ai_route_outcomes_total', 'Routed AI calls by which attempt answered (primary, hedge, fallback, failed)',
+            ('task', 'outcome'))
+        self.ai_hedges = self.counter(
+            'ai_hedges_total', 'Hedged requests started because the primary model was slower than usual',
+            ('task',))
+        self.ai_quota_rejections = self.counter(
+            'ai_quota_rejections_total', 'AI requests refused before reaching the model because a daily limit was used up',
+            ('route', 'limit'))
+        self.ai_fast_path = self.counter(
+            'ai_fast_path_total', 'AI route requests answered locally versus sent to the model',
+            ('task', 'path'))
+        self.autocomplete_lookups = self.counter(
+            'autocomplete_lookups_total', 'Autocomplete prefixes answered from cache (hit), by filtering a shorter prefix (narrowed), or by a range scan (miss)',
+            ('result',))
+        self.jobs = self.counter(
+            'jobs_total', 'Background jobs by kind and outcome (queued, succeeded, retried, failed)',
+            ('kind', 'status'))
+        self.job_duration = self.histogram(
+            'job_duration_seconds', 'Background job run time per attempt', ('kind', 'status'))
+
+    def counter(self, name, help_text, label_names=()):
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def init_app(self, app):
+        """Record per-route request latency for every request"""
+        @app.before_request
+        def start_timer():
+            g._metrics_start = time.perf_counter()
+
+        @app.after_request
+        def record_latency(response):
+            start = g.pop('_metrics_start', None)
+            if start is not None:
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                self.http_request_duration.observe(
+                    time.perf_counter() - start, request.method, route, str(response.status_code))
+            return response
+
+    def record_ai_call(self, model, status, duration, usage=None):
+        """Record one upstream AI request and the token usage it reported"""
+        self.ai_upstream_duration.observe(duration, model, str(status))
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            if usage and usage.get(kind):
+                self.ai_tokens.inc(model, kind.replace('_tokens', ''), amount=usage[kind])
+
+metrics = MetricsRegistry()
+
+class SlowQueryLog:
+    """Logs statements slower than SLOW_QUERY_MS and aggregates the worst offenders
+
+    Each logged statement carries its parameter types and sizes (never their
+    values, which hold note content and emails), duration, row count and the
+    EXPLAIN QUERY PLAN output, so full scans show up as 'SCAN <table>'.
+    """
+    MAX_ENTRIES = 200
+    EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+    def __init__(self):
+        # A negative threshold disables the log
+        self.threshold_ms = float(os.environ.get('SLOW_QUERY_MS', '100'))
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.threshold_ms >= 0
+
+    def is_slow(self, elapsed):
+        return self.enabled and elapsed * 1000 >= self.threshold_ms
+
+    def record(self, conn, sql, parameters, elapsed, rows):
+        normalized = ' '.join(sql.split())
+        plan = self._explain(conn, sql, parameters) if normalized.split(' ', 1)[0].upper() in self.EXPLAINABLE else None
+        duration_ms = elapsed * 1000
+        params = describe_parameters(parameters)
+
+        logger.warning(
+            f"🐢 Slow query ({duration_ms:.1f} ms, {rows} rows): {normalized} "
+            f"params={params} plan={plan}")
+
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is None:
+                if len(self._entries) >= self.MAX_ENTRIES:
+                    # Drop the entry that has cost the least time so far
+                    cheapest = min(self._entries, key=lambda key: self._entries[key]['total_ms'])
+                    del self._entries[cheapest]
+                entry = self._entries[normalized] = {
+                    'sql': normalized, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0
+                }
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['last_seen'] = time.time()
+            if duration_ms >= entry['max_ms']:
+                entry.update(max_ms=duration_ms, params=params, rows=rows, plan=plan)
+
+    def worst(self, limit=20, sort='total_ms'):
+        """Return the aggregated entries with the highest total_ms, max_ms or count"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        for entry in entries:
+            entry['avg_ms'] = entry['total_ms'] / entry['count']
+        return sorted(entries, key=lambda entry: entry[sort], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _explain(self, conn, sql, parameters):
+        try:
+            # A plain cursor so the EXPLAIN itself is not instrumented
+            cursor = sqlite3.Cursor(conn)
+            rows = cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters or ()).fetchall()
+            return [row[-1] for row in rows]
+        except Exception as e:
+            logger.debug(f"EXPLAIN QUERY PLAN failed: {e}")
+            return None
+
+def describe_parameters(parameters, limit=20):
+    """Parameter types, with lengths for text and blobs, e.g. ['int', 'str(812)', 'None']"""
+    def describe(value):
+        if value is None:
+            return 'None'
+        if isinstance(value, (str, bytes, memoryview)):
+            return f'{type(value).__name__}({len(value)})'
+        return type(value).__name__
+    
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {name: describe(value) for name, value in list(parameters.items())[:limit]}
+    described = [describe(value) for value in list(parameters)[:limit]]
+    if len(parameters) > limit:
+        described.append(f'... {len(parameters) - limit} more')
+    return described
+
+slow_queries = SlowQueryLog()
+
+_STATEMENT_TABLE = re.compile(
+    r'\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+NOT\s+EXISTS\s+)?["`\[]?(\w+)', re.IGNORECASE)
+
+def statement_label(sql):
+    """Reduce SQL to a low-cardinality label such as 'SELECT notes'"""
+    words = sql.split(None, 1)
+    operation = words[0].upper() if words else ''
+    match = _STATEMENT_TABLE.search(sql)
+    return f'{operation} {match.group(1)}' if match else operation
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from execute() until its rows are fetched
+
+    SQLite does most of the work for a SELECT while rows are stepped, so the
+    measurement stays open through fetchone/fetchall/iteration and closes on
+    the first of: fetchall, fetchone, exhausting the rows, the next execute,
+    or close().
+    """
+    _statement = None
+
+    def execute(self, sql, parameters=()):
+        self._finish_statement()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin_statement(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish_statement()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._begin_statement(sql, None, time.perf_counter() - start)
+            self._finish_statement()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add_fetch(time.perf_counter() - start, 1 if row is not None else 0)
+        self._finish_statement()
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._add_fetch(time.perf_counter() - start, len(rows))
+        if not rows:
+            self._finish_statement()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add_fetch(time.perf_counter() - start, len(rows))
+        self._finish_statement()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add_fetch(time.perf_counter() - start, 0)
+            self._finish_statement()
+            raise
+        self._add_fetch(time.perf_counter() - start, 1)
+        return row
+
+    def close(self):
+        self._finish_statement()
+        super().close()
+
+    def _begin_statement(self, sql, parameters, elapsed):
+        rows = self.rowcount if self.rowcount > 0 else 0
+        self._statement = [sql, parameters, elapsed, rows]
+        if self.description is None:
+            # Not a query: all the work happened inside execute()
+            self._finish_statement()
+
+    def _add_fetch(self, elapsed, rows):
+        if self._statement is not None:
+            self._statement[2] += elapsed
+            self._statement[3] += rows
+
+    def _finish_statement(self):
+        statement, self._statement = self._statement, None
+        if statement is None:
+            return
+        sql, parameters, elapsed, rows = statement
+        try:
+            label = statement_label(sql)
+            metrics.sql_statements.inc(label)
+            metrics.sql_statement_duration.observe(elapsed, label)
+            if rows:
+                metrics.sql_rows.inc(label, amount=rows)
+            if slow_queries.is_slow(elapsed):
+                slow_queries.record(self.connection, sql, parameters, elapsed, rows)
+        except Exception as e:
+            logger.debug(f"Failed to record SQL metrics: {e}")
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are InstrumentedCursor"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts create a plain cursor internally, so route them through ours
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
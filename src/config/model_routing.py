@@ -0,0 +1,85 @@
+"""Per-task model routing for the /api/ai/* routes
+
+Each task has a chain of models, tried in order, and an upstream timeout.
+Requests that fail with a timeout, a connection error, a 429 or a 5xx move
+on to the next model in the chain. When a task allows hedging and its
+primary model has taken longer than its recent hedge_percentile latency, the
+next model is started alongside it and whichever answers first wins.
+
+Override any task with AI_ROUTES, a JSON object keyed by task name:
+    AI_ROUTES='{"translate": {"models": ["gpt-4o"], "timeout": 60}}'
+"""
+import os
+import json
+import logging
+import threading
+from collections import deque
+
+DEFAULT_MODEL = 'gpt-4o-mini'
+
+# Short outputs hedge to a small, fast model. Long generations (translate,
+# improve-content) are not hedged: their latency tracks output length more
+# than upstream health, and a duplicate costs thousands of tokens.
+DEFAULT_ROUTES = {
+    'generate-tags': {'models': ['gpt-4o-mini', 'Meta-Llama-3.1-8B-Instruct'], 'timeout': 8, 'hedge_percentile': 95},
+    'search-assist': {'models': ['gpt-4o-mini', 'Meta-Llama-3.1-8B-Instruct'], 'timeout': 10, 'hedge_percentile': 95},
+    'summarize': {'models': ['gpt-4o-mini', 'Meta-Llama-3.1-8B-Instruct'], 'timeout': 15, 'hedge_percentile': 95},
+    'smart-create': {'models': ['gpt-4o-mini', 'gpt-4o'], 'timeout': 10, 'hedge_percentile': 95},
+    'chat': {'models': ['gpt-4o-mini', 'gpt-4o'], 'timeout': 30, 'hedge_percentile': 95},
+    'improve-content': {'models': ['gpt-4o-mini', 'gpt-4o'], 'timeout': 30, 'hedge_percentile': None},
+    'translate': {'models': ['gpt-4o-mini', 'gpt-4o'], 'timeout': 45, 'hedge_percentile': None},
+    'default': {'models': [DEFAULT_MODEL], 'timeout': 30, 'hedge_percentile': None},
+}
+
+# Upstream statuses worth trying another model for; anything else would fail the same way
+RETRYABLE_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+class Route:
+    def __init__(self, task, models, timeout=30, hedge_percentile=None):
+        self.task = task
+        self.models = list(models) or [DEFAULT_MODEL]
+        self.timeout = float(timeout)
+        self.hedge_percentile = hedge_percentile
+
+    @property
+    def primary(self):
+        return self.models[0]
+
+    def __repr__(self):
+        return f'<Route {self.task} {" -> ".join(self.models)} timeout={self.timeout}s>'
+
+def load_routes():
+    """Build the routing table from DEFAULT_ROUTES plus any AI_ROUTES overrides"""
+    config = {task: dict(settings) for task, settings in DEFAULT_ROUTES.items()}
+    overrides = os.environ.get('AI_ROUTES')
+    if overrides:
+        try:
+            for task, settings in json.loads(overrides).items():
+                config.setdefault(task, dict(DEFAULT_ROUTES['default'])).update(settings)
+        except (ValueError, AttributeError) as e:
+            logging.error(f"Ignoring invalid AI_ROUTES: {e}")
+    return {task: Route(task, **settings) for task, settings in config.items()}
+
+class LatencyWindow:
+    """Recent successful upstream latencies per (task, model), for hedge thresholds"""
+    def __init__(self, size=200, min_samples=20):
+        self.size = size
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.size)
+            samples.append(seconds)
+
+    def percentile(self, key, percentile):
+        """The given percentile of recent latencies, or None until there are min_samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
@@ -0,0 +1,221 @@
+import os
+import gzip
+import time
+import hashlib
+import logging
+import mimetypes
+import threading
+from flask import Response, request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli  # Optional: only used to build .br variants when none exist on disk
+except ImportError:
+    brotli = None
+
+# Text-like types worth compressing; images such as favicon.ico are left alone unless precompressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon',
+                      'image/vnd.microsoft.icon')
+MIN_COMPRESS_BYTES = 1024
+# Files larger than this are streamed from disk instead of being held in memory
+MAX_CACHED_BYTES = 5 * 1024 * 1024
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# Runtime compression happens on a request's critical path, once per asset per process;
+# ship name.br / name.gz from the build for the maximum ratio
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+REVALIDATE_CACHE = 'no-cache'
+
+class StaticAsset:
+    def __init__(self, name, path, content, mimetype, mtime, size):
+        self.name = name
+        self.path = path
+        self.content = content
+        self.mimetype = mimetype
+        self.mtime = mtime
+        self.size = size
+        self.digest = hashlib.sha256(content).hexdigest()[:12] if content is not None else f'{int(mtime)}-{size}'
+        self.encodings = {}
+        # Paths of name.br / name.gz shipped next to the file, by encoding
+        self.precompressed = {}
+        self.compressed = False
+
+    @property
+    def hashed_name(self):
+        """e.g. favicon.ico -> favicon.3f2a9c1b7d4e.ico"""
+        base, ext = os.path.splitext(self.name)
+        return f'{base}.{self.digest}{ext}'
+
+class StaticAssets:
+    """In-memory static pipeline for the catch-all route
+
+    Nothing happens at import: the first static request reads and
+    fingerprints every file under the static folder, and each compressible
+    asset gets its gzip and, if available, brotli variants the first time it
+    is served. Files shipped as name.br / name.gz are used as-is. Requests
+    are then answered from memory without touching the filesystem;
+    fingerprinted URLs (name.<hash>.ext) are cached as immutable, everything
+    else revalidates by an ETag specific to the encoding served. References
+    to other assets inside HTML are rewritten to their fingerprinted URLs.
+    """
+    def __init__(self):
+        self.static_folder = None
+        self.refresh_interval = 0
+        self._assets = {}
+        self._hashed = {}
+        self._scanned_at = 0
+        self._signature = None
+        self._built = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        # In development, pick up edits to static files; in production the files never change
+        is_production = os.environ.get('FLASK_ENV') == 'production' or os.environ.get('VERCEL') == '1'
+        self.refresh_interval = float(os.environ.get('STATIC_REFRESH_SECONDS', '0' if is_production else '2'))
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._build_lock:
+            if self._built:
+                return
+            try:
+                self.build()
+            except Exception as e:
+                logger.error(f"Failed to build static asset manifest: {e}")
+            self._built = True
+
+    def build(self):
+        if not self.static_folder or not os.path.isdir(self.static_folder):
+            return
+
+        files = self._scan()
+        assets = {}
+        for name, (path, mtime, size) in files.items():
+            if name.endswith(('.br', '.gz')) and name[:-3] in files:
+                continue
+            content = None
+            if size <= MAX_CACHED_BYTES:
+                with open(path, 'rb') as f:
+                    content = f.read()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            asset = StaticAsset(name, path, content, mimetype, mtime, size)
+            asset.precompressed = {encoding: files[name + suffix][0]
+                                   for suffix, encoding in (('.br', 'br'), ('.gz', 'gzip')) if name + suffix in files}
+            assets[name] = asset
+
+        # Fingerprint everything else first so HTML can point at the hashed URLs
+        for asset in assets.values():
+            if asset.mimetype == 'text/html' and asset.content is not None:
+                html = asset.content
+                for other in assets.values():
+                    if other is not asset and other.mimetype != 'text/html':
+                        for quote in (b'"', b"'"):
+                            html = html.replace(quote + f'/{other.name}'.encode() + quote,
+                                                quote + f'/{other.hashed_name}'.encode() + quote)
+                if html != asset.content:
+                    asset.content = html
+                    asset.digest = hashlib.sha256(html).hexdigest()[:12]
+
+        with self._lock:
+            self._assets = assets
+            self._hashed = {asset.hashed_name: asset for asset in assets.values()}
+            self._signature = self._files_signature(files)
+            self._scanned_at = time.monotonic()
+        logger.info(f"📦 Static manifest built: {len(assets)} assets")
+
+    def _scan(self):
+        files = {}
+        for root, _, names in os.walk(self.static_folder):
+            for filename in names:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                stat = os.stat(path)
+                files[name] = (path, stat.st_mtime, stat.st_size)
+        return files
+
+    @staticmethod
+    def _files_signature(files):
+        return tuple(sorted((name, mtime, size) for name, (_, mtime, size) in files.items()))
+
+    def _add_encodings(self, asset):
+        """Fill in an asset's compressed variants the first time it is served"""
+        with self._lock:
+            if asset.compressed:
+                return
+            encodings = {}
+            # Precompressed files from the build take priority over compressing here
+            for encoding, path in asset.precompressed.items():
+                with open(path, 'rb') as f:
+                    encodings[encoding] = f.read()
+
+            if len(asset.content) >= MIN_COMPRESS_BYTES and asset.mimetype.startswith(COMPRESSIBLE_TYPES):
+                if 'gzip' not in encodings:
+                    encodings['gzip'] = gzip.compress(asset.content, compresslevel=GZIP_LEVEL, mtime=0)
+                if 'br' not in encodings and brotli is not None:
+                    encodings['br'] = brotli.compress(asset.content, quality=BROTLI_QUALITY)
+            # Drop variants that do not actually save bytes
+            asset.encodings = {encoding: body for encoding, body in encodings.items() if len(body) < len(asset.content)}
+            asset.compressed = True
+
+    def _maybe_refresh(self):
+        if not self.refresh_interval or time.monotonic() - self._scanned_at < self.refresh_interval:
+            return
+        try:
+            files = self._scan()
+            if self._files_signature(files) != self._signature:
+                self.build()
+            else:
+                self._scanned_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Failed to refresh static asset manifest: {e}")
+
+    def lookup(self, name):
+        """Return (asset, is_fingerprinted) for a request path, or (None, False)"""
+        self._ensure_built()
+        self._maybe_refresh()
+        asset = self._hashed.get(name)
+        if asset:
+            return asset, True
+        return self._assets.get(name), False
+
+    def url_for(self, name):
+        """Fingerprinted URL for a static file, or its plain URL if unknown"""
+        self._ensure_built()
+        asset = self._assets.get(name)
+        return f'/{asset.hashed_name}' if asset else f'/{name}'
+
+    def respond(self, asset, fingerprinted):
+        cache_control = IMMUTABLE_CACHE if fingerprinted else REVALIDATE_CACHE
+
+        if asset.content is None:
+            response = send_from_directory(self.static_folder, asset.name, max_age=None)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        if not asset.compressed:
+            self._add_encodings(asset)
+        body, etag = asset.content, asset.digest
+        headers = {
+            'Cache-Control': cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.encodings and request.accept_encodings[encoding]:
+                # Each encoding is a different representation, so it gets its own strong ETag
+                body, etag = asset.encodings[encoding], f'{asset.digest}-{encoding}'
+                headers['Content-Encoding'] = encoding
+                break
+        headers['ETag'] = f'"{etag}"'
+
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        response = Response(body, mimetype=asset.mimetype, headers=headers)
+        response.last_modified = asset.mtime
+        return response
+
+static_assets = StaticAssets()
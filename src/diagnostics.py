@@ -0,0 +1,133 @@
+"""Startup diagnostics: where does cold-start time go?
+
+Usage:
+    python src/diagnostics.py            # import-time report for src.main
+    python src/diagnostics.py --top 30 --json
+
+Runs `python -X importtime -c "import src.main"` in a fresh interpreter,
+so nothing already imported here skews the numbers. It then reports the
+slowest modules by self and cumulative time, plus the time to the first
+handled request (/api/health), which includes lazy database setup. The
+request runs against an empty temporary DATABASE_DIR, so database/app.db
+is not touched.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST_SCRIPT = '''
+import json, time
+start = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+response = src.main.app.test_client().get('/api/health')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'status': response.status_code,
+}))
+'''
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into [{'module', 'self_us', 'cumulative_us', 'depth'}]"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': depth,
+        })
+    return modules
+
+def run_importtime():
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import src.main'],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    return parse_importtime(result.stderr)
+
+def run_first_request():
+    data_dir = tempfile.mkdtemp(prefix='notes-diagnostics-')
+    try:
+        result = subprocess.run(
+            [sys.executable, '-c', FIRST_REQUEST_SCRIPT],
+            cwd=PROJECT_ROOT, capture_output=True, text=True,
+            env={**os.environ, 'DATABASE_DIR': data_dir}
+        )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'no output'}
+
+def startup_report(top=20):
+    modules = run_importtime()
+    main = next((m for m in modules if m['module'] == 'src.main'), None)
+    # Direct imports of src.main show which of our own modules pull in what
+    children = []
+    if main:
+        index = modules.index(main)
+        for module in reversed(modules[:index]):
+            if module['depth'] == 0:
+                break
+            if module['depth'] == 1:
+                children.append(module)
+
+    return {
+        'src_main_import_ms': main['cumulative_us'] / 1000 if main else None,
+        'modules_imported': len(modules),
+        'direct_imports': sorted(children, key=lambda m: m['cumulative_us'], reverse=True),
+        'top_self': sorted(modules, key=lambda m: m['self_us'], reverse=True)[:top],
+        'top_cumulative': sorted(modules, key=lambda m: m['cumulative_us'], reverse=True)[:top],
+        'first_request': run_first_request(),
+    }
+
+def print_report(report):
+    print(f"src.main import: {report['src_main_import_ms']:.1f} ms ({report['modules_imported']} modules)")
+    first = report['first_request']
+    if 'error' in first:
+        print(f"first request: failed ({first['error']})")
+    else:
+        print(f"first request (/api/health -> {first['status']}): {first['first_request_ms']:.1f} ms "
+              f"after a {first['import_ms']:.1f} ms import")
+
+    sections = (
+        ('Direct imports of src.main (cumulative)', 'direct_imports', 'cumulative_us'),
+        ('Slowest modules (self)', 'top_self', 'self_us'),
+        ('Slowest modules (cumulative)', 'top_cumulative', 'cumulative_us'),
+    )
+    for title, key, field in sections:
+        print(f"\n{title}:")
+        for module in report[key]:
+            print(f"  {module[field] / 1000:8.2f} ms  {module['module']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=20, help='modules to list per section')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = startup_report(top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
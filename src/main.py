@@ -4,13 +4,21 @@ import logging
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 # Remove MongoDB imports completely - only use SQLite
 from src.config.database_sqlite import database
+from src.config.metrics import metrics
+from src.config.compression import compressor
+from src.config.job_queue import job_queue
+from src.config.static_assets import static_assets
+# Route modules also register the job handlers workers need, so they load here;
+# their heavy dependencies (AI client, quick-capture parser) load on first use
 from src.routes.user import user_bp
 from src.routes.note import note_bp
 from src.routes.ai import ai_bp
+from src.routes.admin import admin_bp
+from src.routes.job import job_bp
 
 # Configure logging for production
 if os.environ.get('FLASK_ENV') == 'production':
@@ -47,6 +55,17 @@ def health_check():
             'error': str(e)
         }), 500
 
+@app.route('/api/metrics')
+def metrics_endpoint():
+    """Request, SQL and AI upstream metrics in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Record per-route latency for every request
+metrics.init_app(app)
+
+# Compress JSON/text responses for clients that accept it (runs before the latency hook)
+compressor.init_app(app)
+
 # Initialize SQLite database with error handling
 try:
     database.init_app(app)
@@ -58,22 +77,28 @@ except Exception as e:
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(note_bp, url_prefix='/api')
 app.register_blueprint(ai_bp, url_prefix='/api')
+app.register_blueprint(admin_bp, url_prefix='/api')
+app.register_blueprint(job_bp, url_prefix='/api')
+
+# Background workers start with the first request, not at import time
+job_queue.init_app(app)
+
+# Static files are fingerprinted on the first static request and compressed as each is first served
+static_assets.init_app(app)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    asset, fingerprinted = static_assets.lookup(path) if path else (None, False)
+    if asset is None:
+        # Unknown paths fall through to the single-page app
+        asset, fingerprinted = static_assets.lookup('index.html')
+        if asset is None:
             return "index.html not found", 404
+    return static_assets.respond(asset, fingerprinted)
 
 # Global error handler for 500 errors
 @app.errorhandler(500)
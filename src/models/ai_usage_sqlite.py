@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from src.config.database_sqlite import database
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ai_usage.user_id is part of the primary key, so callers without a user are stored as 0
+ANONYMOUS_USER_ID = 0
+
+def today():
+    """The current accounting day; quotas reset at midnight UTC"""
+    return datetime.utcnow().date().isoformat()
+
+def _empty_totals():
+    return {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+
+class AIUsage:
+    """Daily token usage rolled up per user and /api/ai route"""
+
+    @classmethod
+    def record(cls, user_id, route, prompt_tokens, completion_tokens, day=None):
+        """Add one model call to the (day, user, route) rollup row"""
+        conn = database.get_connection()
+        if not conn:
+            return
+        try:
+            conn.execute('''
+                INSERT INTO ai_usage (day, user_id, route, requests, prompt_tokens, completion_tokens)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (day, user_id, route) DO UPDATE SET
+                    requests = requests + 1,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    completion_tokens = completion_tokens + excluded.completion_tokens
+            ''', (day or today(), cls._key(user_id), route, prompt_tokens, completion_tokens))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error recording AI usage: {e}")
+        finally:
+            conn.close()
+
+    @classmethod
+    def user_totals(cls, user_id, day=None):
+        """Return {route: totals} for one user's day"""
+        try:
+            conn = database.get_connection()
+            if not conn:
+                return {}
+
+            rows = conn.execute('''
+                SELECT route, requests, prompt_tokens, completion_tokens FROM ai_usage
+                WHERE day = ? AND user_id = ?
+            ''', (day or today(), cls._key(user_id))).fetchall()
+            conn.close()
+
+            return {row['route']: cls._totals(row) for row in rows}
+
+        except Exception as e:
+            logger.error(f"Error reading AI usage: {e}")
+            return {}
+
+    @classmethod
+    def day_totals(cls, day=None):
+        """Totals across every user and route for one day"""
+        try:
+            conn = database.get_connection()
+            if not conn:
+                return _empty_totals()
+
+            row = conn.execute('''
+                SELECT COALESCE(SUM(requests), 0) AS requests, COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+                       COALESCE(SUM(completion_tokens), 0) AS completion_tokens
+                FROM ai_usage WHERE day = ?
+            ''', (day or today(),)).fetchone()
+            conn.close()
+
+            return cls._totals(row)
+
+        except Exception as e:
+            logger.error(f"Error reading AI usage: {e}")
+            return _empty_totals()
+
+    @classmethod
+    def history(cls, user_id, days=7):
+        """Per-day, per-route rows for one user over the last `days` days, newest first"""
+        try:
+            conn = database.get_connection()
+            if not conn:
+                return []
+
+            since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+            rows = conn.execute('''
+                SELECT day, route, requests, prompt_tokens, completion_tokens FROM ai_usage
+                WHERE user_id = ? AND day >= ?
+                ORDER BY day DESC, route
+            ''', (cls._key(user_id), since)).fetchall()
+            conn.close()
+
+            return [{'day': row['day'], 'route': row['route'], **cls._totals(row)} for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error reading AI usage history: {e}")
+            return []
+
+    @classmethod
+    def top_users(cls, days=1, limit=20):
+        """The heaviest users by total tokens over the last `days` days"""
+        try:
+            conn = database.get_connection()
+            if not conn:
+                return []
+
+            since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+            rows = conn.execute('''
+                SELECT user_id, SUM(requests) AS requests, SUM(prompt_tokens) AS prompt_tokens,
+                       SUM(completion_tokens) AS completion_tokens
+                FROM ai_usage WHERE day >= ?
+                GROUP BY user_id
+                ORDER BY SUM(prompt_tokens + completion_tokens) DESC
+                LIMIT ?
+            ''', (since, limit)).fetchall()
+            conn.close()
+
+            return [
+                {'user_id': row['user_id'] if row['user_id'] != ANONYMOUS_USER_ID else None, **cls._totals(row)}
+                for row in rows
+            ]
+
+        except Exception as e:
+            logger.error(f"Error reading top AI users: {e}")
+            return []
+
+    @staticmethod
+    def _key(user_id):
+        return ANONYMOUS_USER_ID if user_id is None else user_id
+
+    @staticmethod
+    def _totals(row):
+        return {
+            'requests': row['requests'],
+            'prompt_tokens': row['prompt_tokens'],
+            'completion_tokens': row['completion_tokens'],
+            'total_tokens': row['prompt_tokens'] + row['completion_tokens']
+        }
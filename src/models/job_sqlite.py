@@ -0,0 +1,256 @@
+import json
+from datetime import datetime, timedelta
+from src.config.database_sqlite import database
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """A unit of background work persisted in the jobs table
+
+    Status moves queued -> running -> succeeded | failed. A job that raises,
+    or whose worker's lease expires, goes back to queued with a later
+    run_after until max_attempts is used up.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    def __init__(self, kind=None, payload=None, user_id=None, status=QUEUED, priority=0, attempts=0,
+                 max_attempts=3, run_after=None, result=None, error=None, _id=None, created_at=None, updated_at=None):
+        self._id = _id
+        self.kind = kind
+        self.payload = payload or {}
+        self.user_id = user_id
+        self.status = status
+        self.priority = priority
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.run_after = run_after or datetime.utcnow()
+        self.result = result
+        self.error = error
+        self.created_at = created_at or datetime.utcnow()
+        self.updated_at = updated_at or datetime.utcnow()
+
+    @property
+    def id(self):
+        return self._id
+
+    def save(self):
+        """Insert the job as queued"""
+        conn = database.get_connection()
+        if not conn:
+            raise Exception("Database connection not available")
+
+        try:
+            now = datetime.utcnow().isoformat()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO jobs (kind, payload, user_id, status, priority, attempts, max_attempts, run_after, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)
+            ''', (self.kind, json.dumps(self.payload), self.user_id, Job.QUEUED, self.priority,
+                  self.max_attempts, self.run_after.isoformat(), now, now))
+            conn.commit()
+            self._id = cursor.lastrowid
+            return self
+        finally:
+            conn.close()
+
+    @classmethod
+    def claim_next(cls, worker_name):
+        """Mark the highest-priority ready job as running and return it, or None"""
+        conn = database.get_connection()
+        if not conn:
+            return None
+
+        try:
+            now = datetime.utcnow().isoformat()
+            # Idle polls are a single indexed read; no write lock is taken unless there is work
+            for row in conn.execute('''
+                SELECT * FROM jobs
+                WHERE status = 'queued' AND run_after <= ?
+                ORDER BY priority DESC, run_after, id
+                LIMIT 3
+            ''', (now,)).fetchall():
+                # The status check makes the claim atomic: only one worker's UPDATE matches
+                cursor = conn.execute('''
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, locked_at = ?, updated_at = ?
+                    WHERE id = ? AND status = 'queued'
+                ''', (worker_name, now, now, row['id']))
+                conn.commit()
+                if cursor.rowcount:
+                    job = cls.from_dict(dict(row))
+                    job.status = Job.RUNNING
+                    job.attempts += 1
+                    return job
+            return None
+        except Exception as e:
+            logger.error(f"Error claiming job: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def mark_succeeded(self, result):
+        self.status = Job.SUCCEEDED
+        self.result = result
+        self._finish('UPDATE jobs SET status = ?, result = ?, error = NULL, locked_by = NULL, updated_at = ? WHERE id = ?',
+                     (Job.SUCCEEDED, json.dumps(result)))
+
+    def mark_failed(self, error, retry_delay=None):
+        """Record a failed attempt; with retry_delay the job is queued again after that many seconds"""
+        self.error = error
+        if retry_delay is None:
+            self.status = Job.FAILED
+            self._finish('UPDATE jobs SET status = ?, error = ?, locked_by = NULL, updated_at = ? WHERE id = ?',
+                         (Job.FAILED, error))
+        else:
+            self.status = Job.QUEUED
+            self.run_after = datetime.utcnow() + timedelta(seconds=retry_delay)
+            self._finish('UPDATE jobs SET status = ?, error = ?, run_after = ?, locked_by = NULL, updated_at = ? WHERE id = ?',
+                         (Job.QUEUED, error, self.run_after.isoformat()))
+
+    def _finish(self, statement, values):
+        conn = database.get_connection()
+        if not conn:
+            raise Exception("Database connection not available")
+        try:
+            conn.execute(statement, values + (datetime.utcnow().isoformat(), self._id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    @classmethod
+    def find_by_id(cls, job_id, user_id=None):
+        """Find a job submitted by the given user"""
+        try:
+            conn = database.get_connection()
+            if not conn:
+                return None
+
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM jobs WHERE id = ? AND user_id IS ?', (job_id, user_id))
+            row = cursor.fetchone()
+            conn.close()
+
+            return cls.from_dict(dict(row)) if row else None
+
+        except Exception as e:
+            logger.error(f"Error finding job by ID: {e}")
+            return None
+
+    @classmethod
+    def requeue_stale(cls, lease_seconds, retry_delay):
+        """Recover running jobs whose worker has been silent for lease_seconds
+
+        Covers jobs left running by a process that crashed or was restarted.
+        The lost run counts as an attempt: a job with attempts left is queued
+        again after retry_delay(attempts) seconds, one without is marked
+        failed, so a job that kills its worker cannot loop forever. Returns
+        the number of jobs recovered.
+        """
+        conn = database.get_connection()
+        if not conn:
+            return 0
+        try:
+            now = datetime.utcnow()
+            cutoff = (now - timedelta(seconds=lease_seconds)).isoformat()
+            stale = conn.execute('''
+                SELECT id, attempts, max_attempts FROM jobs WHERE status = 'running' AND locked_at < ?
+            ''', (cutoff,)).fetchall()
+            failed = [row['id'] for row in stale if row['attempts'] >= row['max_attempts']]
+            requeued = [(row['id'], now + timedelta(seconds=retry_delay(row['attempts'])))
+                        for row in stale if row['attempts'] < row['max_attempts']]
+
+            # The status and lease checks skip jobs that finished or were reclaimed since the read
+            conn.executemany('''
+                UPDATE jobs SET status = 'failed', error = 'lease expired', locked_by = NULL, updated_at = ?
+                WHERE id = ? AND status = 'running' AND locked_at < ?
+            ''', [(now.isoformat(), job_id, cutoff) for job_id in failed])
+            conn.executemany('''
+                UPDATE jobs SET status = 'queued', error = 'lease expired', run_after = ?, locked_by = NULL, updated_at = ?
+                WHERE id = ? AND status = 'running' AND locked_at < ?
+            ''', [(run_after.isoformat(), now.isoformat(), job_id, cutoff) for job_id, run_after in requeued])
+            conn.commit()
+            if requeued:
+                logger.warning(f"⚠️ Requeued {len(requeued)} stale jobs")
+            if failed:
+                logger.error(f"❌ Failed {len(failed)} stale jobs with no attempts left")
+            return len(stale)
+        finally:
+            conn.close()
+
+    @classmethod
+    def purge_finished(cls, older_than_seconds):
+        """Delete succeeded and failed jobs last updated before the cutoff"""
+        conn = database.get_connection()
+        if not conn:
+            return 0
+        try:
+            cutoff = (datetime.utcnow() - timedelta(seconds=older_than_seconds)).isoformat()
+            cursor = conn.execute('''
+                DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?
+            ''', (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    @classmethod
+    def count_by_status(cls):
+        """Return {status: count} over the whole table"""
+        conn = database.get_connection()
+        if not conn:
+            return {}
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status').fetchall()
+            return {row['status']: row['count'] for row in rows}
+        finally:
+            conn.close()
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create Job instance from a jobs row"""
+        if not data:
+            return None
+
+        def parse_time(value):
+            try:
+                return datetime.fromisoformat(value) if value else None
+            except ValueError:
+                return None
+
+        return cls(
+            _id=data.get('id'),
+            kind=data.get('kind'),
+            payload=json.loads(data['payload']) if data.get('payload') else {},
+            user_id=data.get('user_id'),
+            status=data.get('status', Job.QUEUED),
+            priority=data.get('priority', 0),
+            attempts=data.get('attempts', 0),
+            max_attempts=data.get('max_attempts', 3),
+            run_after=parse_time(data.get('run_after')),
+            result=json.loads(data['result']) if data.get('result') else None,
+            error=data.get('error'),
+            created_at=parse_time(data.get('created_at')),
+            updated_at=parse_time(data.get('updated_at'))
+        )
+
+    def to_dict(self):
+        """Convert Job instance to dictionary; the payload stays server-side"""
+        return {
+            'id': self._id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<Job {self._id} {self.kind} {self.status}>'
@@ -0,0 +1,189 @@
+import os
+import json
+from datetime import datetime
+from src.config.database_sqlite import database
+from src.config.content_codec import content_codec
+from src.services import text_diff
+import logging
+
+logger = logging.getLogger(__name__)
+
+class NoteRevision:
+    """One saved version of a note's title, content and tags
+
+    Most revisions store only a delta from the revision before. Every
+    NOTE_REVISION_SNAPSHOT_EVERY-th stores the full content (compressed like
+    notes.content), so rebuilding any version applies at most that many
+    deltas. Saves within NOTE_REVISION_COALESCE_SECONDS of a revision's first
+    save fold into it, so an autosaving editor leaves one revision per burst
+    of typing. Rows live next to the note (in its shard when sharding is on).
+    """
+    snapshot_every = int(os.environ.get('NOTE_REVISION_SNAPSHOT_EVERY', '20'))
+    coalesce_seconds = float(os.environ.get('NOTE_REVISION_COALESCE_SECONDS', '120'))
+
+    def __init__(self, note_id=None, revision=None, kind=None, title=None, tags=None, content=None,
+                 stored_bytes=None, created_at=None, updated_at=None):
+        self.note_id = note_id
+        self.revision = revision
+        self.kind = kind
+        self.title = title
+        self.tags = tags or []
+        # Only set for a revision loaded with find()
+        self.content = content
+        self.stored_bytes = stored_bytes
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def record(cls, cursor, note_id, title, content, tags_json, previous=None, coalesce=True):
+        """Record a note's new version in the caller's transaction
+
+        previous is the (title, content, tags_json) the save replaces, or
+        None for a new note. Returns the revision number, or None when
+        nothing tracked changed.
+        """
+        if previous is not None and previous == (title, content, tags_json):
+            return None
+        now = datetime.utcnow().isoformat()
+        latest = cursor.execute(
+            'SELECT revision, kind, created_at FROM note_revisions WHERE note_id = ? ORDER BY revision DESC LIMIT 1',
+            (note_id,)
+        ).fetchone()
+
+        seeded = False
+        if latest is None:
+            if previous is None:
+                cls._write(cursor, note_id, 1, title, content, tags_json, None, now, now)
+                return 1
+            # A note from before revision history: keep the version being replaced as the first revision
+            cls._write(cursor, note_id, 1, *previous, None, now, now)
+            latest, seeded = (1, 'snapshot', now), True
+
+        revision, kind, created_at = latest
+        # Never fold into a revision seeded just now: it is the only copy of the earlier content
+        if coalesce and not seeded and (datetime.utcnow() - datetime.fromisoformat(created_at)).total_seconds() < cls.coalesce_seconds:
+            # Replace the latest revision, diffing against the one before it
+            base = cls._content_at(cursor, note_id, revision - 1) if kind == 'diff' else None
+            cls._write(cursor, note_id, revision, title, content, tags_json, base, created_at, now)
+            return revision
+
+        last_snapshot = cursor.execute(
+            "SELECT MAX(revision) FROM note_revisions WHERE note_id = ? AND kind = 'snapshot'", (note_id,)
+        ).fetchone()[0] or 0
+        base = previous[1] if previous is not None and revision + 1 - last_snapshot < cls.snapshot_every else None
+        cls._write(cursor, note_id, revision + 1, title, content, tags_json, base, now, now)
+        return revision + 1
+
+    @staticmethod
+    def _write(cursor, note_id, revision, title, content, tags_json, base, created_at, updated_at):
+        """Store a revision as a delta from base, or as a snapshot when base is None or the delta is no smaller"""
+        kind, body = 'snapshot', content_codec.encode(content or '')
+        if base is not None:
+            delta = text_diff.diff(base, content)
+            if len(delta) < len(content or ''):
+                kind, body = 'diff', delta
+        cursor.execute('''
+            INSERT OR REPLACE INTO note_revisions (note_id, revision, kind, title, tags, body, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (note_id, revision, kind, title, tags_json, body, created_at, updated_at))
+
+    @staticmethod
+    def _content_at(cursor, note_id, revision):
+        """Rebuild a revision's content from the nearest snapshot at or before it"""
+        rows = cursor.execute('''
+            SELECT kind, body FROM note_revisions
+            WHERE note_id = ? AND revision <= ? AND revision >= (
+                SELECT MAX(revision) FROM note_revisions WHERE note_id = ? AND revision <= ? AND kind = 'snapshot'
+            )
+            ORDER BY revision
+        ''', (note_id, revision, note_id, revision)).fetchall()
+        content = None
+        for kind, body in rows:
+            content = content_codec.decode(body) if kind == 'snapshot' else text_diff.apply(content, body)
+        return content
+
+    @classmethod
+    def find_all(cls, note_id, user_id=None):
+        """A note's revisions, newest first, without their content"""
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return []
+
+            try:
+                rows = conn.execute('''
+                    SELECT note_id, revision, kind, title, tags, length(body) AS stored_bytes, created_at, updated_at
+                    FROM note_revisions WHERE note_id = ?
+                    ORDER BY revision DESC
+                ''', (note_id,)).fetchall()
+            finally:
+                conn.close()
+
+            return [cls.from_dict(dict(row)) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error finding note revisions: {e}")
+            return []
+
+    @classmethod
+    def find(cls, note_id, revision, user_id=None):
+        """One revision of a note with its content rebuilt, or None"""
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return None
+
+            try:
+                row = conn.execute('''
+                    SELECT note_id, revision, kind, title, tags, length(body) AS stored_bytes, created_at, updated_at
+                    FROM note_revisions WHERE note_id = ? AND revision = ?
+                ''', (note_id, revision)).fetchone()
+                if not row:
+                    return None
+                found = cls.from_dict(dict(row))
+                found.content = cls._content_at(conn.cursor(), note_id, found.revision)
+                return found
+            finally:
+                conn.close()
+
+        except Exception as e:
+            logger.error(f"Error finding note revision: {e}")
+            return None
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+
+        try:
+            tags = json.loads(data['tags']) if data.get('tags') else []
+        except ValueError:
+            tags = []
+        return cls(
+            note_id=data.get('note_id'),
+            revision=data.get('revision'),
+            kind=data.get('kind'),
+            title=data.get('title'),
+            tags=tags,
+            stored_bytes=data.get('stored_bytes'),
+            created_at=datetime.fromisoformat(data['created_at']) if data.get('created_at') else None,
+            updated_at=datetime.fromisoformat(data['updated_at']) if data.get('updated_at') else None
+        )
+
+    def to_dict(self):
+        data = {
+            'note_id': self.note_id,
+            'revision': self.revision,
+            'kind': self.kind,
+            'title': self.title,
+            'tags': self.tags,
+            'stored_bytes': self.stored_bytes,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+        if self.content is not None:
+            data['content'] = self.content
+        return data
+
+    def __repr__(self):
+        return f'<NoteRevision {self.note_id}@{self.revision}>'
@@ -1,27 +1,64 @@
+import os
 import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from src.config.database_sqlite import database
+from src.config.content_codec import content_codec, make_preview
+from src.models.note_revision_sqlite import NoteRevision
+from src.services.tag_suggester import tag_suggester
+from src.services.note_summarizer import note_summarizer
+from src.services import fuzzy_match
+from src.services.autocomplete import autocomplete, index_terms
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Compressed content is a BLOB; only pay for decompression on rows that need it
+CONTENT_TEXT_SQL = "(CASE WHEN typeof(content) = 'blob' THEN note_content(content) ELSE content END)"
+
+# Every column except content, for list views that show the stored preview instead
+PREVIEW_COLUMNS = 'id, user_id, title, preview, tags, start_time, end_time, created_at, updated_at'
+
+def to_utc(value):
+    """A datetime as naive UTC, the form start_time and end_time are stored in
+
+    Aware values are converted; naive ones are taken to be UTC already. Keeping
+    one form makes the stored ISO strings compare and bucket correctly as text.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def parse_iso_datetime(value):
+    """Parse an ISO 8601 string (a trailing Z allowed) into naive UTC; raises ValueError"""
+    return to_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+
 class Note:
-    def __init__(self, title=None, content=None, tags=None, start_time=None, end_time=None, _id=None, created_at=None, updated_at=None):
+    def __init__(self, title=None, content=None, tags=None, start_time=None, end_time=None, _id=None, created_at=None, updated_at=None, user_id=None, preview=None, deleted_at=None):
         self._id = _id
+        self.user_id = user_id
         self.title = title
         self.content = content
+        # Only set for notes loaded without their content
+        self.preview = preview
         self.tags = tags or []
         self.start_time = start_time
         self.end_time = end_time
         self.created_at = created_at or datetime.utcnow()
         self.updated_at = updated_at or datetime.utcnow()
+        # Only set for notes in the trash
+        self.deleted_at = deleted_at
     
-    def save(self):
-        """Save the note to SQLite database"""
+    def save(self, coalesce_revision=True):
+        """Save the note to SQLite database
+        
+        Each save is recorded in the note's revision history. With
+        coalesce_revision=False it always starts a new revision instead of
+        folding into a recent one (used when restoring a revision).
+        """
         conn = None
         try:
-            conn = database.get_connection()
+            conn = database.get_connection(user_id=self.user_id)
             if not conn:
                 raise Exception("Database connection not available")
                 
@@ -30,36 +67,62 @@ class Note:
             # Convert tags list to JSON string
             tags_json = json.dumps(self.tags) if self.tags else '[]'
             
-            # Convert datetime to ISO string
+            # Large content may be stored compressed, depending on NOTE_COMPRESSION
+            stored_content = content_codec.encode(self.content)
+            preview = make_preview(self.content)
+            
+            # Convert datetime to ISO string, in UTC so range and calendar queries can compare them as text
+            self.start_time = to_utc(self.start_time)
+            self.end_time = to_utc(self.end_time)
             start_time_str = self.start_time.isoformat() if self.start_time else None
             end_time_str = self.end_time.isoformat() if self.end_time else None
             updated_at_str = datetime.utcnow().isoformat()
             
             if self._id:
+                # The version being replaced, for the revision delta
+                previous = cursor.execute(
+                    'SELECT title, content, tags FROM notes WHERE id = ? AND user_id IS ? AND deleted_at IS NULL',
+                    (self._id, self.user_id)
+                ).fetchone()
+                if previous is None:
+                    raise Exception(f"Note with id {self._id} not found")
+                
                 # Update existing note
                 cursor.execute('''
                     UPDATE notes SET 
-                    title = ?, content = ?, tags = ?, 
+                    title = ?, content = ?, preview = ?, tags = ?, 
                     start_time = ?, end_time = ?, updated_at = ?
-                    WHERE id = ?
-                ''', (self.title, self.content, tags_json, 
-                     start_time_str, end_time_str, updated_at_str, self._id))
+                    WHERE id = ? AND user_id IS ? AND deleted_at IS NULL
+                ''', (self.title, stored_content, preview, tags_json, 
+                     start_time_str, end_time_str, updated_at_str, self._id, self.user_id))
                 
                 if cursor.rowcount == 0:
                     raise Exception(f"Note with id {self._id} not found")
+                NoteRevision.record(
+                    cursor, self._id, self.title, self.content, tags_json,
+                    previous=(previous['title'], content_codec.decode(previous['content']), previous['tags']),
+                    coalesce=coalesce_revision
+                )
             else:
                 # Create new note
                 created_at_str = self.created_at.isoformat()
                 cursor.execute('''
-                    INSERT INTO notes (title, content, tags, start_time, end_time, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (self.title, self.content, tags_json, 
+                    INSERT INTO notes (user_id, title, content, preview, tags, start_time, end_time, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (self.user_id, self.title, stored_content, preview, tags_json, 
                      start_time_str, end_time_str, created_at_str, updated_at_str))
                 
                 self._id = cursor.lastrowid
+                NoteRevision.record(cursor, self._id, self.title, self.content, tags_json)
             
+            self._sync_tags(cursor)
+            self._sync_terms(cursor)
+            self._sync_search_index(cursor)
             conn.commit()
             self.updated_at = datetime.fromisoformat(updated_at_str)
+            autocomplete.note_changed(self.user_id)
+            tag_suggester.note_saved(self)
+            note_summarizer.note_saved(self)
             logger.info(f"✅ Note saved successfully with ID: {self._id}")
             return self
             
@@ -73,18 +136,52 @@ class Note:
             if conn:
                 conn.close()
     
+    def _sync_tags(self, cursor):
+        """Mirror the note's tags into the indexed note_tags table"""
+        cursor.execute('DELETE FROM note_tags WHERE note_id = ?', (self._id,))
+        if self.tags:
+            cursor.executemany(
+                'INSERT OR IGNORE INTO note_tags (note_id, user_id, tag) VALUES (?, ?, ?)',
+                [(self._id, self.user_id, tag) for tag in self.tags]
+            )
+    
+    def _sync_terms(self, cursor):
+        """Mirror the note's title words and tags into note_terms for autocomplete"""
+        cursor.execute('DELETE FROM note_terms WHERE note_id = ?', (self._id,))
+        cursor.executemany(
+            'INSERT OR IGNORE INTO note_terms (note_id, user_id, term, kind) VALUES (?, ?, ?, ?)',
+            [(self._id, self.user_id, term, kind) for term, kind in index_terms(self.title, self.tags)]
+        )
+    
+    def _sync_search_index(self, cursor):
+        """Replace the note's row in the notes_fts trigram index"""
+        if not database.fts_available:
+            return
+        cursor.execute('DELETE FROM notes_fts WHERE rowid = ?', (self._id,))
+        cursor.execute(
+            'INSERT INTO notes_fts (rowid, title, content, tags, owner) VALUES (?, ?, ?, ?, ?)',
+            (self._id, self.title, self.content, ' '.join(self.tags), fuzzy_match.owner_token(self.user_id))
+        )
+    
     @classmethod
-    def find_all(cls):
-        """Get all notes, ordered by most recently updated"""
+    def find_all(cls, user_id=None, preview_only=False):
+        """Get all of a user's notes, ordered by most recently updated
+        
+        With preview_only the content column is not read at all; each note
+        carries its stored preview instead and content is None.
+        """
         try:
-            conn = database.get_connection()
+            conn = database.get_connection(user_id=user_id)
             if not conn:
                 return []
-                
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM notes ORDER BY updated_at DESC')
-            rows = cursor.fetchall()
-            conn.close()
+
+            try:
+                cursor = conn.cursor()
+                columns = PREVIEW_COLUMNS if preview_only else '*'
+                cursor.execute(f'SELECT {columns} FROM notes WHERE user_id IS ? AND deleted_at IS NULL ORDER BY updated_at DESC', (user_id,))
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
             
             return [cls.from_dict(dict(row)) for row in rows]
             
@@ -93,17 +190,19 @@ class Note:
             return []
     
     @classmethod
-    def find_by_id(cls, note_id):
-        """Find a note by ID"""
+    def find_by_id(cls, note_id, user_id=None):
+        """Find a user's note by ID"""
         try:
-            conn = database.get_connection()
+            conn = database.get_connection(user_id=user_id)
             if not conn:
                 return None
-                
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM notes WHERE id = ?', (note_id,))
-            row = cursor.fetchone()
-            conn.close()
+
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM notes WHERE id = ? AND user_id IS ? AND deleted_at IS NULL', (note_id, user_id))
+                row = cursor.fetchone()
+            finally:
+                conn.close()
             
             return cls.from_dict(dict(row)) if row else None
             
@@ -112,23 +211,25 @@ class Note:
             return None
     
     @classmethod
-    def search(cls, query):
-        """Search notes by title, content, or tags"""
+    def search(cls, query, user_id=None):
+        """Search a user's notes by title, content, or tags"""
         try:
-            conn = database.get_connection()
+            conn = database.get_connection(user_id=user_id)
             if not conn:
                 return []
-                
-            cursor = conn.cursor()
-            search_pattern = f'%{query}%'
-            cursor.execute('''
-                SELECT * FROM notes 
-                WHERE title LIKE ? OR content LIKE ? OR tags LIKE ?
-                ORDER BY updated_at DESC
-            ''', (search_pattern, search_pattern, search_pattern))
-            
-            rows = cursor.fetchall()
-            conn.close()
+
+            try:
+                cursor = conn.cursor()
+                search_pattern = f'%{query}%'
+                cursor.execute(f'''
+                    SELECT * FROM notes 
+                    WHERE user_id IS ? AND deleted_at IS NULL AND (title LIKE ? OR {CONTENT_TEXT_SQL} LIKE ? OR tags LIKE ?)
+                    ORDER BY updated_at DESC
+                ''', (user_id, search_pattern, search_pattern, search_pattern))
+            
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
             
             return [cls.from_dict(dict(row)) for row in rows]
             
@@ -137,23 +238,164 @@ class Note:
             return []
     
     @classmethod
-    def find_by_tag(cls, tag):
-        """Find notes by specific tag"""
+    def search_with_facets(cls, query, user_id=None, facet_limit=10):
+        """Search like search(), also returning facet counts over the matching notes
+        
+        Returns (notes, facets), where facets maps 'tags', 'created_month' and
+        'has_time_range' to lists of {'value', 'count'}, at most facet_limit
+        each. The facets are aggregated in the same statement that returns
+        the notes, from one materialized pass over the matches.
+        """
         try:
-            conn = database.get_connection()
+            conn = database.get_connection(user_id=user_id)
             if not conn:
-                return []
+                return [], {}
+
+            try:
+                search_pattern = f'%{query}%'
+                # A CTE referenced more than once is materialized, so the LIKE scan runs once.
+                # Months list newest first; tags and has_time_range by count.
+                rows = conn.execute(f'''
+                    WITH matched AS (
+                        SELECT * FROM notes
+                        WHERE user_id IS ? AND deleted_at IS NULL AND (title LIKE ? OR {CONTENT_TEXT_SQL} LIKE ? OR tags LIKE ?)
+                    ),
+                    facet_counts AS (
+                        SELECT 'tags' AS facet, note_tags.tag AS value, COUNT(*) AS count
+                        -- CROSS JOIN keeps matched as the outer loop: a primary-key probe per match, not a note_tags scan
+                        FROM matched CROSS JOIN note_tags ON note_tags.note_id = matched.id
+                        GROUP BY note_tags.tag
+                        UNION ALL
+                        SELECT 'created_month', substr(created_at, 1, 7), COUNT(*) FROM matched GROUP BY 2
+                        UNION ALL
+                        SELECT 'has_time_range', start_time IS NOT NULL, COUNT(*) FROM matched GROUP BY 2
+                    ),
+                    ranked AS (
+                        SELECT facet, value, count, ROW_NUMBER() OVER (
+                            PARTITION BY facet
+                            ORDER BY CASE WHEN facet = 'created_month' THEN value END DESC, count DESC, value
+                        ) AS position
+                        FROM facet_counts
+                    )
+                    SELECT matched.*, (
+                        SELECT json_group_array(json_array(facet, value, count)) FROM ranked WHERE position <= ?
+                    ) AS facets_json
+                    FROM matched
+                    ORDER BY updated_at DESC
+                ''', (user_id, search_pattern, search_pattern, search_pattern, facet_limit)).fetchall()
+            finally:
+                conn.close()
+            
+            facets = {'tags': [], 'created_month': [], 'has_time_range': []}
+            if rows:
+                for facet, value, count in json.loads(rows[0]['facets_json']):
+                    facets[facet].append({'value': bool(value) if facet == 'has_time_range' else value, 'count': count})
+            
+            notes = []
+            for row in rows:
+                data = dict(row)
+                data.pop('facets_json')
+                notes.append(cls.from_dict(data))
+            return notes, facets
+            
+        except Exception as e:
+            logger.error(f"Error searching notes with facets: {e}")
+            return [], {}
+    
+    @classmethod
+    def fuzzy_search(cls, query, user_id=None, limit=50):
+        """Typo-tolerant search over title, content and tags, best match first
+        
+        Returns (notes, did_you_mean), where did_you_mean is the query with
+        words that appear in none of the user's notes replaced by the closest
+        word from the matching notes, or None. Falls back to search() when
+        the trigram index is unavailable or the query has no word of three
+        or more characters.
+        """
+        grams = fuzzy_match.query_trigrams(query)
+        if not database.fts_available or not grams:
+            return cls.search(query, user_id=user_id)[:limit], None
+        
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return [], None
+            
+            try:
+                # Any shared trigram among the user's rows makes a candidate; bm25 weights title and tag hits above content.
+                # The owner token scopes the MATCH; the user_id check only matters for ids past its range
+                rows = conn.execute('''
+                    SELECT notes.*, notes_fts.title AS fts_title, notes_fts.content AS fts_content, notes_fts.tags AS fts_tags
+                    FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid
+                    WHERE notes_fts MATCH ? AND notes.user_id IS ? AND notes.deleted_at IS NULL
+                    ORDER BY bm25(notes_fts, 10.0, 1.0, 5.0, 0.0)
+                    LIMIT ?
+                ''', (fuzzy_match.fts_owned(user_id, fuzzy_match.fts_match_any(grams)), user_id, limit * 4)).fetchall()
                 
-            cursor = conn.cursor()
-            # Search for tag in JSON array
-            cursor.execute('''
-                SELECT * FROM notes 
-                WHERE tags LIKE ?
-                ORDER BY updated_at DESC
-            ''', (f'%"{tag}"%',))
-            
-            rows = cursor.fetchall()
-            conn.close()
+                scored, candidates = [], []
+                threshold = fuzzy_match.min_coverage(query)
+                for position, row in enumerate(rows):
+                    text = f"{row['fts_title']} {row['fts_tags']} {row['fts_content']}"
+                    candidates.append(text)
+                    score = fuzzy_match.coverage(grams, text)
+                    if score >= threshold:
+                        scored.append((-score, position, row, text))
+                scored.sort(key=lambda item: item[:2])
+                
+                # With no note close enough, the best-ranked candidates still hold the likely spelling
+                texts = [text for _, _, _, text in scored[:10]] or candidates[:10]
+                suggestion = cls._did_you_mean(conn, query, user_id, texts)
+            finally:
+                conn.close()
+            
+            notes = []
+            for _, _, row, _ in scored[:limit]:
+                data = dict(row)
+                for column in ('fts_title', 'fts_content', 'fts_tags'):
+                    data.pop(column)
+                notes.append(cls.from_dict(data))
+            return notes, suggestion
+            
+        except Exception as e:
+            logger.error(f"Error fuzzy searching notes: {e}")
+            return [], None
+    
+    @staticmethod
+    def _did_you_mean(conn, query, user_id, texts):
+        """Correct query words found in none of the user's notes, using words from the best matches"""
+        corrected, changed = [], False
+        for word in fuzzy_match.words(query):
+            if len(word) >= 3 and not conn.execute('''
+                SELECT 1 FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid
+                WHERE notes_fts MATCH ? AND notes.user_id IS ? AND notes.deleted_at IS NULL LIMIT 1
+            ''', (fuzzy_match.fts_owned(user_id, fuzzy_match.fts_phrase(word)), user_id)).fetchone():
+                replacement = fuzzy_match.best_correction(word, texts)
+                if replacement:
+                    word, changed = replacement, True
+            corrected.append(word)
+        return ' '.join(corrected) if changed else None
+    
+    @classmethod
+    def find_by_tag(cls, tag, user_id=None):
+        """Find a user's notes by specific tag"""
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return []
+
+            try:
+                cursor = conn.cursor()
+                # Look the tag up in the (user_id, tag) index rather than scanning the JSON column
+                cursor.execute('''
+                    SELECT notes.* FROM note_tags
+                    JOIN notes ON notes.id = note_tags.note_id
+                    WHERE note_tags.user_id IS ? AND note_tags.tag = ? AND notes.deleted_at IS NULL
+                    ORDER BY notes.updated_at DESC
+                ''', (user_id, tag))
+            
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
             
             return [cls.from_dict(dict(row)) for row in rows]
             
@@ -162,50 +404,407 @@ class Note:
             return []
     
     @classmethod
-    def get_all_tags(cls):
-        """Get all unique tags from all notes"""
+    def find_in_range(cls, range_start, range_end, user_id=None, limit=1000):
+        """Find a user's notes whose time span overlaps [range_start, range_end)
+        
+        Notes without an end_time are treated as instants at start_time.
+        Arguments are ISO strings in the same format the notes are stored in.
+        """
         try:
-            conn = database.get_connection()
+            conn = database.get_connection(user_id=user_id)
             if not conn:
                 return []
-                
-            cursor = conn.cursor()
-            cursor.execute('SELECT DISTINCT tags FROM notes WHERE tags IS NOT NULL AND tags != "[]"')
-            rows = cursor.fetchall()
-            conn.close()
+
+            try:
+                cursor = conn.cursor()
+                # The start_time index bounds the scan; end_time only filters the candidates
+                cursor.execute('''
+                    SELECT * FROM notes
+                    WHERE user_id IS ? AND deleted_at IS NULL AND start_time < ?
+                    AND (end_time >= ? OR (end_time IS NULL AND start_time >= ?))
+                    ORDER BY start_time
+                    LIMIT ?
+                ''', (user_id, range_end, range_start, range_start, limit))
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
             
-            # Extract unique tags from JSON arrays
-            all_tags = set()
-            for row in rows:
-                try:
-                    tags = json.loads(row['tags'])
-                    all_tags.update(tags)
-                except:
-                    continue
+            return [cls.from_dict(dict(row)) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Error finding notes in range: {e}")
+            return []
+    
+    @classmethod
+    def count_by_bucket(cls, range_start, range_end, bucket='day', user_id=None):
+        """Count a user's notes starting in [range_start, range_end) per day or week
+        
+        Weeks are keyed by the date of their Monday. Returns a list of
+        {'bucket': 'YYYY-MM-DD', 'count': n} in date order.
+        """
+        bucket_expr = {
+            'day': 'substr(start_time, 1, 10)',
+            'week': "date(start_time, 'weekday 0', '-6 days')"
+        }[bucket]
+        
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return []
+
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT {bucket_expr} AS bucket, COUNT(*) AS count FROM notes
+                    WHERE user_id IS ? AND deleted_at IS NULL AND start_time >= ? AND start_time < ?
+                    GROUP BY bucket
+                    ORDER BY bucket
+                ''', (user_id, range_start, range_end))
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
             
-            return sorted(list(all_tags))
+            return [{'bucket': row['bucket'], 'count': row['count']} for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Error counting notes by {bucket}: {e}")
+            return []
+    
+    @classmethod
+    def get_all_tags(cls, user_id=None):
+        """Get all unique tags from a user's notes"""
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return []
+
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT DISTINCT tag FROM note_tags WHERE user_id IS ? ORDER BY tag', (user_id,))
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
+            
+            return [row['tag'] for row in rows]
             
         except Exception as e:
             logger.error(f"Error getting all tags: {e}")
             return []
     
-    def delete(self):
-        """Delete the note from SQLite database"""
+    @classmethod
+    def delete_by_id(cls, note_id, user_id=None):
+        """Move a user's note to the trash, returning the number of notes trashed
+        
+        The row stays until restored or purged, but leaves the tag, autocomplete
+        and fuzzy search indexes, so no lookup has to filter it back out.
+        """
+        conn = database.get_connection(user_id=user_id)
+        if not conn:
+            raise Exception("Database connection not available")
+        
         try:
-            if not self._id:
-                return False
-                
-            conn = database.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                'UPDATE notes SET deleted_at = ? WHERE id = ? AND user_id IS ? AND deleted_at IS NULL',
+                (datetime.utcnow().isoformat(), note_id, user_id)
+            )
+            deleted = cursor.rowcount
+            if deleted:
+                cls._clear_index_rows(cursor, [note_id])
+            conn.commit()
+            if deleted:
+                autocomplete.note_changed(user_id)
+                tag_suggester.note_deleted(note_id, user_id)
+            return deleted
+        finally:
+            conn.close()
+    
+    @classmethod
+    def find_deleted(cls, user_id=None):
+        """A user's trashed notes, most recently deleted first, with previews instead of content"""
+        try:
+            conn = database.get_connection(user_id=user_id)
             if not conn:
-                return False
-                
+                return []
+
+            try:
+                rows = conn.execute(f'''
+                    SELECT {PREVIEW_COLUMNS}, deleted_at FROM notes
+                    WHERE user_id IS ? AND deleted_at IS NOT NULL
+                    ORDER BY deleted_at DESC
+                ''', (user_id,)).fetchall()
+            finally:
+                conn.close()
+            
+            return [cls.from_dict(dict(row)) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Error finding deleted notes: {e}")
+            return []
+    
+    @classmethod
+    def restore(cls, note_id, user_id=None):
+        """Take a user's note out of the trash, returning it, or None if it is not in the trash"""
+        conn = database.get_connection(user_id=user_id)
+        if not conn:
+            raise Exception("Database connection not available")
+        
+        try:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM notes WHERE id = ?', (self._id,))
-            success = cursor.rowcount > 0
+            cursor.execute(
+                'UPDATE notes SET deleted_at = NULL WHERE id = ? AND user_id IS ? AND deleted_at IS NOT NULL',
+                (note_id, user_id)
+            )
+            if cursor.rowcount == 0:
+                return None
+            note = cls.from_dict(dict(cursor.execute('SELECT * FROM notes WHERE id = ?', (note_id,)).fetchone()))
+            note._sync_tags(cursor)
+            note._sync_terms(cursor)
+            note._sync_search_index(cursor)
+            conn.commit()
+            autocomplete.note_changed(user_id)
+            tag_suggester.note_saved(note)
+            logger.info(f"♻️ Restored note {note._id} from the trash")
+            return note
+        finally:
+            conn.close()
+    
+    @classmethod
+    def purge_by_id(cls, note_id, user_id=None):
+        """Permanently delete one of a user's trashed notes, returning the number removed"""
+        conn = database.get_connection(user_id=user_id)
+        if not conn:
+            raise Exception("Database connection not available")
+        
+        try:
+            cursor = conn.cursor()
+            trashed = cursor.execute(
+                'SELECT id FROM notes WHERE id = ? AND user_id IS ? AND deleted_at IS NOT NULL', (note_id, user_id)
+            ).fetchone()
+            if not trashed:
+                return 0
+            cls._delete_rows(cursor, [trashed[0]])
             conn.commit()
+            return 1
+        finally:
             conn.close()
+    
+    @classmethod
+    def empty_trash(cls, user_id=None):
+        """Permanently delete all of a user's trashed notes, returning how many were removed"""
+        conn = database.get_connection(user_id=user_id)
+        if not conn:
+            raise Exception("Database connection not available")
+        
+        try:
+            cursor = conn.cursor()
+            note_ids = [row[0] for row in cursor.execute(
+                'SELECT id FROM notes WHERE user_id IS ? AND deleted_at IS NOT NULL', (user_id,)
+            )]
+            cls._delete_rows(cursor, note_ids)
+            conn.commit()
+            return len(note_ids)
+        finally:
+            conn.close()
+    
+    @classmethod
+    def purge_deleted(cls, older_than_days, batch_size=500):
+        """Permanently delete notes trashed more than older_than_days ago, from every database
+        
+        Each batch is its own short write transaction, so requests are not
+        locked out while a large trash is emptied. Afterwards freed pages are
+        returned to the filesystem where the file uses incremental
+        auto_vacuum. Returns the number of notes removed.
+        """
+        cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+        
+        def purge(user_id, conn):
+            removed = 0
+            while True:
+                cursor = conn.cursor()
+                note_ids = [row[0] for row in cursor.execute(
+                    'SELECT id FROM notes WHERE deleted_at IS NOT NULL AND deleted_at < ? LIMIT ?', (cutoff, batch_size)
+                )]
+                if not note_ids:
+                    break
+                cls._delete_rows(cursor, note_ids)
+                conn.commit()
+                removed += len(note_ids)
+            if removed:
+                # executescript steps the pragma to completion; execute() would free a single page.
+                # A no-op unless the file uses auto_vacuum = INCREMENTAL.
+                conn.executescript('PRAGMA incremental_vacuum;')
+            return removed
+        
+        main = database.get_connection()
+        if not main:
+            raise Exception("Database connection not available")
+        try:
+            removed = purge(None, main)
+        finally:
+            main.close()
+        if database.sharding:
+            removed += sum(database.for_each_shard(purge).values())
+        
+        if removed:
+            logger.info(f"🧹 Purged {removed} notes trashed more than {older_than_days} days ago")
+        return removed
+    
+    @staticmethod
+    def _clear_index_rows(cursor, note_ids):
+        """Drop notes from the tag, autocomplete and fuzzy search tables"""
+        params = [(note_id,) for note_id in note_ids]
+        cursor.executemany('DELETE FROM note_tags WHERE note_id = ?', params)
+        cursor.executemany('DELETE FROM note_terms WHERE note_id = ?', params)
+        if database.fts_available:
+            cursor.executemany('DELETE FROM notes_fts WHERE rowid = ?', params)
+    
+    @classmethod
+    def _delete_rows(cls, cursor, note_ids):
+        """Hard-delete notes and everything stored alongside them"""
+        params = [(note_id,) for note_id in note_ids]
+        cls._clear_index_rows(cursor, note_ids)
+        cursor.executemany('DELETE FROM note_summaries WHERE note_id = ?', params)
+        cursor.executemany('DELETE FROM note_revisions WHERE note_id = ?', params)
+        cursor.executemany('DELETE FROM notes WHERE id = ?', params)
+    
+    @classmethod
+    def shard_stats(cls):
+        """Count live and trashed notes and file size for every user shard (sharded mode only)"""
+        def stats(user_id, conn):
+            notes, trashed = conn.execute(
+                'SELECT COUNT(*) - COUNT(deleted_at), COUNT(deleted_at) FROM notes'
+            ).fetchone()
+            return {'notes': notes, 'trashed': trashed, 'size_bytes': os.path.getsize(database.shard_path(user_id))}
+        
+        return database.for_each_shard(stats)
+    
+    @classmethod
+    def migrate_to_shards(cls):
+        """Move owned notes from the main database into their users' shards
+        
+        Each user's notes are committed to the shard before they are removed
+        from the main database, so an interrupted run can leave duplicates
+        but never loses a note. Returns {user_id: moved_count}.
+        """
+        if not database.sharding:
+            raise Exception("Sharding is not enabled")
+        
+        main = database.get_connection()
+        if not main:
+            raise Exception("Database connection not available")
+        
+        moved = {}
+        try:
+            user_ids = [row[0] for row in main.execute('SELECT DISTINCT user_id FROM notes WHERE user_id IS NOT NULL')]
+            for user_id in user_ids:
+                rows = main.execute('SELECT * FROM notes WHERE user_id = ?', (user_id,)).fetchall()
+                
+                shard = database.get_connection(user_id=user_id)
+                try:
+                    cursor = shard.cursor()
+                    for row in rows:
+                        note = cls.from_dict(dict(row))
+                        cursor.execute('''
+                            INSERT INTO notes (user_id, title, content, preview, tags, start_time, end_time, created_at, updated_at, deleted_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', (user_id, row['title'], row['content'], row['preview'], row['tags'],
+                             row['start_time'], row['end_time'], row['created_at'], row['updated_at'], row['deleted_at']))
+                        note._id = cursor.lastrowid
+                        # History moves with the note, under its new id
+                        revisions = main.execute(
+                            'SELECT revision, kind, title, tags, body, created_at, updated_at FROM note_revisions WHERE note_id = ?',
+                            (row['id'],)
+                        ).fetchall()
+                        cursor.executemany('''
+                            INSERT INTO note_revisions (note_id, revision, kind, title, tags, body, created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', [(note._id, *revision) for revision in revisions])
+                        if note.deleted_at:
+                            continue
+                        note._sync_tags(cursor)
+                        note._sync_terms(cursor)
+                        note._sync_search_index(cursor)
+                    shard.commit()
+                finally:
+                    shard.close()
+                
+                main.execute('DELETE FROM note_tags WHERE user_id = ?', (user_id,))
+                main.execute('DELETE FROM note_terms WHERE user_id = ?', (user_id,))
+                # Summaries are a cache; the moved notes get fresh ones under their new ids
+                main.execute('DELETE FROM note_summaries WHERE note_id IN (SELECT id FROM notes WHERE user_id = ?)', (user_id,))
+                main.execute('DELETE FROM note_revisions WHERE note_id IN (SELECT id FROM notes WHERE user_id = ?)', (user_id,))
+                if database.fts_available:
+                    main.execute('DELETE FROM notes_fts WHERE rowid IN (SELECT id FROM notes WHERE user_id = ?)', (user_id,))
+                main.execute('DELETE FROM notes WHERE user_id = ?', (user_id,))
+                main.commit()
+                moved[user_id] = len(rows)
+                logger.info(f"✅ Moved {len(rows)} notes for user {user_id} into shard")
+            
+            # Notes get new ids in their shards
+            tag_suggester.reset()
+            autocomplete.reset()
+            return moved
+        finally:
+            main.close()
+    
+    @classmethod
+    def compact_storage(cls, batch_size=500):
+        """Rewrite stored content to match the current NOTE_COMPRESSION settings
+        
+        Covers the main database and, in sharded mode, every shard. Each
+        database is paged through by id, batch_size rows at a time, and each
+        batch is its own short write transaction, so memory stays bounded and
+        requests are not locked out on a large table. Returns {'scanned',
+        'rewritten', 'bytes_before', 'bytes_after'} summed over all databases.
+        """
+        totals = {'scanned': 0, 'rewritten': 0, 'bytes_before': 0, 'bytes_after': 0}
+        
+        def compact(user_id, conn):
+            last_id = 0
+            while True:
+                rows = conn.execute(
+                    'SELECT id, content FROM notes WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                updates = []
+                for note_id, stored in rows:
+                    totals['scanned'] += 1
+                    size = len(stored.encode('utf-8')) if isinstance(stored, str) else len(stored)
+                    totals['bytes_before'] += size
+                    if content_codec.is_current(stored):
+                        totals['bytes_after'] += size
+                        continue
+                    encoded = content_codec.encode(content_codec.decode(stored))
+                    totals['bytes_after'] += len(encoded.encode('utf-8')) if isinstance(encoded, str) else len(encoded)
+                    updates.append((encoded, note_id))
+                if updates:
+                    conn.executemany('UPDATE notes SET content = ? WHERE id = ?', updates)
+                    conn.commit()
+                totals['rewritten'] += len(updates)
+        
+        main = database.get_connection()
+        if not main:
+            raise Exception("Database connection not available")
+        try:
+            compact(None, main)
+        finally:
+            main.close()
+        if database.sharding:
+            database.for_each_shard(compact)
+        
+        logger.info(f"✅ Compacted note storage: {totals['rewritten']} of {totals['scanned']} notes rewritten")
+        return totals
+    
+    def delete(self):
+        """Move the note to the trash"""
+        try:
+            if not self._id:
+                return False
             
-            return success
+            return self.delete_by_id(self._id, self.user_id) > 0
             
         except Exception as e:
             logger.error(f"Error deleting note: {e}")
@@ -233,13 +832,13 @@ class Note:
         
         if data.get('start_time'):
             try:
-                start_time = datetime.fromisoformat(data['start_time'])
+                start_time = to_utc(datetime.fromisoformat(data['start_time']))
             except:
                 pass
                 
         if data.get('end_time'):
             try:
-                end_time = datetime.fromisoformat(data['end_time'])
+                end_time = to_utc(datetime.fromisoformat(data['end_time']))
             except:
                 pass
                 
@@ -255,21 +854,32 @@ class Note:
             except:
                 pass
         
+        deleted_at = None
+        if data.get('deleted_at'):
+            try:
+                deleted_at = datetime.fromisoformat(data['deleted_at'])
+            except:
+                pass
+        
         return cls(
             _id=data.get('id'),
+            user_id=data.get('user_id'),
             title=data.get('title', ''),
-            content=data.get('content', ''),
+            content=content_codec.decode(data['content']) if 'content' in data else None,
             tags=tags,
             start_time=start_time,
             end_time=end_time,
             created_at=created_at,
-            updated_at=updated_at
+            updated_at=updated_at,
+            preview=data.get('preview') if 'content' not in data else None,
+            deleted_at=deleted_at
         )
     
     def to_dict(self):
         """Convert Note instance to dictionary"""
-        return {
+        data = {
             'id': self._id,
+            'user_id': self.user_id,
             'title': self.title,
             'content': self.content,
             'tags': self.tags,
@@ -278,6 +888,11 @@ class Note:
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if self.preview is not None:
+            data['preview'] = self.preview
+        if self.deleted_at is not None:
+            data['deleted_at'] = self.deleted_at.isoformat()
+        return data
     
     def __repr__(self):
         return f'<Note {self.title}>'
\ No newline at end of file
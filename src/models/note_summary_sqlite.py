@@ -0,0 +1,105 @@
+import hashlib
+from datetime import datetime
+from src.config.database_sqlite import database
+import logging
+
+logger = logging.getLogger(__name__)
+
+def content_hash(content):
+    """Fingerprint of a note's plain-text content; a summary is valid only for the hash it was made from"""
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+class NoteSummary:
+    """A model-written summary of one version of a note's content
+
+    Rows live next to the note (in its shard when sharding is on). Only the
+    latest summary per note is kept; saving one drops those for older content.
+    """
+    def __init__(self, note_id=None, content_hash=None, summary=None, created_at=None):
+        self.note_id = note_id
+        self.content_hash = content_hash
+        self.summary = summary
+        self.created_at = created_at or datetime.utcnow()
+
+    def save(self, user_id=None):
+        """Store the summary, replacing any for earlier versions of the note"""
+        conn = database.get_connection(user_id=user_id)
+        if not conn:
+            raise Exception("Database connection not available")
+
+        try:
+            conn.execute('DELETE FROM note_summaries WHERE note_id = ? AND content_hash != ?', (self.note_id, self.content_hash))
+            conn.execute('''
+                INSERT OR REPLACE INTO note_summaries (note_id, content_hash, summary, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (self.note_id, self.content_hash, self.summary, self.created_at.isoformat()))
+            conn.commit()
+            return self
+        finally:
+            conn.close()
+
+    @classmethod
+    def exists(cls, note_id, content_hash, user_id=None):
+        """Whether a summary of exactly this content is stored"""
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return False
+
+            try:
+                row = conn.execute(
+                    'SELECT 1 FROM note_summaries WHERE note_id = ? AND content_hash = ?', (note_id, content_hash)
+                ).fetchone()
+            finally:
+                conn.close()
+
+            return row is not None
+
+        except Exception as e:
+            logger.error(f"Error checking note summary: {e}")
+            return False
+
+    @classmethod
+    def find_latest(cls, note_id, user_id=None):
+        """The stored summary for a note, whichever content version it was made from"""
+        try:
+            conn = database.get_connection(user_id=user_id)
+            if not conn:
+                return None
+
+            try:
+                row = conn.execute(
+                    'SELECT * FROM note_summaries WHERE note_id = ? ORDER BY created_at DESC LIMIT 1', (note_id,)
+                ).fetchone()
+            finally:
+                conn.close()
+
+            return cls.from_dict(dict(row)) if row else None
+
+        except Exception as e:
+            logger.error(f"Error finding note summary: {e}")
+            return None
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+
+        created_at = data.get('created_at')
+        return cls(
+            note_id=data.get('note_id'),
+            content_hash=data.get('content_hash'),
+            summary=data.get('summary'),
+            created_at=datetime.fromisoformat(created_at) if created_at else None
+        )
+
+    def to_dict(self):
+        return {
+            'note_id': self.note_id,
+            'content_hash': self.content_hash,
+            'summary': self.summary,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<NoteSummary {self.note_id} {self.content_hash[:8]}>'
@@ -1,11 +1,18 @@
 import sqlite3
 import json
+import base64
 from datetime import datetime
 from src.config.database_sqlite import database
 import logging
 
 logger = logging.getLogger(__name__)
 
+class DuplicateUserError(Exception):
+    """Raised when a save collides with the UNIQUE username or email constraint"""
+    def __init__(self, field):
+        self.field = field
+        super().__init__(f"{field.capitalize()} already exists")
+
 class User:
     def __init__(self, username=None, email=None, password_hash=None, _id=None, created_at=None, updated_at=None):
         self._id = _id
@@ -42,9 +49,9 @@ class User:
                 # Create new user
                 created_at_str = self.created_at.isoformat()
                 cursor.execute('''
-                    INSERT INTO users (username, email, password_hash, created_at)
-                    VALUES (?, ?, ?, ?)
-                ''', (self.username, self.email, self.password_hash, created_at_str))
+                    INSERT INTO users (username, email, password_hash, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (self.username, self.email, self.password_hash or '', created_at_str, updated_at_str))
                 
                 self._id = cursor.lastrowid
             
@@ -53,6 +60,18 @@ class User:
             logger.info(f"✅ User saved successfully with ID: {self._id}")
             return self
             
+        except sqlite3.IntegrityError as e:
+            # The UNIQUE constraints do the duplicate check for us in the same statement
+            if conn:
+                conn.rollback()
+            # Only a UNIQUE collision is a duplicate; NOT NULL or CHECK failures on the same columns are not
+            if str(e) == 'UNIQUE constraint failed: users.email':
+                raise DuplicateUserError('email')
+            if str(e) == 'UNIQUE constraint failed: users.username':
+                raise DuplicateUserError('username')
+            error_msg = f"Error saving user: {e}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
         except Exception as e:
             error_msg = f"Error saving user: {e}"
             logger.error(error_msg)
@@ -82,6 +101,92 @@ class User:
             logger.error(f"Error finding all users: {e}")
             return []
     
+    @classmethod
+    def find_page(cls, limit=50, cursor=None):
+        """Get one page of users, newest first, using keyset pagination on (created_at, id)
+        
+        Returns a (users, next_cursor) tuple; next_cursor is None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
+        after = cls.decode_cursor(cursor) if cursor else None
+        
+        try:
+            conn = database.get_connection()
+            if not conn:
+                return [], None
+                
+            db_cursor = conn.cursor()
+            # Fetch one extra row to know whether another page exists
+            if after:
+                db_cursor.execute('''
+                    SELECT * FROM users
+                    WHERE (created_at, id) < (?, ?)
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ''', (after[0], after[1], limit + 1))
+            else:
+                db_cursor.execute('''
+                    SELECT * FROM users
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ''', (limit + 1,))
+            rows = db_cursor.fetchall()
+            conn.close()
+            
+            users = [cls.from_dict(dict(row)) for row in rows[:limit]]
+            next_cursor = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_cursor = cls.encode_cursor(last['created_at'], last['id'])
+            return users, next_cursor
+            
+        except Exception as e:
+            logger.error(f"Error finding user page: {e}")
+            return [], None
+    
+    @staticmethod
+    def encode_cursor(created_at, user_id):
+        """Encode a (created_at, id) keyset position as an opaque cursor string"""
+        raw = f"{created_at}|{user_id}".encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor produced by encode_cursor back into (created_at, id)"""
+        try:
+            created_at, user_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+            return created_at, int(user_id)
+        except Exception:
+            raise ValueError('Invalid cursor')
+    
+    @classmethod
+    def find_by_username_prefix(cls, prefix, limit=10):
+        """Find users whose username starts with prefix, for autocomplete
+        
+        Uses a range scan on the username index instead of LIKE, which SQLite
+        cannot serve from a case-sensitive index.
+        """
+        try:
+            conn = database.get_connection()
+            if not conn:
+                return []
+                
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM users
+                WHERE username >= ? AND username < ?
+                ORDER BY username
+                LIMIT ?
+            ''', (prefix, prefix + '\U0010ffff', limit))
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return [cls.from_dict(dict(row)) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Error finding users by prefix: {e}")
+            return []
+    
     @classmethod
     def find_by_id(cls, user_id):
         """Find a user by ID"""
@@ -129,7 +234,8 @@ class User:
                 return None
                 
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+            # Emails are matched case-insensitively, served by the NOCASE unique index
+            cursor.execute('SELECT * FROM users WHERE email = ? COLLATE NOCASE', (email,))
             row = cursor.fetchone()
             conn.close()
             
@@ -139,23 +245,28 @@ class User:
             logger.error(f"Error finding user by email: {e}")
             return None
     
+    @classmethod
+    def delete_by_id(cls, user_id):
+        """Delete a user by ID with a single statement, returning the number of rows removed"""
+        conn = database.get_connection()
+        if not conn:
+            raise Exception("Database connection not available")
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+    
     def delete(self):
         """Delete the user from SQLite database"""
         try:
             if not self._id:
                 return False
-                
-            conn = database.get_connection()
-            if not conn:
-                return False
-                
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM users WHERE id = ?', (self._id,))
-            success = cursor.rowcount > 0
-            conn.commit()
-            conn.close()
             
-            return success
+            return self.delete_by_id(self._id) > 0
             
         except Exception as e:
             logger.error(f"Error deleting user: {e}")
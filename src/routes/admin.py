@@ -0,0 +1,154 @@
+from flask import Blueprint, jsonify, request
+from src.config.database_sqlite import database
+from src.config.metrics import slow_queries
+from src.config.job_queue import job_queue
+from src.models.note_sqlite import Note
+from src.models.job_sqlite import Job
+from src.models.ai_usage_sqlite import AIUsage
+from src.config.ai_quota import ai_quota
+from src.services.note_trash import note_trash
+import os
+import hmac
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.before_request
+def require_admin_token():
+    """Require the X-Admin-Token header to match ADMIN_TOKEN
+    
+    Fails closed: without ADMIN_TOKEN configured the admin API does not exist.
+    """
+    token = os.environ.get('ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode('utf-8'), token.encode('utf-8')):
+        return jsonify({'error': 'Forbidden'}), 403
+
+@admin_bp.route('/admin/shards', methods=['GET'])
+def get_shards():
+    """List user shards with their note counts and file sizes"""
+    try:
+        return jsonify({
+            'sharding': database.sharding,
+            'max_open_shards': database.max_open_shards,
+            'open_shards': len(database._shards),
+            'shards': Note.shard_stats() if database.sharding else {}
+        })
+    except Exception as e:
+        logger.error(f"Error listing shards: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/shards/migrate', methods=['POST'])
+def migrate_shards():
+    """Move owned notes from the main database into per-user shards"""
+    try:
+        if not database.sharding:
+            return jsonify({'error': 'Sharding is not enabled'}), 400
+        
+        moved = Note.migrate_to_shards()
+        return jsonify({'moved': moved, 'total': sum(moved.values())})
+    except Exception as e:
+        logger.error(f"Error migrating notes to shards: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/shards/optimize', methods=['POST'])
+def optimize_shards():
+    """Run PRAGMA optimize and checkpoint the WAL on every shard"""
+    try:
+        if not database.sharding:
+            return jsonify({'error': 'Sharding is not enabled'}), 400
+        
+        def optimize(user_id, conn):
+            conn.execute('PRAGMA optimize')
+            busy, log_frames, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+            return {'wal_frames': log_frames, 'checkpointed': checkpointed}
+        
+        return jsonify({'shards': database.for_each_shard(optimize)})
+    except Exception as e:
+        logger.error(f"Error optimizing shards: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/notes/compact', methods=['POST'])
+def compact_notes():
+    """Re-encode stored note content for the current NOTE_COMPRESSION settings
+    
+    ?vacuum=1 also runs VACUUM on the main database to return freed pages to the OS,
+    switching it to incremental auto_vacuum so later trash purges shrink it as they go.
+    """
+    try:
+        result = Note.compact_storage()
+        if request.args.get('vacuum') in ('1', 'true'):
+            conn = database.get_connection()
+            try:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            finally:
+                conn.close()
+            result['vacuumed'] = True
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error compacting note storage: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/notes/purge-trash', methods=['POST'])
+def purge_trash():
+    """Permanently delete notes trashed longer than TRASH_RETENTION_DAYS, now rather than at the next purge job"""
+    try:
+        return jsonify({'purged': note_trash.purge()})
+    except Exception as e:
+        logger.error(f"Error purging trashed notes: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/jobs', methods=['GET'])
+def get_jobs():
+    """Job counts by status and the state of this process's worker pool"""
+    try:
+        return jsonify({
+            'enabled': job_queue.enabled,
+            'workers': len(job_queue._workers),
+            'counts': Job.count_by_status()
+        })
+    except Exception as e:
+        logger.error(f"Error getting job stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/ai-usage', methods=['GET'])
+def get_ai_usage():
+    """Today's AI token total against the shared budget, and the heaviest users"""
+    try:
+        days = min(max(request.args.get('days', 1, type=int), 1), 90)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+        return jsonify({
+            'today': AIUsage.day_totals(),
+            'budget_tokens': ai_quota.budget_tokens or None,
+            'top_users': AIUsage.top_users(days=days, limit=limit)
+        })
+    except Exception as e:
+        logger.error(f"Error getting AI usage: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Get the slowest statements seen, with their worst-case parameters and query plan"""
+    try:
+        sort = request.args.get('sort', 'total_ms')
+        if sort not in ('total_ms', 'max_ms', 'count'):
+            return jsonify({'error': 'sort must be total_ms, max_ms or count'}), 400
+        
+        limit = min(max(request.args.get('limit', 20, type=int), 1), slow_queries.MAX_ENTRIES)
+        return jsonify({
+            'threshold_ms': slow_queries.threshold_ms,
+            'queries': slow_queries.worst(limit=limit, sort=sort)
+        })
+    except Exception as e:
+        logger.error(f"Error listing slow queries: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/slow-queries', methods=['DELETE'])
+def reset_slow_queries():
+    """Clear the aggregated slow query log"""
+    slow_queries.reset()
+    return '', 204
@@ -1,10 +1,75 @@
 from flask import Blueprint, request, jsonify
-import asyncio
-from src.config.ai_client import ai_client
+from src.config.ai_quota import ai_quota
+from src.config.job_queue import job_queue, PRIORITY_INTERACTIVE
+from src.config.metrics import metrics
 from src.models.note_sqlite import Note  # Switch to SQLite Note model
+from src.models.ai_usage_sqlite import AIUsage
+from src.models.note_summary_sqlite import NoteSummary, content_hash
+from src.routes.user import get_current_user_id
+from src.services.tag_suggester import tag_suggester
 
 ai_bp = Blueprint('ai', __name__)
 
+def _run(coro):
+    """Run an AI client coroutine to completion from a sync Flask handler"""
+    # asyncio is imported here rather than at module level to keep cold starts fast
+    import asyncio
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def _complete(**kwargs):
+    """Call the model and return the reply text
+    
+    Inside a background job an upstream error raises, so the job queue
+    retries it with backoff instead of storing the error text as the result.
+    """
+    # The client stack (routing, single-flight, concurrent.futures) loads on the first model call
+    from src.config.ai_client import get_ai_client
+    response = _run(get_ai_client().chat_completion(**kwargs))
+    job = job_queue.current_job()
+    if 'error' in response and job is not None:
+        raise RuntimeError(response['error'])
+    
+    usage = get_ai_client().extract_usage(response)
+    if usage['total_tokens']:
+        ai_quota.record(job.user_id if job is not None else get_current_user_id(), kwargs.get('task'), usage)
+    return get_ai_client().extract_content(response)
+
+def _dispatch(kind, payload):
+    """Run an AI task inline, or queue it and answer 202 when the client asks for async
+    
+    Clients opt in with ?async=1 or a 'Prefer: respond-async' header, then
+    poll /api/jobs/<id> for the result. Callers over a daily AI limit get
+    429 before anything is queued or sent upstream.
+    """
+    exceeded = ai_quota.check(get_current_user_id(), kind.split('.', 1)[-1])
+    if exceeded:
+        response = jsonify(exceeded)
+        response.headers['Retry-After'] = str(exceeded['retry_after'])
+        return response, 429
+    
+    wants_async = request.args.get('async') in ('1', 'true') or 'respond-async' in request.headers.get('Prefer', '')
+    if wants_async and job_queue.enabled:
+        job = job_queue.submit(kind, payload, user_id=get_current_user_id(), priority=PRIORITY_INTERACTIVE)
+        response = jsonify({'job_id': job.id, 'status': job.status, 'status_url': f'/api/jobs/{job.id}'})
+        response.headers['Location'] = f'/api/jobs/{job.id}'
+        return response, 202
+    return jsonify(job_queue.run_inline(kind, payload))
+
+@ai_bp.route('/ai/usage', methods=['GET'])
+def get_usage():
+    """The caller's AI token usage today against their limits, plus per-day history"""
+    try:
+        days = min(max(request.args.get('days', 7, type=int), 1), 90)
+        user_id = get_current_user_id()
+        return jsonify({**ai_quota.status(user_id), 'history': AIUsage.history(user_id, days=days)})
+    except Exception as e:
+        return jsonify({'error': f'Failed to load usage: {str(e)}'}), 500
+
 @ai_bp.route('/ai/summarize', methods=['POST'])
 def summarize_note():
     """Generate a summary for note content"""
@@ -15,39 +80,61 @@ def summarize_note():
         if not content:
             return jsonify({'error': 'Content is required'}), 400
         
-        messages = [
-            {
-                "role": "user", 
-                "content": f"Please provide a concise summary of the following text:\n\n{content}"
-            }
-        ]
-        
-        system_prompt = "You are a helpful assistant that creates clear, concise summaries of text content. Keep summaries under 100 words and focus on the main points."
-        
-        # Run async function in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            response = loop.run_until_complete(
-                ai_client.chat_completion(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=0.3,
-                    max_tokens=200
-                )
-            )
-        finally:
-            loop.close()
-        
-        summary = ai_client.extract_content(response)
-        return jsonify({'summary': summary})
+        return _dispatch('ai.summarize', {'content': content})
         
     except Exception as e:
         return jsonify({'error': f'Failed to generate summary: {str(e)}'}), 500
 
+@job_queue.handler('ai.summarize')
+def summarize_task(payload):
+    messages = [
+        {
+            "role": "user", 
+            "content": f"Please provide a concise summary of the following text:\n\n{payload['content']}"
+        }
+    ]
+    
+    system_prompt = "You are a helpful assistant that creates clear, concise summaries of text content. Keep summaries under 100 words and focus on the main points."
+    
+    summary = _complete(
+        task='summarize',
+        messages=messages,
+        system_prompt=system_prompt,
+        temperature=0.3,
+        max_tokens=200
+    )
+    return {'summary': summary}
+
+@job_queue.handler('notes.summarize')
+def note_summary_task(payload):
+    """Store a summary of a note's current content (queued by src/services/note_summarizer.py)"""
+    user_id = payload.get('user_id')
+    note = Note.find_by_id(payload['note_id'], user_id=user_id)
+    if note is None:
+        return {'skipped': 'deleted'}
+    
+    # The note may have changed again since this job was queued; summarize what is there now
+    current_hash = content_hash(note.content)
+    if NoteSummary.exists(note._id, current_hash, user_id=user_id):
+        return {'skipped': 'current'}
+    if ai_quota.check(user_id, 'summarize'):
+        return {'skipped': 'quota'}
+    
+    summary = summarize_task({'content': note.content})['summary']
+    if summary.startswith('Error:'):
+        # Only reached inline; inside a job _complete raises and the job is retried
+        return {'skipped': 'error', 'error': summary}
+    NoteSummary(note_id=note._id, content_hash=current_hash, summary=summary).save(user_id=user_id)
+    return {'note_id': note._id, 'content_hash': current_hash}
+
 @ai_bp.route('/ai/generate-tags', methods=['POST'])
 def generate_tags():
-    """Generate relevant tags for note content"""
+    """Generate relevant tags for note content
+    
+    Tags are ranked locally from the caller's own tagged notes. The model is
+    asked only when there is nothing to go on locally, or when the request
+    sets "second_opinion": true.
+    """
     try:
         data = request.get_json()
         title = data.get('title', '').strip()
@@ -56,45 +143,48 @@ def generate_tags():
         if not title and not content:
             return jsonify({'error': 'Title or content is required'}), 400
         
-        text_to_analyze = f"Title: {title}\n\nContent: {content}" if title else content
-        
-        messages = [
-            {
-                "role": "user",
-                "content": f"Based on the following text, suggest 3-5 relevant tags that would help categorize and find this note. Return only the tags separated by commas, no explanations:\n\n{text_to_analyze}"
-            }
-        ]
-        
-        system_prompt = "You are a helpful assistant that generates relevant, concise tags for text content. Return only the tags separated by commas, with no additional text or explanations."
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            response = loop.run_until_complete(
-                ai_client.chat_completion(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=0.5,
-                    max_tokens=100
-                )
-            )
-        finally:
-            loop.close()
-        
-        tags_text = ai_client.extract_content(response)
-        
-        # Parse tags from response
-        if tags_text and not tags_text.startswith('Error:'):
-            tags = [tag.strip() for tag in tags_text.split(',') if tag.strip()]
-            tags = tags[:5]  # Limit to 5 tags
-        else:
-            tags = []
+        local_tags = [s['tag'] for s in tag_suggester.suggest(get_current_user_id(), title, content, limit=5)]
+        if local_tags and not data.get('second_opinion'):
+            metrics.ai_fast_path.inc('generate-tags', 'local')
+            return jsonify({'tags': local_tags, 'source': 'local'})
         
-        return jsonify({'tags': tags})
+        metrics.ai_fast_path.inc('generate-tags', 'model')
+        return _dispatch('ai.generate-tags', {'title': title, 'content': content, 'local_tags': local_tags})
         
     except Exception as e:
         return jsonify({'error': f'Failed to generate tags: {str(e)}'}), 500
 
+@job_queue.handler('ai.generate-tags')
+def generate_tags_task(payload):
+    title, content = payload['title'], payload['content']
+    text_to_analyze = f"Title: {title}\n\nContent: {content}" if title else content
+    
+    messages = [
+        {
+            "role": "user",
+            "content": f"Based on the following text, suggest 3-5 relevant tags that would help categorize and find this note. Return only the tags separated by commas, no explanations:\n\n{text_to_analyze}"
+        }
+    ]
+    
+    system_prompt = "You are a helpful assistant that generates relevant, concise tags for text content. Return only the tags separated by commas, with no additional text or explanations."
+    
+    tags_text = _complete(
+        task='generate-tags',
+        messages=messages,
+        system_prompt=system_prompt,
+        temperature=0.5,
+        max_tokens=100
+    )
+    
+    # Parse tags from response
+    if tags_text and not tags_text.startswith('Error:'):
+        tags = [tag.strip() for tag in tags_text.split(',') if tag.strip()]
+        tags = tags[:5]  # Limit to 5 tags
+    else:
+        tags = []
+    
+    return {'tags': tags, 'local_tags': payload.get('local_tags', []), 'source': 'model'}
+
 @ai_bp.route('/ai/improve-content', methods=['POST'])
 def improve_content():
     """Improve note content with AI suggestions"""
@@ -106,45 +196,41 @@ def improve_content():
         if not content:
             return jsonify({'error': 'Content is required'}), 400
         
-        # Different prompts for different improvement types
-        prompts = {
-            'general': "Please improve the following text by making it clearer, more organized, and easier to read:",
-            'grammar': "Please correct any grammar, spelling, and punctuation errors in the following text:",
-            'clarity': "Please rewrite the following text to make it clearer and more concise:",
-            'expand': "Please expand on the following text by adding more detail and explanation:"
-        }
-        
-        prompt = prompts.get(improvement_type, prompts['general'])
-        
-        messages = [
-            {
-                "role": "user",
-                "content": f"{prompt}\n\n{content}"
-            }
-        ]
-        
-        system_prompt = "You are a helpful writing assistant. Improve the given text while maintaining the original meaning and tone. Return only the improved text without explanations."
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            response = loop.run_until_complete(
-                ai_client.chat_completion(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=0.3,
-                    max_tokens=1500
-                )
-            )
-        finally:
-            loop.close()
-        
-        improved_content = ai_client.extract_content(response)
-        return jsonify({'improved_content': improved_content})
+        return _dispatch('ai.improve-content', {'content': content, 'type': improvement_type})
         
     except Exception as e:
         return jsonify({'error': f'Failed to improve content: {str(e)}'}), 500
 
+@job_queue.handler('ai.improve-content')
+def improve_content_task(payload):
+    # Different prompts for different improvement types
+    prompts = {
+        'general': "Please improve the following text by making it clearer, more organized, and easier to read:",
+        'grammar': "Please correct any grammar, spelling, and punctuation errors in the following text:",
+        'clarity': "Please rewrite the following text to make it clearer and more concise:",
+        'expand': "Please expand on the following text by adding more detail and explanation:"
+    }
+    
+    prompt = prompts.get(payload['type'], prompts['general'])
+    
+    messages = [
+        {
+            "role": "user",
+            "content": f"{prompt}\n\n{payload['content']}"
+        }
+    ]
+    
+    system_prompt = "You are a helpful writing assistant. Improve the given text while maintaining the original meaning and tone. Return only the improved text without explanations."
+    
+    improved_content = _complete(
+        task='improve-content',
+        messages=messages,
+        system_prompt=system_prompt,
+        temperature=0.3,
+        max_tokens=1500
+    )
+    return {'improved_content': improved_content}
+
 @ai_bp.route('/ai/chat', methods=['POST'])
 def chat_with_notes():
     """Chat about notes or get answers based on note content"""
@@ -156,42 +242,38 @@ def chat_with_notes():
         if not question:
             return jsonify({'error': 'Question is required'}), 400
         
-        # If note_id provided, include note content in context
-        context = ""
-        if note_id:
-            note = Note.find_by_id(note_id)
-            if note:
-                context = f"Note Title: {note.title}\nNote Content: {note.content}\n\n"
-        
-        messages = [
-            {
-                "role": "user",
-                "content": f"{context}Question: {question}"
-            }
-        ]
-        
-        system_prompt = "You are a helpful assistant that can answer questions about notes and provide insights. Be concise and helpful in your responses."
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            response = loop.run_until_complete(
-                ai_client.chat_completion(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=0.7,
-                    max_tokens=800
-                )
-            )
-        finally:
-            loop.close()
-        
-        answer = ai_client.extract_content(response)
-        return jsonify({'answer': answer})
+        return _dispatch('ai.chat', {'question': question, 'note_id': note_id, 'user_id': get_current_user_id()})
         
     except Exception as e:
         return jsonify({'error': f'Failed to process chat: {str(e)}'}), 500
 
+@job_queue.handler('ai.chat')
+def chat_task(payload):
+    # If note_id provided, include note content in context
+    context = ""
+    if payload['note_id']:
+        note = Note.find_by_id(payload['note_id'], user_id=payload['user_id'])
+        if note:
+            context = f"Note Title: {note.title}\nNote Content: {note.content}\n\n"
+    
+    messages = [
+        {
+            "role": "user",
+            "content": f"{context}Question: {payload['question']}"
+        }
+    ]
+    
+    system_prompt = "You are a helpful assistant that can answer questions about notes and provide insights. Be concise and helpful in your responses."
+    
+    answer = _complete(
+        task='chat',
+        messages=messages,
+        system_prompt=system_prompt,
+        temperature=0.7,
+        max_tokens=800
+    )
+    return {'answer': answer}
+
 @ai_bp.route('/ai/search-assist', methods=['POST'])
 def search_assist():
     """Help users find notes by understanding natural language queries"""
@@ -202,60 +284,56 @@ def search_assist():
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        # Get all notes for context
-        all_notes = Note.find_all()
-        
-        if not all_notes:
-            return jsonify({'suggestions': [], 'search_terms': []})
-        
-        # Prepare notes context (limit to titles and first 100 chars of content)
-        notes_context = []
-        for note in all_notes[:20]:  # Limit to first 20 notes to avoid token limits
-            preview = note.content[:100] + "..." if len(note.content) > 100 else note.content
-            notes_context.append(f"- {note.title}: {preview}")
-        
-        context = "\n".join(notes_context)
-        
-        messages = [
-            {
-                "role": "user",
-                "content": f"Available notes:\n{context}\n\nUser search query: '{query}'\n\nBased on the available notes, suggest the most relevant search terms or note titles that match the user's query. Return as a JSON array of strings."
-            }
-        ]
-        
-        system_prompt = "You are a search assistant. Analyze the user's query and available notes to suggest relevant search terms. Return only a JSON array of suggested search terms, no explanations."
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            response = loop.run_until_complete(
-                ai_client.chat_completion(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=0.3,
-                    max_tokens=300
-                )
-            )
-        finally:
-            loop.close()
-        
-        suggestions_text = ai_client.extract_content(response)
-        
-        # Try to parse JSON response
-        try:
-            import json
-            suggestions = json.loads(suggestions_text)
-            if not isinstance(suggestions, list):
-                suggestions = [suggestions_text]
-        except:
-            # Fallback: split by common delimiters
-            suggestions = [s.strip().strip('"\'') for s in suggestions_text.replace('\n', ',').split(',') if s.strip()]
-        
-        return jsonify({'suggestions': suggestions[:5]})  # Limit to 5 suggestions
+        return _dispatch('ai.search-assist', {'query': query, 'user_id': get_current_user_id()})
         
     except Exception as e:
         return jsonify({'error': f'Failed to process search assistance: {str(e)}'}), 500
 
+@job_queue.handler('ai.search-assist')
+def search_assist_task(payload):
+    # Get all notes for context
+    all_notes = Note.find_all(user_id=payload['user_id'])
+    
+    if not all_notes:
+        return {'suggestions': [], 'search_terms': []}
+    
+    # Prepare notes context (limit to titles and first 100 chars of content)
+    notes_context = []
+    for note in all_notes[:20]:  # Limit to first 20 notes to avoid token limits
+        preview = note.content[:100] + "..." if len(note.content) > 100 else note.content
+        notes_context.append(f"- {note.title}: {preview}")
+    
+    context = "\n".join(notes_context)
+    
+    messages = [
+        {
+            "role": "user",
+            "content": f"Available notes:\n{context}\n\nUser search query: '{payload['query']}'\n\nBased on the available notes, suggest the most relevant search terms or note titles that match the user's query. Return as a JSON array of strings."
+        }
+    ]
+    
+    system_prompt = "You are a search assistant. Analyze the user's query and available notes to suggest relevant search terms. Return only a JSON array of suggested search terms, no explanations."
+    
+    suggestions_text = _complete(
+        task='search-assist',
+        messages=messages,
+        system_prompt=system_prompt,
+        temperature=0.3,
+        max_tokens=300
+    )
+    
+    # Try to parse JSON response
+    try:
+        import json
+        suggestions = json.loads(suggestions_text)
+        if not isinstance(suggestions, list):
+            suggestions = [suggestions_text]
+    except:
+        # Fallback: split by common delimiters
+        suggestions = [s.strip().strip('"\'') for s in suggestions_text.replace('\n', ',').split(',') if s.strip()]
+    
+    return {'suggestions': suggestions[:5]}  # Limit to 5 suggestions
+
 @ai_bp.route('/ai/smart-create', methods=['POST'])
 def smart_create_note():
     """AI automatically parse input text and extract title, content, and time information"""
@@ -266,18 +344,35 @@ def smart_create_note():
         if not input_text:
             return jsonify({'error': 'Input text is required'}), 400
         
-        # Get current date and time information
-        from datetime import datetime, timedelta
-        import calendar
+        # Most quick-capture text is simple enough to parse without a model round trip
+        from src.services.time_parser import parse_quick_note
+        parsed = parse_quick_note(input_text)
+        if parsed:
+            metrics.ai_fast_path.inc('smart-create', 'local')
+            return jsonify({**parsed, 'parsed_by': 'local'})
         
-        now = datetime.now()
-        current_date = now.strftime('%Y-%m-%d')
-        current_time = now.strftime('%H:%M')
-        current_weekday = calendar.day_name[now.weekday()]
-        current_month = calendar.month_name[now.month]
+        metrics.ai_fast_path.inc('smart-create', 'model')
+        return _dispatch('ai.smart-create', {'text': input_text})
         
-        # Create context with current date/time information
-        date_context = f"""Current date and time information:
+    except Exception as e:
+        return jsonify({'error': f'Failed to parse text: {str(e)}'}), 500
+
+@job_queue.handler('ai.smart-create')
+def smart_create_task(payload):
+    input_text = payload['text']
+    
+    # Get current date and time information
+    from datetime import datetime, timedelta
+    import calendar
+    
+    now = datetime.now()
+    current_date = now.strftime('%Y-%m-%d')
+    current_time = now.strftime('%H:%M')
+    current_weekday = calendar.day_name[now.weekday()]
+    current_month = calendar.month_name[now.month]
+    
+    # Create context with current date/time information
+    date_context = f"""Current date and time information:
 - Today is {current_weekday}, {current_month} {now.day}, {now.year}
 - Current date: {current_date}
 - Current time: {current_time}
@@ -288,10 +383,10 @@ Use this information to interpret relative time expressions like:
 - "this weekend" = {(now + timedelta(days=5-now.weekday())).strftime('%Y-%m-%d')} or {(now + timedelta(days=6-now.weekday())).strftime('%Y-%m-%d')}
 """
 
-        messages = [
-            {
-                "role": "user",
-                "content": f"""{date_context}
+    messages = [
+        {
+            "role": "user",
+            "content": f"""{date_context}
 
 Please analyze the following text and extract structured information for a note. 
 
@@ -310,78 +405,68 @@ Examples of time expressions to interpret:
 - "December 25th 2024 from 10:00 to 12:00"
 
 Return only the JSON object, no explanations."""
-            }
-        ]
-        
-        system_prompt = """You are an expert at parsing natural language text to extract structured note information. 
+        }
+    ]
+    
+    system_prompt = """You are an expert at parsing natural language text to extract structured note information. 
         Focus on identifying:
         1. A clear, concise title that summarizes the main topic
         2. The detailed content/description
         3. Any mentioned dates and times (convert to ISO format)
         
         Always return valid JSON format only."""
+    
+    ai_response = _complete(
+        task='smart-create',
+        messages=messages,
+        system_prompt=system_prompt,
+        temperature=0.1,  # Low temperature for consistent parsing
+        max_tokens=500
+    )
+    
+    # Parse the JSON response
+    try:
+        import json
+        import re
+        
+        # Clean the response to extract JSON
+        json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+        if json_match:
+            json_str = json_match.group()
+            parsed_data = json.loads(json_str)
+        else:
+            # Fallback parsing
+            raise ValueError("No JSON found in response")
+        
+        # Validate and clean the parsed data
+        result = {
+            'title': str(parsed_data.get('title', 'Untitled')).strip()[:50],
+            'content': str(parsed_data.get('content', input_text)).strip(),
+            'start_time': parsed_data.get('start_time'),
+            'end_time': parsed_data.get('end_time'),
+            'parsed_by': 'model'
+        }
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            response = loop.run_until_complete(
-                ai_client.chat_completion(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=0.1,  # Low temperature for consistent parsing
-                    max_tokens=500
-                )
-            )
-        finally:
-            loop.close()
-        
-        ai_response = ai_client.extract_content(response)
-        
-        # Parse the JSON response
-        try:
-            import json
-            import re
-            
-            # Clean the response to extract JSON
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                parsed_data = json.loads(json_str)
-            else:
-                # Fallback parsing
-                raise ValueError("No JSON found in response")
-            
-            # Validate and clean the parsed data
-            result = {
-                'title': str(parsed_data.get('title', 'Untitled')).strip()[:50],
-                'content': str(parsed_data.get('content', input_text)).strip(),
-                'start_time': parsed_data.get('start_time'),
-                'end_time': parsed_data.get('end_time')
-            }
-            
-            # Validate datetime formats
-            from datetime import datetime
-            for time_field in ['start_time', 'end_time']:
-                if result[time_field]:
-                    try:
-                        # Try to parse the datetime to validate format
-                        datetime.fromisoformat(result[time_field].replace('Z', '+00:00'))
-                    except:
-                        result[time_field] = None
-            
-            return jsonify(result)
-            
-        except Exception as parse_error:
-            # Fallback: create basic structure
-            return jsonify({
-                'title': input_text[:50] + '...' if len(input_text) > 50 else input_text,
-                'content': input_text,
-                'start_time': None,
-                'end_time': None
-            })
-        
-    except Exception as e:
-        return jsonify({'error': f'Failed to parse text: {str(e)}'}), 500
+        # Validate datetime formats
+        for time_field in ['start_time', 'end_time']:
+            if result[time_field]:
+                try:
+                    # Try to parse the datetime to validate format
+                    datetime.fromisoformat(result[time_field].replace('Z', '+00:00'))
+                except:
+                    result[time_field] = None
+        
+        return result
+        
+    except Exception as parse_error:
+        # Fallback: create basic structure
+        return {
+            'title': input_text[:50] + '...' if len(input_text) > 50 else input_text,
+            'content': input_text,
+            'start_time': None,
+            'end_time': None,
+            'parsed_by': 'model'
+        }
 
 @ai_bp.route('/ai/translate', methods=['POST'])
 def translate_note():
@@ -395,26 +480,35 @@ def translate_note():
         if not title and not content:
             return jsonify({'error': 'Title or content is required for translation'}), 400
         
-        # Language mapping
-        language_map = {
-            'english': 'English',
-            'chinese': 'Chinese (Simplified)',
-            'japanese': 'Japanese'
-        }
+        return _dispatch('ai.translate', {'title': title, 'content': content, 'target_language': target_language})
         
-        target_lang_name = language_map.get(target_language, 'English')
-        
-        # Prepare text to translate
-        text_to_translate = ""
-        if title:
-            text_to_translate += f"Title: {title}\n\n"
-        if content:
-            text_to_translate += f"Content: {content}"
-        
-        messages = [
-            {
-                "role": "user",
-                "content": f"""Please translate the following note to {target_lang_name}. 
+    except Exception as e:
+        return jsonify({'error': f'Failed to translate note: {str(e)}'}), 500
+
+@job_queue.handler('ai.translate')
+def translate_task(payload):
+    title, content = payload['title'], payload['content']
+    
+    # Language mapping
+    language_map = {
+        'english': 'English',
+        'chinese': 'Chinese (Simplified)',
+        'japanese': 'Japanese'
+    }
+    
+    target_lang_name = language_map.get(payload['target_language'], 'English')
+    
+    # Prepare text to translate
+    text_to_translate = ""
+    if title:
+        text_to_translate += f"Title: {title}\n\n"
+    if content:
+        text_to_translate += f"Content: {content}"
+    
+    messages = [
+        {
+            "role": "user",
+            "content": f"""Please translate the following note to {target_lang_name}. 
                 
 Maintain the structure and formatting. Return the translation in JSON format with 'title' and 'content' fields.
 
@@ -423,57 +517,44 @@ Text to translate:
 
 Return only a JSON object like:
 {{"title": "translated title", "content": "translated content"}}"""
-            }
-        ]
-        
-        system_prompt = f"You are a professional translator. Translate the given text accurately to {target_lang_name} while preserving the meaning, tone, and structure. Return only the JSON object with translated title and content."
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            response = loop.run_until_complete(
-                ai_client.chat_completion(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=0.3,  # Low temperature for accurate translation
-                    max_tokens=2000
-                )
-            )
-        finally:
-            loop.close()
-        
-        ai_response = ai_client.extract_content(response)
-        
-        # Parse the JSON response
-        try:
-            import json
-            import re
-            
-            # Clean the response to extract JSON
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                parsed_data = json.loads(json_str)
-            else:
-                # Fallback parsing
-                raise ValueError("No JSON found in response")
-            
-            result = {
-                'title': str(parsed_data.get('title', title)).strip(),
-                'content': str(parsed_data.get('content', content)).strip(),
-                'target_language': target_lang_name
-            }
-            
-            return jsonify(result)
-            
-        except Exception as parse_error:
-            # Fallback: return original text if parsing fails
-            return jsonify({
-                'title': title,
-                'content': content,
-                'target_language': target_lang_name,
-                'error': 'Translation parsing failed, returned original text'
-            })
+        }
+    ]
+    
+    system_prompt = f"You are a professional translator. Translate the given text accurately to {target_lang_name} while preserving the meaning, tone, and structure. Return only the JSON object with translated title and content."
+    
+    ai_response = _complete(
+        task='translate',
+        messages=messages,
+        system_prompt=system_prompt,
+        temperature=0.3,  # Low temperature for accurate translation
+        max_tokens=2000
+    )
+    
+    # Parse the JSON response
+    try:
+        import json
+        import re
+        
+        # Clean the response to extract JSON
+        json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+        if json_match:
+            json_str = json_match.group()
+            parsed_data = json.loads(json_str)
+        else:
+            # Fallback parsing
+            raise ValueError("No JSON found in response")
         
-    except Exception as e:
-        return jsonify({'error': f'Failed to translate note: {str(e)}'}), 500
\ No newline at end of file
+        return {
+            'title': str(parsed_data.get('title', title)).strip(),
+            'content': str(parsed_data.get('content', content)).strip(),
+            'target_language': target_lang_name
+        }
+        
+    except Exception as parse_error:
+        # Fallback: return original text if parsing fails
+        return {
+            'title': title,
+            'content': content,
+            'target_language': target_lang_name,
+            'error': 'Translation parsing failed, returned original text'
+        }
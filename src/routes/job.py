@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from src.models.job_sqlite import Job
+from src.routes.user import get_current_user_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+job_bp = Blueprint('job', __name__)
+
+@job_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a background job submitted by the caller"""
+    try:
+        job = Job.find_by_id(job_id, user_id=get_current_user_id())
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        response = jsonify(job.to_dict())
+        if job.status in (Job.QUEUED, Job.RUNNING):
+            # Hint for pollers; workers pick jobs up within JOB_POLL_SECONDS
+            response.headers['Retry-After'] = '1'
+        return response
+    except Exception as e:
+        logger.error(f"Error getting job: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -1,6 +1,12 @@
 from flask import Blueprint, jsonify, request
-from datetime import datetime
-from src.models.note_sqlite import Note  # Switch to SQLite Note model
+from src.models.note_sqlite import Note, parse_iso_datetime  # Switch to SQLite Note model
+from src.routes.user import get_current_user_id
+from src.services.tag_suggester import tag_suggester
+from src.services.note_summarizer import note_summarizer
+from src.services.autocomplete import autocomplete
+from src.services.note_trash import note_trash
+from src.models.note_summary_sqlite import NoteSummary, content_hash
+from src.models.note_revision_sqlite import NoteRevision
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,9 +15,13 @@ note_bp = Blueprint('note', __name__)
 
 @note_bp.route('/notes', methods=['GET'])
 def get_notes():
-    """Get all notes, ordered by most recently updated"""
+    """Get the caller's notes, ordered by most recently updated
+    
+    ?view=preview returns each note's short preview instead of its full content.
+    """
     try:
-        notes = Note.find_all()
+        preview_only = request.args.get('view') == 'preview'
+        notes = Note.find_all(user_id=get_current_user_id(), preview_only=preview_only)
         return jsonify([note.to_dict() for note in notes])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -30,13 +40,13 @@ def create_note():
         
         if data.get('start_time'):
             try:
-                start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
+                start_time = parse_iso_datetime(data['start_time'])
             except ValueError:
                 return jsonify({'error': 'Invalid start_time format'}), 400
                 
         if data.get('end_time'):
             try:
-                end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
+                end_time = parse_iso_datetime(data['end_time'])
             except ValueError:
                 return jsonify({'error': 'Invalid end_time format'}), 400
         
@@ -45,6 +55,7 @@ def create_note():
             return jsonify({'error': 'Start time must be before end time'}), 400
         
         note = Note(
+            user_id=get_current_user_id(),
             title=data['title'],
             content=data['content'],
             tags=data.get('tags', []),
@@ -74,18 +85,98 @@ def create_note():
 def get_note(note_id):
     """Get a specific note by ID"""
     try:
-        note = Note.find_by_id(note_id)
+        note = Note.find_by_id(note_id, user_id=get_current_user_id())
         if not note:
             return jsonify({'error': 'Note not found'}), 404
         return jsonify(note.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/<note_id>/summary', methods=['GET'])
+def get_note_summary(note_id):
+    """Get the stored summary of a note
+    
+    A summary made from older content is still returned, marked stale, while
+    a fresh one is generated. With none at all the answer is 202 until the
+    background job has stored one.
+    """
+    try:
+        user_id = get_current_user_id()
+        note = Note.find_by_id(note_id, user_id=user_id)
+        if not note:
+            return jsonify({'error': 'Note not found'}), 404
+        
+        current_hash = content_hash(note.content)
+        summary = NoteSummary.find_latest(note._id, user_id=user_id)
+        if summary and summary.content_hash == current_hash:
+            return jsonify({**summary.to_dict(), 'stale': False})
+        
+        scheduled = note_summarizer.schedule(note)
+        if scheduled == 'inline':
+            summary = NoteSummary.find_latest(note._id, user_id=user_id)
+            if summary and summary.content_hash == current_hash:
+                return jsonify({**summary.to_dict(), 'stale': False})
+        if summary:
+            return jsonify({**summary.to_dict(), 'stale': True})
+        if scheduled == 'queued':
+            response = jsonify({'note_id': note._id, 'status': 'pending'})
+            response.headers['Retry-After'] = '2'
+            return response, 202
+        return jsonify({'error': 'No summary available for this note'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@note_bp.route('/notes/<note_id>/revisions', methods=['GET'])
+def get_note_revisions(note_id):
+    """List a note's revisions, newest first, without their content"""
+    try:
+        note = Note.find_by_id(note_id, user_id=get_current_user_id())
+        if not note:
+            return jsonify({'error': 'Note not found'}), 404
+        revisions = NoteRevision.find_all(note._id, user_id=note.user_id)
+        return jsonify([revision.to_dict() for revision in revisions])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@note_bp.route('/notes/<note_id>/revisions/<int:revision>', methods=['GET'])
+def get_note_revision(note_id, revision):
+    """Get one revision of a note with its full content"""
+    try:
+        note = Note.find_by_id(note_id, user_id=get_current_user_id())
+        if not note:
+            return jsonify({'error': 'Note not found'}), 404
+        found = NoteRevision.find(note._id, revision, user_id=note.user_id)
+        if not found:
+            return jsonify({'error': 'Revision not found'}), 404
+        return jsonify(found.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@note_bp.route('/notes/<note_id>/revisions/<int:revision>/restore', methods=['POST'])
+def restore_note_revision(note_id, revision):
+    """Make a revision's title, content and tags current again, as a new revision"""
+    try:
+        note = Note.find_by_id(note_id, user_id=get_current_user_id())
+        if not note:
+            return jsonify({'error': 'Note not found'}), 404
+        found = NoteRevision.find(note._id, revision, user_id=note.user_id)
+        if not found:
+            return jsonify({'error': 'Revision not found'}), 404
+        
+        note.title = found.title
+        note.content = found.content
+        note.tags = found.tags
+        # Never fold into the latest revision, which holds the version being replaced
+        note.save(coalesce_revision=False)
+        return jsonify(note.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @note_bp.route('/notes/<note_id>', methods=['PUT'])
 def update_note(note_id):
     """Update a specific note"""
     try:
-        note = Note.find_by_id(note_id)
+        note = Note.find_by_id(note_id, user_id=get_current_user_id())
         if not note:
             return jsonify({'error': 'Note not found'}), 404
             
@@ -101,7 +192,7 @@ def update_note(note_id):
         if 'start_time' in data:
             if data['start_time']:
                 try:
-                    note.start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
+                    note.start_time = parse_iso_datetime(data['start_time'])
                 except ValueError:
                     return jsonify({'error': 'Invalid start_time format'}), 400
             else:
@@ -110,7 +201,7 @@ def update_note(note_id):
         if 'end_time' in data:
             if data['end_time']:
                 try:
-                    note.end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
+                    note.end_time = parse_iso_datetime(data['end_time'])
                 except ValueError:
                     return jsonify({'error': 'Invalid end_time format'}), 400
             else:
@@ -127,44 +218,185 @@ def update_note(note_id):
 
 @note_bp.route('/notes/<note_id>', methods=['DELETE'])
 def delete_note(note_id):
-    """Delete a specific note"""
+    """Move a specific note to the trash"""
     try:
-        note = Note.find_by_id(note_id)
-        if not note:
+        if Note.delete_by_id(note_id, user_id=get_current_user_id()) == 0:
             return jsonify({'error': 'Note not found'}), 404
-            
-        note.delete()
         return '', 204
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/trash', methods=['GET'])
+def get_trash():
+    """List the caller's trashed notes with previews and when each will be purged"""
+    try:
+        notes = Note.find_deleted(user_id=get_current_user_id())
+        return jsonify([{**note.to_dict(), 'purges_at': note_trash.purges_at(note).isoformat()} for note in notes])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@note_bp.route('/notes/trash/<note_id>/restore', methods=['POST'])
+def restore_note(note_id):
+    """Take a note out of the trash"""
+    try:
+        note = Note.restore(note_id, user_id=get_current_user_id())
+        if not note:
+            return jsonify({'error': 'Note not found in trash'}), 404
+        return jsonify(note.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@note_bp.route('/notes/trash/<note_id>', methods=['DELETE'])
+def purge_note(note_id):
+    """Permanently delete a trashed note"""
+    try:
+        if Note.purge_by_id(note_id, user_id=get_current_user_id()) == 0:
+            return jsonify({'error': 'Note not found in trash'}), 404
+        return '', 204
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@note_bp.route('/notes/trash', methods=['DELETE'])
+def empty_trash():
+    """Permanently delete all of the caller's trashed notes"""
+    try:
+        return jsonify({'purged': Note.empty_trash(user_id=get_current_user_id())})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @note_bp.route('/notes/search', methods=['GET'])
 def search_notes():
-    """Search notes by title, content, or tags"""
+    """Search notes by title, content, or tags
+    
+    With fuzzy=1 the search tolerates typos, ranks results by closeness and
+    answers {"notes": [...], "did_you_mean": "corrected query" or null}.
+    With facets=1 it answers {"notes": [...], "facets": {...}}, counting
+    tags, created months and notes with a time range among the matches.
+    """
     try:
         query = request.args.get('q', '')
+        fuzzy = request.args.get('fuzzy') in ('1', 'true')
+        with_facets = request.args.get('facets') in ('1', 'true')
         if not query:
+            if fuzzy:
+                return jsonify({'notes': [], 'did_you_mean': None})
+            return jsonify({'notes': [], 'facets': {}} if with_facets else [])
+        
+        if with_facets and not fuzzy:
+            facet_limit = min(max(request.args.get('facet_limit', 10, type=int), 1), 100)
+            notes, facets = Note.search_with_facets(query, user_id=get_current_user_id(), facet_limit=facet_limit)
+            return jsonify({'notes': [note.to_dict() for note in notes], 'facets': facets})
+        
+        if fuzzy:
+            limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+            notes, suggestion = Note.fuzzy_search(query, user_id=get_current_user_id(), limit=limit)
+            return jsonify({'notes': [note.to_dict() for note in notes], 'did_you_mean': suggestion})
+        
+        notes = Note.search(query, user_id=get_current_user_id())
+        return jsonify([note.to_dict() for note in notes])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _parse_range_args():
+    """Parse ?from=&to= into UTC ISO strings, returning (range_start, range_end, error)
+    
+    Bounds are normalized like stored note times, so offsets in the query
+    compare correctly against them.
+    """
+    bounds = []
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if not value:
+            return None, None, f'{name} is required'
+        try:
+            bounds.append(parse_iso_datetime(value))
+        except ValueError:
+            return None, None, f'Invalid {name} format'
+    
+    if bounds[0] >= bounds[1]:
+        return None, None, 'from must be before to'
+    return bounds[0].isoformat(), bounds[1].isoformat(), None
+
+@note_bp.route('/notes/autocomplete', methods=['GET'])
+def autocomplete_notes():
+    """Suggest tags and note titles for a partly typed query, for search-as-you-type"""
+    try:
+        query = request.args.get('q', '')
+        if not query.strip():
             return jsonify([])
         
-        notes = Note.search(query)
+        limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+        return jsonify(autocomplete.suggest(get_current_user_id(), query, limit=limit))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@note_bp.route('/notes/range', methods=['GET'])
+def get_notes_in_range():
+    """Get the caller's notes whose time span overlaps ?from=&to="""
+    try:
+        range_start, range_end, error = _parse_range_args()
+        if error:
+            return jsonify({'error': error}), 400
+        
+        notes = Note.find_in_range(range_start, range_end, user_id=get_current_user_id())
         return jsonify([note.to_dict() for note in notes])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/calendar', methods=['GET'])
+def get_calendar_counts():
+    """Get per-day or per-week counts of notes starting between ?from=&to="""
+    try:
+        range_start, range_end, error = _parse_range_args()
+        if error:
+            return jsonify({'error': error}), 400
+        
+        bucket = request.args.get('bucket', 'day')
+        if bucket not in ('day', 'week'):
+            return jsonify({'error': 'bucket must be day or week'}), 400
+        
+        counts = Note.count_by_bucket(range_start, range_end, bucket=bucket, user_id=get_current_user_id())
+        return jsonify({'bucket': bucket, 'counts': counts})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @note_bp.route('/notes/tags', methods=['GET'])
 def get_all_tags():
-    """Get all unique tags from all notes"""
+    """Get all unique tags from the caller's notes"""
     try:
-        tags = Note.get_all_tags()
+        tags = Note.get_all_tags(user_id=get_current_user_id())
         return jsonify(tags)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/tag-suggestions', methods=['GET', 'POST'])
+def suggest_tags():
+    """Rank the caller's existing tags for a draft note, without calling the model
+    
+    Takes title, content and tags (already applied; comma separated in a
+    query string) as JSON or query parameters.
+    """
+    try:
+        data = request.get_json(silent=True) or request.args
+        tags = data.get('tags') or []
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+        limit = min(max(int(data.get('limit', 5)), 1), 20)
+        
+        suggestions = tag_suggester.suggest(
+            get_current_user_id(), data.get('title', ''), data.get('content', ''), tags, limit=limit
+        )
+        return jsonify({'suggestions': suggestions})
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @note_bp.route('/notes/tags/<tag>', methods=['GET'])
 def get_notes_by_tag(tag):
     """Get all notes with a specific tag"""
     try:
-        notes = Note.find_by_tag(tag)
+        notes = Note.find_by_tag(tag, user_id=get_current_user_id())
         return jsonify([note.to_dict() for note in notes])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
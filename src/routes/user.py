@@ -1,21 +1,79 @@
 from flask import Blueprint, jsonify, request
-from src.models.user_sqlite import User  # Switch to SQLite User model
+from src.models.user_sqlite import User, DuplicateUserError  # Switch to SQLite User model
 import logging
 
 logger = logging.getLogger(__name__)
 
 user_bp = Blueprint('user', __name__)
 
+def get_current_user_id():
+    """Resolve the calling user from the X-User-Id header (or ?user_id=)
+    
+    There is no authentication yet, so the value is trusted as-is. Requests
+    without one work on the shared notes that have no owner (user_id NULL).
+    A value that is present but not a positive integer raises ValueError;
+    reject_invalid_user_id turns that into a 400 before any route runs.
+    """
+    value = request.headers.get('X-User-Id')
+    if value is None:
+        value = request.args.get('user_id')
+    if value is None:
+        return None
+    try:
+        user_id = int(value)
+    except ValueError:
+        user_id = 0
+    if user_id <= 0:
+        raise ValueError(f"Invalid user id: {value!r}")
+    return user_id
+
+@user_bp.before_app_request
+def reject_invalid_user_id():
+    """Refuse a malformed caller id rather than falling back to the shared notes"""
+    try:
+        get_current_user_id()
+    except ValueError as e:
+        logger.warning(f"Rejected request: {e}")
+        return jsonify({'error': str(e)}), 400
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    """Get all users"""
+    """Get users one page at a time, newest first"""
     try:
-        users = User.find_all()
-        return jsonify([user.to_dict() for user in users])
+        limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        
+        try:
+            users, next_cursor = User.find_page(limit=limit, cursor=cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'users': [user.to_dict() for user in users],
+            'next_cursor': next_cursor
+        })
     except Exception as e:
         logger.error(f"Error fetching users: {e}")
         return jsonify({'error': str(e)}), 500
 
+@user_bp.route('/users/autocomplete', methods=['GET'])
+def autocomplete_users():
+    """Get users whose username starts with the given prefix"""
+    try:
+        prefix = request.args.get('prefix', '')
+        if not prefix:
+            return jsonify([])
+        
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        users = User.find_by_username_prefix(prefix, limit=limit)
+        return jsonify([user.to_dict() for user in users])
+    except Exception as e:
+        logger.error(f"Error autocompleting users: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @user_bp.route('/users', methods=['POST'])
 def create_user():
     """Create a new user"""
@@ -24,15 +82,12 @@ def create_user():
         if not data or 'username' not in data or 'email' not in data:
             return jsonify({'error': 'Username and email are required'}), 400
         
-        # Check if username or email already exists
-        if User.find_by_username(data['username']):
-            return jsonify({'error': 'Username already exists'}), 400
-        if User.find_by_email(data['email']):
-            return jsonify({'error': 'Email already exists'}), 400
-        
+        # Duplicate username/email is detected by the UNIQUE constraints on insert
         user = User(username=data['username'], email=data['email'])
         user.save()
         return jsonify(user.to_dict()), 201
+    except DuplicateUserError as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Error creating user: {e}")
         return jsonify({'error': str(e)}), 500
@@ -61,19 +116,13 @@ def update_user(user_id):
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        # Check for duplicate username/email if being changed
-        if 'username' in data and data['username'] != user.username:
-            if User.find_by_username(data['username']):
-                return jsonify({'error': 'Username already exists'}), 400
-                
-        if 'email' in data and data['email'] != user.email:
-            if User.find_by_email(data['email']):
-                return jsonify({'error': 'Email already exists'}), 400
-        
+        # Duplicate username/email is detected by the UNIQUE constraints on update
         user.username = data.get('username', user.username)
         user.email = data.get('email', user.email)
         user.save()
         return jsonify(user.to_dict())
+    except DuplicateUserError as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Error updating user {user_id}: {e}")
         return jsonify({'error': str(e)}), 500
@@ -82,11 +131,8 @@ def update_user(user_id):
 def delete_user(user_id):
     """Delete a specific user"""
     try:
-        user = User.find_by_id(user_id)
-        if not user:
+        if User.delete_by_id(user_id) == 0:
             return jsonify({'error': 'User not found'}), 404
-            
-        user.delete()
         return '', 204
     except Exception as e:
         logger.error(f"Error deleting user {user_id}: {e}")
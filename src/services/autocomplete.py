@@ -0,0 +1,125 @@
+"""Search-as-you-type suggestions over note titles and tags
+
+Every note's title words, whole title and tags are kept lowercased in the
+note_terms table, indexed on (user_id, term), so a prefix lookup is a range
+scan like the username autocomplete.
+
+Each keystroke usually extends the previous prefix. The cache keeps the
+candidate rows for recent prefixes. When a shorter prefix's rows are known
+to be complete (fewer than CANDIDATE_LIMIT matched), a longer one is
+answered by filtering them in memory. Typing "meet" then costs one range
+scan for "m" and nothing for "me", "mee", "meet". A user's cached entries
+are dropped when one of their notes changes, and every entry expires after
+AUTOCOMPLETE_CACHE_TTL seconds so other processes' writes show up.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from src.config.database_sqlite import database
+from src.config.metrics import metrics
+from src.services.fuzzy_match import words
+
+# Rows fetched per range scan; a prefix matching more than this is answered but not reused
+CANDIDATE_LIMIT = 200
+MAX_RESULTS = 20
+
+def index_terms(title, tags):
+    """The (term, kind) rows note_terms holds for a note"""
+    terms = {(word, 'title') for word in words(title) if len(word) >= 2}
+    if title and title.strip():
+        terms.add((' '.join(title.lower().split()), 'title'))
+    terms.update((tag.lower(), 'tag') for tag in tags or () if tag and tag.strip())
+    return terms
+
+class Autocomplete:
+    def __init__(self):
+        self.max_entries = int(os.environ.get('AUTOCOMPLETE_CACHE_SIZE', '1024'))
+        self.ttl = float(os.environ.get('AUTOCOMPLETE_CACHE_TTL', '30'))
+        # (user_id, prefix) -> (generation, stored_at, candidates, complete)
+        self._cache = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def suggest(self, user_id, query, limit=8):
+        """Up to `limit` suggestions: matching tags (with note counts) first, then note titles"""
+        prefix = ' '.join(query.lower().split())
+        if not prefix:
+            return []
+        candidates = self._candidates(user_id, prefix)
+        return self._rank(candidates, prefix, min(limit, MAX_RESULTS))
+
+    def note_changed(self, user_id):
+        """Forget cached prefixes for a user whose notes changed"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._cache.clear()
+            self._generations.clear()
+
+    def _candidates(self, user_id, prefix):
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generations.get(user_id, 0)
+            # The longest cached prefix of this query whose rows cover every match
+            for length in range(len(prefix), 0, -1):
+                entry = self._cache.get((user_id, prefix[:length]))
+                if entry is None:
+                    continue
+                entry_generation, stored_at, candidates, complete = entry
+                if entry_generation != generation or now - stored_at > self.ttl:
+                    del self._cache[(user_id, prefix[:length])]
+                    continue
+                if length == len(prefix) or complete:
+                    self._cache.move_to_end((user_id, prefix[:length]))
+                    metrics.autocomplete_lookups.inc('hit' if length == len(prefix) else 'narrowed')
+                    return [row for row in candidates if row[0].startswith(prefix)]
+        metrics.autocomplete_lookups.inc('miss')
+
+        candidates = self._fetch(user_id, prefix)
+        with self._lock:
+            self._cache[(user_id, prefix)] = (generation, now, candidates, len(candidates) < CANDIDATE_LIMIT)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return candidates
+
+    def _fetch(self, user_id, prefix):
+        """Range scan note_terms for (term, kind, note_id, title, updated_at) rows"""
+        conn = database.get_connection(user_id=user_id)
+        if not conn:
+            return []
+        try:
+            rows = conn.execute('''
+                SELECT note_terms.term, note_terms.kind, notes.id, notes.title, notes.updated_at
+                FROM note_terms JOIN notes ON notes.id = note_terms.note_id
+                WHERE note_terms.user_id IS ? AND note_terms.term >= ? AND note_terms.term < ?
+                ORDER BY note_terms.term
+                LIMIT ?
+            ''', (user_id, prefix, prefix + '\U0010ffff', CANDIDATE_LIMIT)).fetchall()
+            return [tuple(row) for row in rows]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _rank(candidates, prefix, limit):
+        tag_counts = {}
+        titles = {}
+        for term, kind, note_id, title, updated_at in candidates:
+            if kind == 'tag':
+                tag_counts[term] = tag_counts.get(term, 0) + 1
+            elif note_id not in titles:
+                titles[note_id] = (title, updated_at)
+
+        suggestions = [
+            {'type': 'tag', 'value': tag, 'count': count}
+            for tag, count in sorted(tag_counts.items(), key=lambda item: (-item[1], item[0]))
+        ]
+        # Titles that start with the prefix beat those matching on a later word; then most recent first
+        ranked_titles = sorted(titles.items(), key=lambda item: item[1][1] or '', reverse=True)
+        ranked_titles.sort(key=lambda item: not item[1][0].lower().startswith(prefix))
+        suggestions.extend({'type': 'note', 'id': note_id, 'value': title} for note_id, (title, _) in ranked_titles)
+        return suggestions[:limit]
+
+autocomplete = Autocomplete()
@@ -0,0 +1,104 @@
+"""Trigram helpers for typo-tolerant search over the notes_fts index
+
+notes_fts uses SQLite's FTS5 trigram tokenizer, so a query for any set of
+three-character sequences is an index lookup. A misspelled word still
+shares most of its trigrams with the intended one ("meetnig" and "meeting"
+share mee, eet), so OR-ing a query's trigrams finds candidates that
+Python then re-scores by how many of the trigrams each one contains.
+Every row also carries its owner as a one-trigram token in the owner
+column, and each query ANDs that token in, so FTS5 only visits the
+searching user's rows.
+"""
+import re
+import math
+from collections import Counter
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Share of the query's trigrams a note must contain to count as a match; a transposed
+# pair of letters ("meetnig") keeps only two of five. Short words get more slack, see min_coverage()
+MIN_COVERAGE = 0.4
+# Trigram similarity a vocabulary word needs to be offered as a correction
+MIN_SUGGESTION_SIMILARITY = 0.3
+# Unicode private use area (U+E000..U+F8FF) that owner tokens are spelled in
+PRIVATE_USE_START = 0xE000
+PRIVATE_USE_SIZE = 6400
+
+def words(text):
+    """Lowercase words of the text, in order"""
+    return WORD_PATTERN.findall((text or '').lower())
+
+def trigrams(word):
+    """The trigrams FTS5 indexes for a word; empty for words under three characters"""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def query_trigrams(query):
+    grams = set()
+    for word in words(query):
+        grams |= trigrams(word)
+    return grams
+
+def fts_match_any(grams):
+    """An FTS5 MATCH expression for rows containing any of the trigrams"""
+    return ' OR '.join('"' + gram.replace('"', '""') + '"' for gram in sorted(grams))
+
+def fts_phrase(text):
+    """An FTS5 MATCH expression for rows containing the text as a substring"""
+    return '"' + text.replace('"', '""') + '"'
+
+def owner_token(user_id):
+    """The owner column's value for a user's notes: a single trigram no other user's notes contain
+
+    The user id is written as three base-6400 digits from Unicode's private
+    use area, so the trigram index holds exactly the user's rows under it and
+    no query word, which is made of word characters, can match it.
+    """
+    number = user_id or 0
+    return ''.join(chr(PRIVATE_USE_START + number // PRIVATE_USE_SIZE ** place % PRIVATE_USE_SIZE) for place in (2, 1, 0))
+
+def fts_owned(user_id, expression):
+    """Restrict a MATCH expression to one user's rows"""
+    return f'owner : {fts_phrase(owner_token(user_id))} AND ({expression})'
+
+def min_coverage(query):
+    """Share of the query's trigrams a note must contain to match the query
+
+    MIN_COVERAGE overall, but every word may lose up to two trigrams as long
+    as one survives: one transposed pair in a short word ("alpah" for
+    "alpha") leaves a single trigram of three.
+    """
+    grams = query_trigrams(query)
+    if not grams:
+        return MIN_COVERAGE
+    needed = 0
+    for word in set(words(query)):
+        count = len(trigrams(word))
+        if count:
+            needed += min(math.ceil(MIN_COVERAGE * count), max(1, count - 2))
+    return min(needed, len(grams)) / len(grams)
+
+def coverage(grams, text):
+    """Fraction of the trigrams found in the text (case-insensitive)"""
+    if not grams:
+        return 0.0
+    text = (text or '').lower()
+    return sum(1 for gram in grams if gram in text) / len(grams)
+
+def similarity(a, b):
+    """Jaccard similarity of two words' padded trigrams, so short words and word edges count"""
+    a_grams, b_grams = trigrams(f'  {a} '), trigrams(f'  {b} ')
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+def best_correction(word, texts):
+    """The word in texts most similar to `word`, or None if nothing is close enough"""
+    vocabulary = Counter(candidate for text in texts for candidate in words(text) if len(candidate) >= 3)
+    vocabulary.pop(word, None)
+    best, best_score = None, MIN_SUGGESTION_SIMILARITY
+    for candidate, count in vocabulary.items():
+        if abs(len(candidate) - len(word)) > 3:
+            continue
+        # Frequency only breaks ties between equally close spellings
+        score = similarity(word, candidate) + count * 1e-6
+        if score > best_score:
+            best, best_score = candidate, score
+    return best
@@ -0,0 +1,76 @@
+"""Keeps a stored model summary for each note, regenerated when its content changes
+
+Saving a note whose content has no stored summary queues a 'notes.summarize'
+job (handled in src/routes/ai.py) a little later, so a burst of autosaves
+produces one model call rather than one per keystroke pause. The job hashes
+the note's content when it runs and does nothing if that version is already
+summarized. Reading a summary is then an indexed lookup.
+
+Environment:
+    NOTE_SUMMARIES              1 (default) or 0 to turn background summaries off
+    NOTE_SUMMARY_MIN_CHARS      shorter notes are not summarized (default 200)
+    NOTE_SUMMARY_DELAY_SECONDS  wait after a save before summarizing (default 30)
+"""
+import os
+import time
+import logging
+import threading
+from src.config.job_queue import job_queue, PRIORITY_BACKGROUND
+from src.models.note_summary_sqlite import NoteSummary, content_hash
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = 'notes.summarize'
+
+class NoteSummarizer:
+    def __init__(self):
+        self.enabled = os.environ.get('NOTE_SUMMARIES', '1').lower() not in ('0', 'false')
+        self.min_chars = int(os.environ.get('NOTE_SUMMARY_MIN_CHARS', '200'))
+        self.delay_seconds = float(os.environ.get('NOTE_SUMMARY_DELAY_SECONDS', '30'))
+        # (user_id, note_id, content_hash) -> monotonic time its queued job becomes runnable
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def wants_summary(self, note):
+        return self.enabled and note._id is not None and len((note.content or '').strip()) >= self.min_chars
+
+    def note_saved(self, note):
+        """Queue a summary for the note's new content, if it does not have one; never raises"""
+        if not self.wants_summary(note) or not job_queue.enabled:
+            return
+        try:
+            if not NoteSummary.exists(note._id, content_hash(note.content), user_id=note.user_id):
+                self.schedule(note, delay=self.delay_seconds)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not queue summary for note {note._id}: {e}")
+
+    def schedule(self, note, delay=0):
+        """Summarize the note in the background, or inline when there is no job queue
+
+        Returns 'queued', 'inline', or None when summaries are off for this note.
+        """
+        if not self.wants_summary(note):
+            return None
+        payload = {'note_id': note._id, 'user_id': note.user_id}
+        if job_queue.enabled:
+            if self._already_queued((note.user_id, note._id, content_hash(note.content)), delay):
+                return 'queued'
+            job_queue.submit(JOB_KIND, payload, user_id=note.user_id, priority=PRIORITY_BACKGROUND, delay=delay)
+            return 'queued'
+        job_queue.run_inline(JOB_KIND, payload)
+        return 'inline'
+
+    def _already_queued(self, key, delay):
+        """Record a job for this content version unless one already runs no later; clients poll while waiting"""
+        now = time.monotonic()
+        run_at = now + delay
+        with self._lock:
+            queued_at = self._pending.get(key)
+            if queued_at is not None and queued_at <= run_at and now - queued_at < job_queue.lease_seconds:
+                return True
+            self._pending[key] = run_at
+            if len(self._pending) > 1024:
+                self._pending = {k: t for k, t in self._pending.items() if now - t < job_queue.lease_seconds}
+        return False
+
+note_summarizer = NoteSummarizer()
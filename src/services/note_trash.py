@@ -0,0 +1,41 @@
+"""Permanently removes notes that have been in the trash past the retention period
+
+Deleting a note only stamps its deleted_at, so it can be restored. While
+job workers run, each process submits a 'notes.purge-trash' job every
+TRASH_PURGE_INTERVAL_SECONDS that hard-deletes expired trash in batches and
+then hands the freed pages back with an incremental vacuum. Without workers
+the purge runs from POST /api/admin/notes/purge-trash.
+
+Environment:
+    TRASH_RETENTION_DAYS          days a trashed note can still be restored (default 30)
+    TRASH_PURGE_BATCH             notes deleted per write transaction (default 500)
+    TRASH_PURGE_INTERVAL_SECONDS  how often the purge job is submitted (default 3600)
+"""
+import os
+from datetime import timedelta
+from src.config.job_queue import job_queue
+from src.models.note_sqlite import Note
+
+JOB_KIND = 'notes.purge-trash'
+
+class NoteTrash:
+    def __init__(self):
+        self.retention_days = float(os.environ.get('TRASH_RETENTION_DAYS', '30'))
+        self.batch_size = int(os.environ.get('TRASH_PURGE_BATCH', '500'))
+        self.interval_seconds = float(os.environ.get('TRASH_PURGE_INTERVAL_SECONDS', '3600'))
+
+    def purges_at(self, note):
+        """When a trashed note becomes eligible for the purge job"""
+        return note.deleted_at + timedelta(days=self.retention_days)
+
+    def purge(self):
+        """Hard-delete every note trashed longer than the retention period, returning the count"""
+        return Note.purge_deleted(self.retention_days, batch_size=self.batch_size)
+
+note_trash = NoteTrash()
+
+@job_queue.handler(JOB_KIND)
+def purge_trash_task(payload):
+    return {'purged': note_trash.purge()}
+
+job_queue.every(JOB_KIND, note_trash.interval_seconds)
@@ -0,0 +1,175 @@
+"""Local tag suggestions learned from a user's own tagged notes
+
+For each user the suggester keeps, in memory:
+    - how many notes carry each tag
+    - for each word, how many notes contain it (document frequency) and
+      how those notes are tagged
+    - how often each pair of tags appears on the same note
+
+A tag scores by summing, over the distinct words of the input, the word's
+IDF times the share of notes with that word that carry the tag. Tags that
+often co-occur with the note's existing tags, or whose name appears in the
+text, get a boost. The statistics are built from the database the first time a
+user asks, then updated incrementally as notes are saved and deleted.
+"""
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+from src.config.database_sqlite import database
+from src.config.content_codec import content_codec
+
+STOPWORDS = frozenset('''
+    the and for are but not you all any can had her was one our out day get has him his how man new now old see
+    two way who boy did its let put say she too use that with have this will your from they know want been good
+    much some time very when come here just like long make many more only over such take than them well were what
+    about after again also back because before being between both could does doing down during each even every
+    first into most other should still their there these those through under until where which while would
+'''.split())
+
+TOKEN_PATTERN = re.compile(r"[^\W_][\w'-]+", re.UNICODE)
+
+# Relative weights of the three signals
+COOCCURRENCE_WEIGHT = 0.5
+NAME_MATCH_WEIGHT = 2.0
+
+def tokenize(text):
+    """Distinct lowercase words of at least three characters, minus stopwords"""
+    return {
+        token.strip("'-") for token in TOKEN_PATTERN.findall((text or '').lower())
+        if len(token) >= 3 and token not in STOPWORDS
+    }
+
+class _UserTagModel:
+    def __init__(self):
+        self.note_count = 0
+        self.tag_counts = Counter()
+        self.doc_freq = Counter()
+        self.term_tags = {}
+        self.cooccurrence = {}
+        # note_id -> (terms, tags) as last counted, so updates can subtract the old version
+        self.notes = {}
+
+    def add(self, note_id, terms, tags):
+        self.remove(note_id)
+        tags = tuple(sorted(set(tags)))
+        self.notes[note_id] = (terms, tags)
+        self.note_count += 1
+        self.tag_counts.update(tags)
+        self.doc_freq.update(terms)
+        for term in terms:
+            if tags:
+                self.term_tags.setdefault(term, Counter()).update(tags)
+        for tag in tags:
+            self.cooccurrence.setdefault(tag, Counter()).update(other for other in tags if other != tag)
+
+    def remove(self, note_id):
+        previous = self.notes.pop(note_id, None)
+        if previous is None:
+            return
+        terms, tags = previous
+        self.note_count -= 1
+        self.tag_counts.subtract(tags)
+        self.doc_freq.subtract(terms)
+        for term in terms:
+            if tags:
+                self.term_tags[term].subtract(tags)
+        for tag in tags:
+            self.cooccurrence[tag].subtract(other for other in tags if other != tag)
+
+    def suggest(self, terms, existing_tags, limit):
+        scores = Counter()
+        for term in terms:
+            df = self.doc_freq.get(term, 0)
+            tagged = self.term_tags.get(term)
+            if df <= 0 or not tagged:
+                continue
+            idf = math.log(1 + self.note_count / df)
+            for tag, count in tagged.items():
+                if count > 0:
+                    scores[tag] += idf * count / df
+
+        for existing in existing_tags:
+            total = self.tag_counts.get(existing, 0)
+            for tag, count in self.cooccurrence.get(existing, {}).items():
+                if count > 0 and total > 0:
+                    scores[tag] += COOCCURRENCE_WEIGHT * count / total
+
+        for tag, count in self.tag_counts.items():
+            if count > 0 and tag.lower() in terms:
+                scores[tag] += NAME_MATCH_WEIGHT
+
+        excluded = set(existing_tags)
+        ranked = [(tag, score) for tag, score in scores.most_common() if tag not in excluded and score > 0]
+        return [{'tag': tag, 'score': round(score, 4)} for tag, score in ranked[:limit]]
+
+class TagSuggester:
+    """Per-user tag models, built on first use and kept in a bounded LRU"""
+    def __init__(self):
+        self.max_users = int(os.environ.get('TAG_SUGGESTER_MAX_USERS', '256'))
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def suggest(self, user_id, title='', content='', existing_tags=(), limit=5):
+        """Rank the user's existing tags for a note's text, best first"""
+        terms = tokenize(f'{title} {content}')
+        model = self._model(user_id)
+        with self._lock:
+            return model.suggest(terms, list(existing_tags), limit)
+
+    def note_saved(self, note):
+        """Fold a saved note into its owner's model, if that model is loaded"""
+        with self._lock:
+            model = self._models.get(note.user_id)
+            if model is not None:
+                model.add(note._id, tokenize(f'{note.title} {note.content}'), note.tags)
+
+    def note_deleted(self, note_id, user_id=None):
+        with self._lock:
+            model = self._models.get(user_id)
+            if model is not None:
+                model.remove(int(note_id))
+
+    def reset(self):
+        """Drop every model; they are rebuilt from the database on next use"""
+        with self._lock:
+            self._models.clear()
+
+    def _model(self, user_id):
+        with self._lock:
+            model = self._models.get(user_id)
+            if model is not None:
+                self._models.move_to_end(user_id)
+                return model
+
+        # Built outside the lock so one user's first request does not stall everyone else's
+        model = self._build(user_id)
+        with self._lock:
+            existing = self._models.get(user_id)
+            if existing is not None:
+                return existing
+            self._models[user_id] = model
+            while len(self._models) > self.max_users:
+                self._models.popitem(last=False)
+            return model
+
+    def _build(self, user_id):
+        model = _UserTagModel()
+        conn = database.get_connection(user_id=user_id)
+        if not conn:
+            return model
+        try:
+            rows = conn.execute('SELECT id, title, content, tags FROM notes WHERE user_id IS ? AND deleted_at IS NULL', (user_id,))
+            for note_id, title, content, tags_json in rows:
+                try:
+                    tags = json.loads(tags_json) if tags_json else []
+                except ValueError:
+                    tags = []
+                model.add(note_id, tokenize(f'{title} {content_codec.decode(content)}'), tags)
+        finally:
+            conn.close()
+        return model
+
+tag_suggester = TagSuggester()
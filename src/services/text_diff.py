@@ -0,0 +1,44 @@
+"""Compact word-level deltas between two versions of a note's content
+
+A delta is a JSON list that rebuilds the new text from the old one: a pair
+[start, end] copies that slice of the old text's tokens, a string inserts
+new text. Tokens are words with their trailing whitespace, so fixing a typo
+in a long paragraph stores the changed word and a few indexes rather than
+the paragraph. Autosave edits are local, so the shared head and tail are
+trimmed before difflib compares what is left.
+"""
+import re
+import json
+from difflib import SequenceMatcher
+
+TOKEN_PATTERN = re.compile(r'\s+|\S+\s*')
+
+def tokens(text):
+    """The text split into tokens that join back to exactly the text"""
+    return TOKEN_PATTERN.findall(text or '')
+
+def diff(old, new):
+    """A delta that turns old into new"""
+    a, b = tokens(old), tokens(new)
+    head = 0
+    while head < len(a) and head < len(b) and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < len(a) - head and tail < len(b) - head and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+
+    ops = [[0, head]] if head else []
+    matcher = SequenceMatcher(None, a[head:len(a) - tail], b[head:len(b) - tail], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([head + i1, head + i2])
+        elif j2 > j1:
+            ops.append(''.join(b[head + j1:head + j2]))
+    if tail:
+        ops.append([len(a) - tail, len(a)])
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+def apply(old, delta):
+    """Rebuild the text a delta was made for from the text it was made against"""
+    a = tokens(old)
+    return ''.join(''.join(a[op[0]:op[1]]) if isinstance(op, list) else op for op in json.loads(delta))
@@ -0,0 +1,253 @@
+"""Rule-based extraction of a title and start/end times from quick-capture text
+
+Handles the common shapes of quick-capture input without a model call:
+    "Dentist tomorrow at 3pm"
+    "Team offsite next Monday 9am to 5pm"
+    "Holiday party Dec 25 10:00-12:00"
+    "Call mom Friday 6pm for 30 min"
+
+parse_quick_note() returns None when the text holds anything it cannot
+pin down: vague times ("tomorrow morning"), bare hours ("at 3"), numeric
+dates that could be month/day or day/month, a day with no month ("the
+1st"), recurring events, or more than one date. The caller then falls back to the model.
+"""
+import re
+from datetime import datetime, time, timedelta
+
+MAX_TITLE_LENGTH = 50
+
+# Abbreviations that are also everyday words ("sat", "sun", "wed", "mar") are left out
+WEEKDAYS = {
+    'monday': 0, 'mon': 0, 'tuesday': 1, 'tue': 1, 'tues': 1, 'wednesday': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'friday': 4, 'fri': 4,
+    'saturday': 5, 'sunday': 6,
+}
+MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'april': 4, 'apr': 4,
+    'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7, 'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9, 'sept': 9, 'october': 10, 'oct': 10, 'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12,
+}
+
+_WEEKDAY = '|'.join(sorted(WEEKDAYS, key=len, reverse=True))
+_MONTH = '|'.join(sorted(MONTHS, key=len, reverse=True))
+_TIME = r'(?:(?:\d{1,2})(?::\d{2})?\s*(?:[ap]\.?m\.?)?|noon|midnight)'
+
+# Words that mean the text carries timing we do not resolve locally
+VAGUE_PATTERN = re.compile(
+    r'\b(?:morning|afternoon|evening|noonish|weekend|next\s+(?:week|month|year)|'
+    r'this\s+(?:week|month|year)|end\s+of|later|soon|sometime|every|daily|weekly|monthly|ish)\b',
+    re.IGNORECASE
+)
+# Day and month abbreviations that double as words; seeing one capitalized is enough to defer
+AMBIGUOUS_ABBREVIATIONS = re.compile(r'\b(?:Wed|Sat|Sun|Mar)\b\.?')
+
+RANGE_PATTERN = re.compile(
+    rf'\b(?:from\s+|between\s+)?(?P<start>{_TIME})\s*(?:-|–|to|until|till|and)\s*(?P<end>{_TIME})(?![\d:])',
+    re.IGNORECASE
+)
+TIME_PATTERN = re.compile(
+    rf'(?:\b(?P<at>at|@)\s*)?(?P<time>(?<![\d:/-])\d{{1,2}}(?::\d{{2}})?\s*(?:[ap]\.?m\.?)?(?![\d:/-])|\bnoon\b|\bmidnight\b)',
+    re.IGNORECASE
+)
+# "the 1st", "on the 15th": a day of some month we would have to guess
+ORDINAL_PATTERN = re.compile(r'\b\d{1,2}(?:st|nd|rd|th)\b', re.IGNORECASE)
+DURATION_PATTERN = re.compile(
+    r'\bfor\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>hours?|hrs?|h|minutes?|mins?|m)\b',
+    re.IGNORECASE
+)
+DATE_PATTERNS = (
+    ('iso', re.compile(r'\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b')),
+    ('month_day', re.compile(
+        rf'\b(?:on\s+)?(?P<month>{_MONTH})\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(?P<year>\d{{4}}))?\b',
+        re.IGNORECASE)),
+    ('day_month', re.compile(
+        rf'\b(?:on\s+)?(?:the\s+)?(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month>{_MONTH})\b\.?(?:,?\s+(?P<year>\d{{4}}))?',
+        re.IGNORECASE)),
+    ('relative', re.compile(
+        r'\b(?P<relative>the\s+day\s+after\s+tomorrow|day\s+after\s+tomorrow|today|tonight|tomorrow|tmrw|tmr|yesterday)\b',
+        re.IGNORECASE)),
+    ('offset', re.compile(r'\bin\s+(?P<amount>\d+)\s+(?P<unit>days?|weeks?)\b', re.IGNORECASE)),
+    ('weekday', re.compile(rf'\b(?:(?P<which>next|this|coming|on)\s+)?(?P<weekday>{_WEEKDAY})\b\.?', re.IGNORECASE)),
+    ('numeric', re.compile(r'\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b')),
+)
+RELATIVE_DAYS = {'today': 0, 'tonight': 0, 'tomorrow': 1, 'tmrw': 1, 'tmr': 1, 'yesterday': -1}
+
+class _Ambiguous(Exception):
+    pass
+
+def _parse_clock(text, default_meridiem=None):
+    """'3pm' -> (15, 0); '10:30' -> (10, 30); raises _Ambiguous for a bare '3'"""
+    text = text.lower().replace('.', '').replace(' ', '')
+    if text == 'noon':
+        return 12, 0
+    if text == 'midnight':
+        return 0, 0
+    match = re.fullmatch(r'(\d{1,2})(?::(\d{2}))?([ap]m)?', text)
+    if not match:
+        raise _Ambiguous(text)
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3) or default_meridiem
+    if minute > 59:
+        raise _Ambiguous(text)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise _Ambiguous(text)
+        return (hour % 12) + (12 if meridiem == 'pm' else 0), minute
+    # Without am/pm, take clock readings that are unlikely to mean the afternoon:
+    # "09:30", "10:00", "15:00". "2:00" could be either, so the model decides.
+    if match.group(2) is None or hour > 23:
+        raise _Ambiguous(text)
+    if 1 <= hour <= 6 and not match.group(1).startswith('0'):
+        raise _Ambiguous(text)
+    return hour, minute
+
+def _meridiem(text):
+    match = re.search(r'([ap])\.?m\.?\s*$', text, re.IGNORECASE)
+    return f'{match.group(1).lower()}m' if match else None
+
+def _parse_range_start(text, end_clock, end_meridiem):
+    """The start of a range whose am/pm may only be written on the end
+
+    "10 to 11pm" shares the end's pm; "9 to 5pm" and "11-12pm" only make
+    sense with the start in the morning. A start that lands after the end
+    either way ("11 to 2am") is left to the model.
+    """
+    if _meridiem(text) or not end_meridiem:
+        return _parse_clock(text)
+    for meridiem in (end_meridiem, 'am' if end_meridiem == 'pm' else 'pm'):
+        clock = _parse_clock(text, default_meridiem=meridiem)
+        if clock < end_clock:
+            return clock
+    raise _Ambiguous(text)
+
+def _resolve_date(kind, match, now):
+    today = now.date()
+    if kind == 'numeric':
+        # 03/04 is March 4th or 3rd April depending on the writer
+        raise _Ambiguous(match.group())
+    if kind == 'relative':
+        word = ' '.join(match.group('relative').lower().split())
+        if word.endswith('day after tomorrow'):
+            return today + timedelta(days=2)
+        return today + timedelta(days=RELATIVE_DAYS[word])
+    if kind == 'offset':
+        days = int(match.group('amount')) * (7 if match.group('unit').lower().startswith('week') else 1)
+        return today + timedelta(days=days)
+    if kind == 'weekday':
+        weekday = WEEKDAYS[match.group('weekday').lower()]
+        ahead = (weekday - today.weekday()) % 7
+        if ahead == 0 and (match.group('which') or '').lower() in ('next', 'coming'):
+            ahead = 7
+        return today + timedelta(days=ahead)
+
+    month = int(match.group('month')) if kind == 'iso' else MONTHS[match.group('month').lower().rstrip('.')]
+    day = int(match.group('day'))
+    year = int(match.group('year')) if match.group('year') else today.year
+    try:
+        date = datetime(year, month, day).date()
+    except ValueError:
+        raise _Ambiguous(match.group())
+    if not match.group('year') and date < today:
+        # "Dec 25" written in January means the coming one
+        date = date.replace(year=year + 1)
+    return date
+
+def _clean_title(text, spans):
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + ' ' + text[end:]
+    text = re.sub(r'\b(?:at|on|from|by|for|between|until|till|to)\b(?=\s*(?:$|[,.;:!?-]))', ' ', text, flags=re.IGNORECASE)
+    text = re.sub(r'\s+([,.;:!?])', r'\1', text)
+    text = ' '.join(text.split()).strip(' ,.;:-–')
+    text = re.sub(r'\s+(?:at|on|from|by|for|between|until|till|to)$', '', text, flags=re.IGNORECASE)
+    return text[:1].upper() + text[1:MAX_TITLE_LENGTH]
+
+def parse_quick_note(text, now=None):
+    """Return {'title', 'content', 'start_time', 'end_time'} or None when the model should decide
+
+    Times are naive local datetimes formatted as YYYY-MM-DDTHH:MM, the same
+    shape /api/ai/smart-create asks the model for.
+    """
+    now = now or datetime.now()
+    text = text.strip()
+    if not text or VAGUE_PATTERN.search(text) or AMBIGUOUS_ABBREVIATIONS.search(text):
+        return None
+
+    try:
+        spans = []
+
+        date = None
+        for kind, pattern in DATE_PATTERNS:
+            for match in pattern.finditer(text):
+                if any(start < match.end() and match.start() < end for start, end in spans):
+                    continue
+                if date is not None:
+                    # Two dates: a multi-day span or a correction, either way not ours to guess
+                    raise _Ambiguous(match.group())
+                date = _resolve_date(kind, match, now)
+                spans.append(match.span())
+
+        def overlaps(match):
+            return any(start < match.end() and match.start() < end for start, end in spans)
+
+        ordinal = next((m for m in ORDINAL_PATTERN.finditer(text) if not overlaps(m)), None)
+        if ordinal:
+            raise _Ambiguous(ordinal.group())
+
+        start_clock = end_clock = None
+        range_match = next((m for m in RANGE_PATTERN.finditer(text) if not overlaps(m)), None)
+        if range_match:
+            end_clock = _parse_clock(range_match.group('end'))
+            start_clock = _parse_range_start(range_match.group('start'), end_clock, _meridiem(range_match.group('end')))
+            spans.append(range_match.span())
+
+        duration = None
+        duration_match = DURATION_PATTERN.search(text)
+        if duration_match and not overlaps(duration_match):
+            amount = float(duration_match.group('amount'))
+            minutes = amount if duration_match.group('unit').lower().startswith('m') else amount * 60
+            duration = timedelta(minutes=minutes)
+            spans.append(duration_match.span())
+
+        # A plain number is only a time when it says so: "at 3", "3pm", "15:00", "noon"
+        time_matches = [
+            m for m in TIME_PATTERN.finditer(text)
+            if not overlaps(m) and (m.group('at') or re.search(r'[:apn]', m.group('time'), re.IGNORECASE))
+        ]
+        if time_matches:
+            if start_clock or len(time_matches) > 1:
+                raise _Ambiguous(time_matches[0].group())
+            start_clock = _parse_clock(time_matches[0].group('time'))
+            spans.append(time_matches[0].span())
+    except _Ambiguous:
+        return None
+
+    if re.search(r'\btonight\b', text, re.IGNORECASE) and not start_clock:
+        return None
+
+    start_time = end_time = None
+    if start_clock:
+        if date is None:
+            # A bare time means the next time the clock reads it
+            date = now.date() if now.time() <= time(*start_clock) else now.date() + timedelta(days=1)
+        start_time = datetime(date.year, date.month, date.day, *start_clock)
+        if end_clock:
+            end_time = datetime(date.year, date.month, date.day, *end_clock)
+            if end_time <= start_time:
+                # "10pm to 1am" runs past midnight
+                end_time += timedelta(days=1)
+        elif duration:
+            end_time = start_time + duration
+    elif date is not None:
+        if duration:
+            return None
+        start_time = datetime(date.year, date.month, date.day)
+    elif duration:
+        return None
+
+    title = _clean_title(text, spans) or (text[:MAX_TITLE_LENGTH] + '...' if len(text) > MAX_TITLE_LENGTH else text)
+    return {
+        'title': title,
+        'content': text,
+        'start_time': start_time.strftime('%Y-%m-%dT%H:%M') if start_time else None,
+        'end_time': end_time.strftime('%Y-%m-%dT%H:%M') if end_time else None,
+    }